@@ -1,11 +1,117 @@
-from flask import Flask, render_template, request, jsonify
-from services.sparql_service import search_wikidata, get_entity_details
-from services.graph_service import generate_knowledge_graph
-import networkx as nx
+from flask import Flask, Response, render_template, request, jsonify, url_for, g, has_request_context
+import click
+import os
+import time
+from services.sparql_service import search_wikidata, get_entity_details, get_entity_properties_page
+from services.store_service import get_store
+from services.dump_service import ingest_dump, DUMP_STORE_PATH
+from services.suggest_service import suggest_index, load_label_dump, VISIT_WEIGHT
+from services.graph_service import compact_graph, get_knowledge_graph, find_path
+from services.layout_service import DEFAULT_LAYOUT, LAYOUT_METHODS
+from services.label_service import localize_entity, localize_graph, localize_items, parse_languages
+from services.property_service import property_metadata
+from services.prefetch_service import prefetcher, start_prefetch
+from services.refresh_service import start_refresh
+from services.asset_service import ASSET_MAX_AGE, COMPRESS_MIN_BYTES, asset_version, compress, is_current, negotiate_encoding
+from services.request_service import (
+    MAX_GRAPH_DEPTH, MAX_GRAPH_FANOUT, MAX_GRAPH_RELATIONS, MAX_PATH_HOPS, MAX_PROPERTY_PAGES,
+    body_seed_ids, clamp_int, is_not_modified, json_cache_headers, normalize_entity_id, parse_seed_ids,
+    response_encoding,
+)
+from services.export_service import CONTENT_TYPES, EXPORT_FORMATS, EXPORT_WORKERS, MAX_EXPORT_SEEDS, check_format, export_graphs, export_to_file, load_checkpoint
+from services import metrics_service
 import json
 
 app = Flask(__name__)
 
+# Optionally warm the cache with the neighbors of viewed entities (PREFETCH_ENABLED)
+start_prefetch()
+# Optionally recheck cached entities by revision in the background (REFRESH_ENABLED)
+start_refresh()
+
+def _int_arg(name, default, upper):
+    """Read a positive integer query parameter, clamped to upper"""
+    return clamp_int(request.args.get(name), default, upper)
+
+def _cached_json_response(payload):
+    body, headers = json_cache_headers(payload)
+    encoding = response_encoding(body, headers, request.headers.get('Accept-Encoding'))
+    if is_not_modified(request.headers, headers):
+        return "", 304, headers
+    if encoding:
+        # Compressed once per body version, then served from memory
+        body = compress(body, headers["ETag"], encoding)
+    return body, 200, headers
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    metrics_service.begin_request()
+
+@app.before_request
+def start_property_refresh():
+    # Property labels and categories come from a local snapshot kept fresh in the
+    # background; started on the first request so CLI commands don't fetch it
+    property_metadata.start_background_refresh()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        server_timing = metrics_service.end_request(
+            request.endpoint, time.perf_counter() - started, response.status_code
+        )
+        if server_timing:
+            response.headers['Server-Timing'] = server_timing
+    return response
+
+@app.after_request
+def cache_static_assets(response):
+    # Fingerprinted URLs (?v=<content hash>) never change, so clients keep them for a year.
+    # Any other v (stale or made up) gets the default headers and is not compressed into the cache.
+    if request.endpoint != 'static' or response.status_code not in (200, 304):
+        return response
+    if not is_current(request.view_args['filename'], request.args.get('v')):
+        return response
+    response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if response.status_code == 200 and encoding and response.content_length and response.content_length >= COMPRESS_MIN_BYTES:
+        response.direct_passthrough = False
+        key = ('static', request.view_args['filename'], request.args['v'])
+        response.set_data(compress(response.get_data(), key, encoding))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f"{etag}-{encoding}", weak)
+        response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+def layout_arg():
+    """The layout method a graph request asks for, or None for client-side layout"""
+    layout = request.args.get('layout', DEFAULT_LAYOUT)
+    return layout if layout in LAYOUT_METHODS else None
+
+def languages_arg():
+    """The label language fallback chain from the lang parameter, e.g. ?lang=de,en,mul"""
+    return parse_languages(request.args.get('lang'))
+
+@app.url_defaults
+def keep_language(endpoint, values):
+    # Links and API URLs built while serving a ?lang= request keep the language
+    if endpoint != 'static' and 'lang' not in values and has_request_context() and request.args.get('lang'):
+        values['lang'] = request.args['lang']
+
+@app.url_defaults
+def fingerprint_static(endpoint, values):
+    if endpoint == 'static' and 'v' not in values:
+        version = asset_version(values['filename'])
+        if version:
+            values['v'] = version
+
+@app.context_processor
+def language_context():
+    return {"languages": languages_arg(), "lang_param": request.args.get('lang')}
+
 @app.route('/')
 def index():
     """Render the search page"""
@@ -18,45 +124,233 @@ def search():
     if not query:
         return render_template('results.html', results=[])
     
-    results = search_wikidata(query)
+    languages = languages_arg()
+    results = localize_items(search_wikidata(query, language=languages[0]), languages)
     return render_template('results.html', results=results, query=query)
 
 @app.route('/entity/<entity_id>')
 def entity(entity_id):
     """Display entity details and visualization"""
-    if not entity_id.startswith('Q'):
-        # Check if it's a valid numeric ID
-        if entity_id.isdigit():
-            entity_id = f"Q{entity_id}"
-        else:
-            # If it contains a namespace (like wdt:P31), extract just the ID
-            if ":" in entity_id:
-                entity_id = entity_id.split(":")[-1]
+    entity_id = normalize_entity_id(entity_id)
     
     # Get entity details using SPARQL
-    entity_data = get_entity_details(entity_id)
+    entity_data = localize_entity(get_entity_details(entity_id), languages_arg())
     
     if not entity_data:
         return render_template('entity.html', error=f"Entity {entity_id} not found", entity=None)
+
+    suggest_index.add(entity_data["id"], entity_data["label"], entity_data.get("description", ""), weight=VISIT_WEIGHT)
+    prefetcher.record_view(entity_id)
+    prefetcher.enqueue_neighbors(entity_data)
     
-    # Generate knowledge graph visualization
+    # The graph itself is fetched lazily by the page from /api/graph
+    graph_url = url_for(
+        'api_graph',
+        entity_id=entity_id,
+        depth=_int_arg('depth', 1, MAX_GRAPH_DEPTH),
+        fanout=_int_arg('fanout', 5, MAX_GRAPH_FANOUT),
+        layout=layout_arg(),
+        format='compact'
+    )
+    
+    return render_template('entity.html', entity=entity_data, graph_url=graph_url)
+
+@app.route('/api/entity/<entity_id>')
+def api_entity(entity_id):
+    """Return entity details as JSON"""
+    entity_id = normalize_entity_id(entity_id)
+    entity_data = localize_entity(get_entity_details(entity_id), languages_arg())
+    if not entity_data:
+        return jsonify({"error": f"Entity {entity_id} not found"}), 404
+    return _cached_json_response(entity_data)
+
+@app.route('/api/entity/<entity_id>/properties')
+def api_entity_properties(entity_id):
+    """Return one page of an entity's properties, most important first"""
+    entity_id = normalize_entity_id(entity_id)
+    page = _int_arg('page', 1, MAX_PROPERTY_PAGES)
+    entity_page = localize_entity(get_entity_properties_page(entity_id, page), languages_arg())
+    if not entity_page:
+        return jsonify({"error": f"No properties page {page} for entity {entity_id}"}), 404
+    return _cached_json_response(entity_page)
+
+@app.route('/api/graph/<entity_id>')
+def api_graph(entity_id):
+    """Return the knowledge graph around an entity as JSON, columnar with ?format=compact"""
+    entity_id = normalize_entity_id(entity_id)
     try:
-        graph_data = generate_knowledge_graph(entity_id)
-        
-        # Use the function to generate HTML for the 3D graph
-        from services.graph_service import generate_3d_graph_html
-        graph_html = generate_3d_graph_html(graph_data)
+        graph_data = get_knowledge_graph(
+            entity_id,
+            max_relations=_int_arg('max_relations', 15, MAX_GRAPH_RELATIONS),
+            depth=_int_arg('depth', 1, MAX_GRAPH_DEPTH),
+            fanout=_int_arg('fanout', 5, MAX_GRAPH_FANOUT),
+            layout=layout_arg(),
+            languages=languages_arg()
+        )
     except Exception as e:
         print(f"Error generating graph: {e}")
-        graph_data = {"nodes": [], "links": []}
-        graph_html = None
-    
-    return render_template(
-        'entity.html',
-        entity=entity_data,
-        graph_data=json.dumps(graph_data) if graph_data else "{}",
-        graph_html=graph_html
+        return jsonify({"error": "Could not generate graph", "nodes": [], "links": []}), 502
+    if request.args.get('format') == 'compact':
+        graph_data = compact_graph(graph_data)
+    return _cached_json_response(graph_data)
+
+@app.route('/api/path')
+def api_path():
+    """Return how two entities are connected, as a graph of the path between them"""
+    from_id = request.args.get('from', '')
+    to_id = request.args.get('to', '')
+    if not from_id or not to_id:
+        return jsonify({"error": "Both 'from' and 'to' are required", "nodes": [], "links": []}), 400
+    try:
+        path_data = find_path(
+            normalize_entity_id(from_id),
+            normalize_entity_id(to_id),
+            max_hops=_int_arg('max_hops', 4, MAX_PATH_HOPS)
+        )
+    except Exception as e:
+        print(f"Error finding path: {e}")
+        return jsonify({"error": "Could not search for a path", "nodes": [], "links": []}), 502
+    return _cached_json_response(localize_graph(path_data, languages_arg()))
+
+@app.route('/api/export', methods=['GET', 'POST'])
+def api_export():
+    """Stream the knowledge graphs of many seed entities as JSONL, GraphML or Parquet"""
+    body = request.get_json(silent=True)
+    try:
+        ids = parse_seed_ids(request.args.getlist('ids') + body_seed_ids(body))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    body = body or {}
+    fmt = request.args.get('format', body.get('format', 'jsonl'))
+    if not ids:
+        return jsonify({"error": "'ids' must list at least one QID"}), 400
+    if len(ids) > MAX_EXPORT_SEEDS:
+        return jsonify({"error": f"At most {MAX_EXPORT_SEEDS} seeds per export"}), 400
+    try:
+        check_format(fmt)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 501
+
+    chunks = export_graphs(
+        ids,
+        fmt,
+        max_relations=_int_arg('max_relations', 15, MAX_GRAPH_RELATIONS),
+        depth=_int_arg('depth', 1, MAX_GRAPH_DEPTH),
+        fanout=_int_arg('fanout', 5, MAX_GRAPH_FANOUT),
+        languages=languages_arg()
+    )
+    headers = {"Content-Disposition": f'attachment; filename="graphs.{fmt}"'}
+    return Response(chunks, mimetype=CONTENT_TYPES[fmt], headers=headers)
+
+@app.route('/api/suggest')
+def suggest():
+    """Return typeahead suggestions from the local prefix index"""
+    query = request.args.get('q', '')
+    limit = _int_arg('limit', 10, 50)
+    return jsonify({"query": query, "suggestions": suggest_index.suggest(query, limit)})
+
+@app.route('/metrics')
+def metrics():
+    """Expose counters and latency histograms in the Prometheus text format"""
+    return metrics_service.render_prometheus(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+@app.cli.command('warm-store')
+@click.argument('qids', nargs=-1)
+@click.option('--file', 'qid_file', type=click.File('r'), help='File with one QID per line')
+def warm_store(qids, qid_file):
+    """Pre-fetch entities into the persistent store"""
+    ids = list(qids)
+    if qid_file:
+        ids.extend(line.strip() for line in qid_file if line.strip() and not line.startswith('#'))
+
+    store = get_store()
+    warmed = 0
+    for entity_id in ids:
+        if get_entity_details(entity_id):
+            warmed += 1
+        else:
+            click.echo(f"Could not fetch {entity_id}")
+    store.compact()
+    click.echo(f"Warmed {warmed}/{len(ids)} entities")
+    click.echo(json.dumps(store.stats()))
+
+@app.cli.command('build-suggest-index')
+@click.option('--labels', 'labels_path', type=click.Path(exists=True), help='TSV dump: QID, label, description, score')
+@click.option('--replace', is_flag=True, help='Discard the existing index instead of merging into it')
+def build_suggest_index(labels_path, replace):
+    """Build or extend the typeahead index from an offline label dump"""
+    entries = load_label_dump(labels_path) if labels_path else {}
+    suggest_index.rebuild(entries, replace=replace)
+    click.echo(json.dumps(suggest_index.stats()))
+
+@app.cli.command('ingest-dump')
+@click.argument('dump_path', type=click.Path(exists=True))
+@click.option('--output', default=DUMP_STORE_PATH, show_default=True, help='Store directory')
+@click.option('--languages', default='en', show_default=True, help='Comma-separated label languages')
+@click.option('--properties', default='', help='Comma-separated PIDs to keep (default: all)')
+@click.option('--entities', 'entities_file', type=click.File('r'), help='File with one QID per line to keep (default: all)')
+def ingest_dump_command(dump_path, output, languages, properties, entities_file):
+    """Ingest a Wikidata JSON or N-Triples dump (.bz2/.gz) into the local store"""
+    entities = None
+    if entities_file:
+        entities = [line.strip() for line in entities_file if line.strip() and not line.startswith('#')]
+
+    def progress(read, kept, edges):
+        click.echo(f"{read} entities read, {kept} kept, {edges} statements")
+
+    meta = ingest_dump(
+        dump_path,
+        output=output,
+        languages=[lang for lang in languages.split(',') if lang],
+        properties=[pid for pid in properties.split(',') if pid] or None,
+        entities=entities,
+        progress=progress
     )
+    click.echo(json.dumps(meta))
+
+@app.cli.command('export-graphs')
+@click.argument('qids', nargs=-1)
+@click.option('--file', 'qid_file', type=click.File('r'), help='File with one QID per line')
+@click.option('--output', required=True, type=click.Path(), help='Output file')
+@click.option('--format', 'fmt', type=click.Choice(EXPORT_FORMATS), help='Default: from the output extension, else jsonl')
+@click.option('--depth', default=1, show_default=True, help='Hops to expand from each seed')
+@click.option('--fanout', default=5, show_default=True, help='Relations kept per expanded entity')
+@click.option('--max-relations', default=15, show_default=True, help='Relations kept for each seed')
+@click.option('--workers', default=EXPORT_WORKERS, show_default=True, help='Graphs built at once')
+@click.option('--checkpoint', type=click.Path(), help='File of finished seeds; rerun with it to resume')
+def export_graphs_command(qids, qid_file, output, fmt, depth, fanout, max_relations, workers, checkpoint):
+    """Build the knowledge graph of every seed QID and write them to one file"""
+    ids = list(qids)
+    if qid_file:
+        ids.extend(line.strip() for line in qid_file if line.strip() and not line.startswith('#'))
+    ids = parse_seed_ids(ids)
+    extension = os.path.splitext(output)[1][1:]
+    fmt = fmt or (extension if extension in EXPORT_FORMATS else 'jsonl')
+    try:
+        check_format(fmt)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    if load_checkpoint(checkpoint):
+        click.echo(f"Resuming from {checkpoint}")
+
+    def progress(stats):
+        click.echo(
+            f"{stats['done']}/{stats['total']} seeds ({stats['skipped']} skipped, {stats['failed']} failed), "
+            f"{stats['nodes']} nodes, {stats['links']} links, {stats['bytes']} bytes, "
+            f"{stats['seeds_per_second']} seeds/s"
+        )
+
+    paths = export_to_file(ids, output, fmt, workers=max(1, workers), checkpoint=checkpoint, progress=progress,
+                           max_relations=max_relations, depth=depth, fanout=fanout)
+    click.echo(f"Wrote {', '.join(paths) if paths else 'nothing'}")
+
+@app.cli.command('refresh-properties')
+def refresh_properties():
+    """Download every Wikidata property's label and datatype into the local snapshot"""
+    count = property_metadata.refresh()
+    click.echo(f"Saved {count} properties to {property_metadata.path}")
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
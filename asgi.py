@@ -0,0 +1,293 @@
+import asyncio
+import time
+
+from quart import Quart, render_template, request, jsonify, url_for, g, has_request_context
+
+from services.request_service import (
+    MAX_GRAPH_DEPTH, MAX_GRAPH_FANOUT, MAX_GRAPH_RELATIONS, MAX_PATH_HOPS, MAX_PROPERTY_PAGES,
+    body_seed_ids, clamp_int, is_not_modified, json_cache_headers, normalize_entity_id, parse_seed_ids,
+    response_encoding,
+)
+from services.asset_service import ASSET_MAX_AGE, COMPRESS_MIN_BYTES, asset_version, compress, is_current, negotiate_encoding
+from services.async_sparql_service import close_client, get_entity_details, search_wikidata
+from services.graph_service import compact_graph, get_knowledge_graph, find_path
+from services.layout_service import DEFAULT_LAYOUT, LAYOUT_METHODS
+from services.label_service import localize_entity, localize_graph, localize_items, parse_languages
+from services.sparql_service import get_entity_properties_page
+from services.suggest_service import suggest_index, VISIT_WEIGHT
+from services.prefetch_service import prefetcher, start_prefetch
+from services.refresh_service import start_refresh
+from services.property_service import property_metadata
+from services.export_service import CONTENT_TYPES, MAX_EXPORT_SEEDS, check_format, export_graphs
+from services import metrics_service
+
+# Async serving mode: same routes and templates as app.py, but Wikidata I/O is
+# non-blocking so one worker can hold many slow upstream requests at once.
+# Run with: hypercorn asgi:app
+app = Quart(__name__)
+
+
+def _int_arg(name, default, upper):
+    return clamp_int(request.args.get(name), default, upper)
+
+
+def layout_arg():
+    layout = request.args.get('layout', DEFAULT_LAYOUT)
+    return layout if layout in LAYOUT_METHODS else None
+
+
+def languages_arg():
+    return parse_languages(request.args.get('lang'))
+
+
+@app.url_defaults
+def keep_language(endpoint, values):
+    if endpoint != 'static' and 'lang' not in values and has_request_context() and request.args.get('lang'):
+        values['lang'] = request.args['lang']
+
+
+@app.context_processor
+async def language_context():
+    return {"languages": languages_arg(), "lang_param": request.args.get('lang')}
+
+
+@app.url_defaults
+def fingerprint_static(endpoint, values):
+    if endpoint == 'static' and 'v' not in values:
+        version = asset_version(values['filename'])
+        if version:
+            values['v'] = version
+
+
+def _cached_json_response(payload):
+    body, headers = json_cache_headers(payload)
+    encoding = response_encoding(body, headers, request.headers.get('Accept-Encoding'))
+    if is_not_modified(request.headers, headers):
+        return "", 304, headers
+    if encoding:
+        body = compress(body, headers["ETag"], encoding)
+    return body, 200, headers
+
+
+@app.before_serving
+async def start_background_work():
+    # The same optional workers app.py starts: neighbor prefetch (PREFETCH_ENABLED)
+    # and revision rechecks (REFRESH_ENABLED)
+    start_prefetch()
+    start_refresh()
+    # Keep the property snapshot fresh; one process per host downloads it
+    property_metadata.start_background_refresh()
+
+
+@app.after_serving
+async def shutdown():
+    await close_client()
+
+
+@app.before_request
+async def start_request_timer():
+    g.request_started = time.perf_counter()
+    metrics_service.begin_request()
+
+
+@app.after_request
+async def record_request_metrics(response):
+    started = getattr(g, 'request_started', None)
+    if started is not None:
+        server_timing = metrics_service.end_request(
+            request.endpoint, time.perf_counter() - started, response.status_code
+        )
+        if server_timing:
+            response.headers['Server-Timing'] = server_timing
+    return response
+
+
+@app.after_request
+async def cache_static_assets(response):
+    # Fingerprinted URLs (?v=<content hash>) never change, so clients keep them for a year.
+    # Any other v (stale or made up) gets the default headers and is not compressed into the cache.
+    if request.endpoint != 'static' or response.status_code not in (200, 304):
+        return response
+    if not is_current(request.view_args['filename'], request.args.get('v')):
+        return response
+    response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if response.status_code == 200 and encoding and response.content_length and response.content_length >= COMPRESS_MIN_BYTES:
+        key = ('static', request.view_args['filename'], request.args['v'])
+        response.set_data(compress(await response.get_data(), key, encoding))
+        response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f"{etag}-{encoding}", weak)
+    return response
+
+
+@app.route('/')
+async def index():
+    """Render the search page"""
+    return await render_template('index.html')
+
+
+@app.route('/search')
+async def search():
+    """Handle search requests"""
+    query = request.args.get('q', '')
+    if not query:
+        return await render_template('results.html', results=[])
+
+    languages = languages_arg()
+    results = await search_wikidata(query, language=languages[0])
+    results = await asyncio.to_thread(localize_items, results, languages)
+    return await render_template('results.html', results=results, query=query)
+
+
+@app.route('/entity/<entity_id>')
+async def entity(entity_id):
+    """Display entity details and visualization"""
+    entity_id = normalize_entity_id(entity_id)
+
+    entity_data = await asyncio.to_thread(localize_entity, await get_entity_details(entity_id), languages_arg())
+
+    if not entity_data:
+        return await render_template('entity.html', error=f"Entity {entity_id} not found", entity=None)
+
+    suggest_index.add(entity_data["id"], entity_data["label"], entity_data.get("description", ""), weight=VISIT_WEIGHT)
+    prefetcher.record_view(entity_id)
+    prefetcher.enqueue_neighbors(entity_data)
+
+    # The graph itself is fetched lazily by the page from /api/graph
+    graph_url = url_for(
+        'api_graph',
+        entity_id=entity_id,
+        depth=_int_arg('depth', 1, MAX_GRAPH_DEPTH),
+        fanout=_int_arg('fanout', 5, MAX_GRAPH_FANOUT),
+        layout=layout_arg(),
+        format='compact'
+    )
+
+    return await render_template('entity.html', entity=entity_data, graph_url=graph_url)
+
+
+@app.route('/api/entity/<entity_id>')
+async def api_entity(entity_id):
+    """Return entity details as JSON"""
+    entity_id = normalize_entity_id(entity_id)
+    entity_data = await asyncio.to_thread(localize_entity, await get_entity_details(entity_id), languages_arg())
+    if not entity_data:
+        return jsonify({"error": f"Entity {entity_id} not found"}), 404
+    return _cached_json_response(entity_data)
+
+
+@app.route('/api/entity/<entity_id>/properties')
+async def api_entity_properties(entity_id):
+    """Return one page of an entity's properties, most important first"""
+    entity_id = normalize_entity_id(entity_id)
+    page = _int_arg('page', 1, MAX_PROPERTY_PAGES)
+    entity_page = await asyncio.to_thread(get_entity_properties_page, entity_id, page)
+    entity_page = await asyncio.to_thread(localize_entity, entity_page, languages_arg())
+    if not entity_page:
+        return jsonify({"error": f"No properties page {page} for entity {entity_id}"}), 404
+    return _cached_json_response(entity_page)
+
+
+@app.route('/api/graph/<entity_id>')
+async def api_graph(entity_id):
+    """Return the knowledge graph around an entity as JSON, columnar with ?format=compact"""
+    entity_id = normalize_entity_id(entity_id)
+    # Warm the root entity without blocking; the synchronous graph builder then
+    # only blocks a thread for the neighbor lookups
+    await get_entity_details(entity_id)
+    try:
+        graph_data = await asyncio.to_thread(
+            get_knowledge_graph,
+            entity_id,
+            max_relations=_int_arg('max_relations', 15, MAX_GRAPH_RELATIONS),
+            depth=_int_arg('depth', 1, MAX_GRAPH_DEPTH),
+            fanout=_int_arg('fanout', 5, MAX_GRAPH_FANOUT),
+            layout=layout_arg(),
+            languages=languages_arg()
+        )
+    except Exception as e:
+        print(f"Error generating graph: {e}")
+        return jsonify({"error": "Could not generate graph", "nodes": [], "links": []}), 502
+    if request.args.get('format') == 'compact':
+        graph_data = compact_graph(graph_data)
+    return _cached_json_response(graph_data)
+
+
+@app.route('/api/path')
+async def api_path():
+    """Return how two entities are connected, as a graph of the path between them"""
+    from_id = request.args.get('from', '')
+    to_id = request.args.get('to', '')
+    if not from_id or not to_id:
+        return jsonify({"error": "Both 'from' and 'to' are required", "nodes": [], "links": []}), 400
+    try:
+        path_data = await asyncio.to_thread(
+            find_path,
+            normalize_entity_id(from_id),
+            normalize_entity_id(to_id),
+            max_hops=_int_arg('max_hops', 4, MAX_PATH_HOPS)
+        )
+    except Exception as e:
+        print(f"Error finding path: {e}")
+        return jsonify({"error": "Could not search for a path", "nodes": [], "links": []}), 502
+    path_data = await asyncio.to_thread(localize_graph, path_data, languages_arg())
+    return _cached_json_response(path_data)
+
+
+@app.route('/api/export', methods=['GET', 'POST'])
+async def api_export():
+    """Stream the knowledge graphs of many seed entities as JSONL, GraphML or Parquet"""
+    body = await request.get_json(silent=True)
+    try:
+        ids = parse_seed_ids(request.args.getlist('ids') + body_seed_ids(body))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    body = body or {}
+    fmt = request.args.get('format', body.get('format', 'jsonl'))
+    if not ids:
+        return jsonify({"error": "'ids' must list at least one QID"}), 400
+    if len(ids) > MAX_EXPORT_SEEDS:
+        return jsonify({"error": f"At most {MAX_EXPORT_SEEDS} seeds per export"}), 400
+    try:
+        check_format(fmt)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 501
+
+    chunks = export_graphs(
+        ids,
+        fmt,
+        max_relations=_int_arg('max_relations', 15, MAX_GRAPH_RELATIONS),
+        depth=_int_arg('depth', 1, MAX_GRAPH_DEPTH),
+        fanout=_int_arg('fanout', 5, MAX_GRAPH_FANOUT),
+        languages=languages_arg()
+    )
+
+    async def stream():
+        # The export builds graphs with blocking I/O; pull each chunk in a thread
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+
+    headers = {"Content-Type": CONTENT_TYPES[fmt], "Content-Disposition": f'attachment; filename="graphs.{fmt}"'}
+    return stream(), 200, headers
+
+
+@app.route('/metrics')
+async def metrics():
+    """Expose counters and latency histograms in the Prometheus text format"""
+    return metrics_service.render_prometheus(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+
+@app.route('/api/suggest')
+async def suggest():
+    """Return typeahead suggestions from the local prefix index"""
+    query = request.args.get('q', '')
+    limit = _int_arg('limit', 10, 50)
+    return jsonify({"query": query, "suggestions": suggest_index.suggest(query, limit)})
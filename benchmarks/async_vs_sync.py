@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_wikidata import start_server
+
+# Compare entity-fetch throughput of the sync service (a fixed pool of worker
+# threads, like gunicorn sync/gthread workers) against the async service (one
+# event loop) while every upstream call takes --latency seconds.
+
+
+def _configure(base_url, pool_size):
+    # Must run before the services are imported: they read these at import time
+    os.environ["WIKIDATA_SPARQL_ENDPOINT"] = f"{base_url}/sparql"
+    os.environ["WIKIDATA_API_ENDPOINT"] = f"{base_url}/w/api.php"
+    os.environ["WIKIDATA_POOL_SIZE"] = str(pool_size)
+    os.environ["ENTITY_STORE_BACKEND"] = "none"
+
+
+def run_sync(ids, threads):
+    from services import sparql_service
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(sparql_service.get_entity_details, ids))
+    elapsed = time.perf_counter() - start
+    return elapsed, sum(1 for r in results if r)
+
+
+async def _run_async(ids, concurrency):
+    from services import async_sparql_service
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(entity_id):
+        async with semaphore:
+            return await async_sparql_service.get_entity_details(entity_id)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(fetch(entity_id) for entity_id in ids))
+    elapsed = time.perf_counter() - start
+    await async_sparql_service.close_client()
+    return elapsed, sum(1 for r in results if r)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sync vs async entity fetching against a mock Wikidata")
+    parser.add_argument("--requests", type=int, default=400, help="Distinct entities fetched per mode")
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock upstream latency in seconds")
+    parser.add_argument("--threads", type=int, default=8, help="Worker threads for the sync path")
+    parser.add_argument("--concurrency", type=int, default=200, help="In-flight requests for the async path")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    server, base_url = start_server(latency=args.latency)
+    _configure(base_url, max(args.threads, args.concurrency))
+
+    # Disjoint ID ranges so neither mode benefits from the other's cache
+    sync_ids = [f"Q{1000000 + i}" for i in range(args.requests)]
+    async_ids = [f"Q{2000000 + i}" for i in range(args.requests)]
+
+    sync_elapsed, sync_ok = run_sync(sync_ids, args.threads)
+    async_elapsed, async_ok = asyncio.run(_run_async(async_ids, args.concurrency))
+    server.shutdown()
+
+    results = {
+        "requests": args.requests,
+        "upstream_latency": args.latency,
+        "sync": {"threads": args.threads, "seconds": sync_elapsed, "ok": sync_ok,
+                 "requests_per_second": args.requests / sync_elapsed},
+        "async": {"concurrency": args.concurrency, "seconds": async_elapsed, "ok": async_ok,
+                  "requests_per_second": args.requests / async_elapsed},
+    }
+    results["speedup"] = results["async"]["requests_per_second"] / results["sync"]["requests_per_second"]
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import argparse
+import json
+
+# Compare two benchmark result files written with --output: prints every
+# numeric value found in both, with the relative change from the baseline.
+
+
+def flatten(value, prefix=""):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from flatten(item, f"{prefix}.{key}" if prefix else str(key))
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark JSON results")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--filter", default="", help="Only show metrics whose path contains this text")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = dict(flatten(json.load(f)))
+    with open(args.candidate) as f:
+        candidate = dict(flatten(json.load(f)))
+
+    for path, before in baseline.items():
+        if path.startswith("settings.") or path not in candidate or args.filter not in path:
+            continue
+        after = candidate[path]
+        change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+        print(f"{path:60} {before:>14.3f} {after:>14.3f} {change:>9}")
+
+
+if __name__ == "__main__":
+    main()
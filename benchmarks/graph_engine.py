@@ -0,0 +1,152 @@
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import networkx as nx
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.graph_index_service import CSRGraph
+
+# Compare the CSR graph index against networkx on synthetic Wikidata-like
+# graphs: build time and memory, k-hop neighborhoods, shortest paths and
+# degree ranking. Edges follow a skewed (Zipf-like) target distribution so a
+# few hub items collect most links, as in the real graph.
+
+
+def make_edges(edge_count, seed):
+    rng = np.random.default_rng(seed)
+    node_count = max(10, edge_count // 5)
+    sources = rng.integers(0, node_count, edge_count)
+    targets = np.minimum(rng.zipf(1.6, edge_count) - 1, node_count - 1)
+    targets = (targets * 7919) % node_count  # spread hubs over the ID space
+    pids = rng.integers(1, 3000, edge_count)
+    return node_count, sources, targets, pids
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def _measure_build(build):
+    tracemalloc.start()
+    graph, seconds = _timed(build)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return graph, seconds, peak
+
+
+def bench_networkx(node_count, sources, targets, pids, queries, hops):
+    qids = [f"Q{i}" for i in range(node_count)]
+
+    def build():
+        G = nx.DiGraph()
+        G.add_edges_from(
+            (qids[s], qids[t], {"label": f"Property:P{p}"})
+            for s, t, p in zip(sources.tolist(), targets.tolist(), pids.tolist())
+        )
+        return G
+
+    G, build_seconds, peak = _measure_build(build)
+    undirected = G.to_undirected(as_view=True)
+
+    _, k_hop_seconds = _timed(lambda: [
+        len(nx.single_source_shortest_path_length(undirected, qids[a], cutoff=hops))
+        for a, _ in queries if qids[a] in G
+    ])
+
+    def paths():
+        found = 0
+        for a, b in queries:
+            try:
+                nx.shortest_path(undirected, qids[a], qids[b])
+                found += 1
+            except (nx.NetworkXNoPath, nx.NodeNotFound):
+                pass
+        return found
+
+    found, path_seconds = _timed(paths)
+    _, degree_seconds = _timed(lambda: sorted(G.degree, key=lambda item: -item[1])[:100])
+
+    return {
+        "build_seconds": build_seconds,
+        "build_peak_bytes": peak,
+        "k_hop_ms": k_hop_seconds * 1000 / len(queries),
+        "shortest_path_ms": path_seconds * 1000 / len(queries),
+        "paths_found": found,
+        "degree_ranking_ms": degree_seconds * 1000,
+    }
+
+
+def bench_csr(node_count, sources, targets, pids, queries, hops):
+    qids = [f"Q{i}" for i in range(node_count)]
+
+    def build():
+        graph = CSRGraph()
+        for qid in qids:
+            graph.intern(qid)
+        graph.add_edge_arrays(sources, targets, pids)
+        graph.edge_count()  # forces the CSR arrays to be built
+        return graph
+
+    graph, build_seconds, peak = _measure_build(build)
+
+    _, k_hop_seconds = _timed(lambda: [len(graph.k_hop(qids[a], hops)) for a, _ in queries])
+
+    def paths():
+        return sum(1 for a, b in queries if graph.shortest_path(qids[a], qids[b], max_hops=64) is not None)
+
+    found, path_seconds = _timed(paths)
+    _, degree_seconds = _timed(lambda: graph.degree_ranking(100))
+
+    return {
+        "build_seconds": build_seconds,
+        "build_peak_bytes": peak,
+        "array_bytes": graph.nbytes()["arrays"],
+        "k_hop_ms": k_hop_seconds * 1000 / len(queries),
+        "shortest_path_ms": path_seconds * 1000 / len(queries),
+        "paths_found": found,
+        "degree_ranking_ms": degree_seconds * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the CSR graph index against networkx")
+    parser.add_argument("--edges", type=int, nargs="+", default=[100000, 1000000], help="Edge counts to test")
+    parser.add_argument("--queries", type=int, default=50, help="k-hop and shortest-path queries per size")
+    parser.add_argument("--hops", type=int, default=2, help="Radius of k-hop neighborhoods")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = []
+    for edge_count in args.edges:
+        node_count, sources, targets, pids = make_edges(edge_count, args.seed)
+        rng = np.random.default_rng(args.seed + 1)
+        queries = rng.integers(0, node_count, (args.queries, 2)).tolist()
+
+        entry = {
+            "edges": edge_count,
+            "nodes": node_count,
+            "networkx": bench_networkx(node_count, sources, targets, pids, queries, args.hops),
+            "csr": bench_csr(node_count, sources, targets, pids, queries, args.hops),
+        }
+        for metric in ("build_seconds", "build_peak_bytes", "k_hop_ms", "shortest_path_ms", "degree_ranking_ms"):
+            csr_value = entry["csr"][metric]
+            entry.setdefault("speedup", {})[metric] = entry["networkx"][metric] / csr_value if csr_value else None
+        results.append(entry)
+        print(json.dumps(entry, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
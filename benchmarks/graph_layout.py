@@ -0,0 +1,77 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.microbench import summarize, synthetic_graph
+from services.layout_service import LAYOUT_METHODS, _edge_arrays, compute_layout
+
+# Time the server-side graph layouts on synthetic graphs of 100 to 10,000
+# nodes, in two shapes: the star of stars that multi-hop expansion produces,
+# and a random graph whose links favor a few hubs. Besides latency, each
+# layout reports how uneven its link lengths are (p95 over median) and the
+# share of node pairs closer than a node's diameter, as a rough quality check.
+
+
+def random_graph(node_count, seed):
+    """A connected graph: each node links to an earlier one, hubs preferred"""
+    rng = np.random.default_rng(seed)
+    nodes = [{"id": f"Q{i}", "label": f"Entity {i}", "type": "related"} for i in range(node_count)]
+    links = []
+    for i in range(1, node_count):
+        target = int(min(rng.zipf(1.8) - 1, i - 1))
+        links.append({"source": f"Q{i}", "target": f"Q{target}",
+                      "label": "Property:P1", "relationship": "Property:P1"})
+    return {"nodes": nodes, "links": links}
+
+
+def layout_quality(graph, positions, node_diameter=40.0, samples=20000, seed=0):
+    points = np.asarray(positions)
+    sources, targets = _edge_arrays(graph["nodes"], graph["links"])
+    lengths = np.linalg.norm(points[sources] - points[targets], axis=1)
+    pairs = np.random.default_rng(seed).integers(0, len(points), (samples, 2))
+    pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+    distances = np.linalg.norm(points[pairs[:, 0]] - points[pairs[:, 1]], axis=1)
+    return {
+        "link_length_spread": float(np.percentile(lengths, 95) / np.median(lengths)) if len(lengths) else None,
+        "overlapping_pairs": float(np.mean(distances < node_diameter)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark server-side graph layouts")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 300, 1000, 3000, 10000])
+    parser.add_argument("--methods", nargs="+", default=list(LAYOUT_METHODS), choices=LAYOUT_METHODS)
+    parser.add_argument("--runs", type=int, default=3, help="Runs per graph and method")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {"settings": vars(args), "layouts": {}}
+    for shape, build in (("star_of_stars", lambda n: synthetic_graph(n)),
+                         ("random_hubs", lambda n: random_graph(n, args.seed))):
+        for size in args.sizes:
+            graph = build(size)
+            for method in args.methods:
+                samples = []
+                for _ in range(args.runs):
+                    start = time.perf_counter()
+                    positions = compute_layout(graph, method)
+                    samples.append(time.perf_counter() - start)
+                entry = dict(summarize(samples), **layout_quality(graph, positions))
+                results["layouts"].setdefault(shape, {}).setdefault(str(size), {})[method] = entry
+                print(f"{shape:14} {size:>6} {method:9} p50 {entry['p50_ms']:9.1f} ms  "
+                      f"link spread {entry['link_length_spread']:.2f}  overlaps {entry['overlapping_pairs']:.4f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
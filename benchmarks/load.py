@@ -0,0 +1,134 @@
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.microbench import _configure, summarize
+from benchmarks.mock_wikidata import start_server
+
+# End-to-end load test of /search and /entity/<id>. By default the app runs
+# in-process (threaded werkzeug server) against the local mock Wikidata;
+# --url points it at an already running deployment instead (e.g. gunicorn
+# configured with the mock endpoints). Reports latency percentiles and
+# throughput per route.
+
+SEARCH_TERMS = ["berlin", "einstein", "python", "mozart", "paris", "moon", "tokyo", "curie", "nile", "jazz"]
+
+
+def _start_app():
+    from werkzeug.serving import make_server
+    from app import app
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def _paths(count, entity_pool, seed):
+    """A mixed request list: half searches, half entity pages, drawn from small pools so caches matter"""
+    rng = random.Random(seed)
+    paths = []
+    for _ in range(count):
+        if rng.random() < 0.5:
+            paths.append(("search", f"/search?q={rng.choice(SEARCH_TERMS)}"))
+        else:
+            paths.append(("entity", f"/entity/Q{rng.randrange(1, entity_pool + 1)}"))
+    return paths
+
+
+def run_load(base_url, paths, concurrency, timeout):
+    latencies = {}
+    failures = {}
+    lock = threading.Lock()
+    cursor = iter(paths)
+
+    def worker():
+        session = requests.Session()
+        while True:
+            with lock:
+                item = next(cursor, None)
+            if item is None:
+                return
+            route, path = item
+            start = time.perf_counter()
+            try:
+                ok = session.get(base_url + path, timeout=timeout).status_code < 500
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok:
+                    latencies.setdefault(route, []).append(elapsed)
+                else:
+                    failures[route] = failures.get(route, 0) + 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    report = {"seconds": elapsed, "requests_per_second": len(paths) / elapsed, "routes": {}}
+    for route in sorted(set(latencies) | set(failures)):
+        samples = latencies.get(route, [])
+        entry = summarize(samples) if samples else {"runs": 0}
+        entry["failures"] = failures.get(route, 0)
+        report["routes"][route] = entry
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /search and /entity against a mock Wikidata")
+    parser.add_argument("--url", help="Test this running app instead of starting one in-process")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--entities", type=int, default=100, help="Size of the entity ID pool")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock upstream latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.05, help="Extra random mock latency, up to this much")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of upstream calls that fail")
+    parser.add_argument("--error-endpoint", choices=("all", "sparql", "api"), default="all",
+                        help="Only inject errors into this upstream")
+    parser.add_argument("--recordings", help="Serve recorded responses from this directory")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    mock = None
+    app_server = None
+    base_url = args.url
+    if base_url is None:
+        mock, mock_url = start_server(latency=args.latency, jitter=args.jitter,
+                                      error_rate=args.error_rate, recordings=args.recordings,
+                                      error_endpoint=args.error_endpoint)
+        _configure(mock_url)
+        app_server, base_url = _start_app()
+
+    paths = _paths(args.requests, args.entities, args.seed)
+    results = {"settings": vars(args), "load": run_load(base_url, paths, args.concurrency, args.timeout)}
+
+    if app_server is not None:
+        from services.breaker_service import get_breaker_stats
+        results["breakers"] = get_breaker_stats()
+        app_server.shutdown()
+    if mock is not None:
+        results["mock"] = dict(mock.stats)
+        mock.shutdown()
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_wikidata import start_server
+
+# Microbenchmarks for graph building and rendering against the local mock:
+# generate_knowledge_graph cold (caches cleared before every run, so each run
+# pays the upstream round trips) and warm (entity cache populated), and
+# the compact /api/graph payload (compact_graph) against the plain one on
+# synthetic graphs of increasing size.
+
+
+def _configure(base_url):
+    # Must run before the services are imported: they read these at import time
+    os.environ["WIKIDATA_SPARQL_ENDPOINT"] = f"{base_url}/sparql"
+    os.environ["WIKIDATA_API_ENDPOINT"] = f"{base_url}/w/api.php"
+    os.environ["ENTITY_STORE_BACKEND"] = "none"
+    os.environ["PROPERTY_REFRESH_INTERVAL"] = "0"
+    os.environ.setdefault("WIKIDATA_DUMP_STORE", os.path.join(os.devnull, "dump_store"))
+
+
+def summarize(samples):
+    """Latency summary in milliseconds"""
+    ordered = sorted(samples)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+
+    return {
+        "runs": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "min_ms": ordered[0] * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def _time_runs(fn, runs, before_each=None):
+    samples = []
+    for _ in range(runs):
+        if before_each:
+            before_each()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_knowledge_graph(entity_ids, depth, fanout, runs):
+    from services import graph_service
+    from services.sparql_service import entity_cache
+
+    results = {}
+    for label, before_each in (("cold", entity_cache.clear), ("warm", None)):
+        samples = []
+        for entity_id in entity_ids:
+            if label == "warm":
+                graph_service.generate_knowledge_graph(entity_id, depth=depth, fanout=fanout)
+            samples.extend(_time_runs(
+                lambda: graph_service.generate_knowledge_graph(entity_id, depth=depth, fanout=fanout),
+                runs, before_each
+            ))
+        results[label] = summarize(samples)
+    return results
+
+
+def synthetic_graph(node_count):
+    """A star of stars: node 0 links to hubs, every other node to its hub"""
+    hubs = max(1, int(node_count ** 0.5))
+    nodes = [{"id": f"Q{i}", "label": f"Entity {i}", "type": "main" if i == 0 else "related"}
+             for i in range(node_count)]
+    links = []
+    for i in range(1, node_count):
+        source = 0 if i <= hubs else 1 + (i % hubs)
+        links.append({"source": f"Q{source}", "target": f"Q{i}",
+                      "label": "Property:P1", "relationship": "Property:P1"})
+    return {"nodes": nodes, "links": links}
+
+
+def _json_bytes(payload):
+    return len(json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+
+
+def bench_compact_graph(sizes, runs):
+    from services import graph_service
+
+    results = {}
+    for size in sizes:
+        graph = synthetic_graph(size)
+        results[str(size)] = dict(
+            summarize(_time_runs(lambda: graph_service.compact_graph(graph), runs)),
+            plain_bytes=_json_bytes(graph),
+            compact_bytes=_json_bytes(graph_service.compact_graph(graph)),
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark graph generation and the compact graph payload")
+    parser.add_argument("--entities", type=int, default=5, help="Distinct root entities")
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--fanout", type=int, default=5)
+    parser.add_argument("--runs", type=int, default=10, help="Runs per entity / graph size")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mock upstream latency in seconds")
+    parser.add_argument("--graph-sizes", type=int, nargs="+", default=[16, 100, 1000, 5000])
+    parser.add_argument("--recordings", help="Serve recorded responses from this directory")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    server, base_url = start_server(latency=args.latency, recordings=args.recordings)
+    _configure(base_url)
+
+    entity_ids = [f"Q{100 + i}" for i in range(args.entities)]
+    results = {
+        "settings": vars(args),
+        "generate_knowledge_graph": bench_knowledge_graph(entity_ids, args.depth, args.fanout, args.runs),
+        "compact_graph": bench_compact_graph(args.graph_sizes, args.runs),
+        "mock": dict(server.stats),
+    }
+    server.shutdown()
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
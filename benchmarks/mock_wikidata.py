@@ -0,0 +1,361 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+from urllib.request import Request, urlopen
+
+# Local stand-in for query.wikidata.org and the Wikidata action API.
+# Responses are generated from the QIDs in each request, so any entity exists
+# and links to NEIGHBORS other entities. Point the app at it with
+# WIKIDATA_SPARQL_ENDPOINT=http://host:port/sparql and
+# WIKIDATA_API_ENDPOINT=http://host:port/w/api.php
+#
+# With a recordings directory, real responses saved there are served instead
+# of synthetic ones. --record fetches misses from the live endpoints and saves
+# them, so a benchmark run can be captured once and replayed offline.
+#
+# edit() (or --edit-rate) simulates edits: an edited entity gets a new
+# revision, modification time and label, as the refresh service would see.
+
+NEIGHBORS = 10
+ENTITY_URI = "http://www.wikidata.org/entity/"
+
+LIVE_ENDPOINTS = {
+    "sparql": "https://query.wikidata.org/sparql",
+    "api": "https://www.wikidata.org/w/api.php",
+}
+RECORD_USER_AGENT = "WikidataExplorerBenchmark/1.0 (recording mock responses)"
+
+
+# QID -> (edits, revision ID, modified timestamp)
+_edits = {}
+_edits_lock = threading.Lock()
+_next_revision = [2000000000]
+
+
+def edit(entity_id):
+    """Record an edit of entity_id; returns its new revision ID"""
+    with _edits_lock:
+        _next_revision[0] += 1
+        count = _edits.get(entity_id, (0,))[0] + 1
+        modified = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        _edits[entity_id] = (count, _next_revision[0], modified)
+        return _next_revision[0]
+
+
+def _revision(entity_id):
+    """(revision ID, modified timestamp); never-edited entities share a fixed old one"""
+    edited = _edits.get(entity_id)
+    if edited:
+        return edited[1], edited[2]
+    return int(entity_id[1:]) + 1000, "2024-01-01T00:00:00Z"
+
+
+def _label(entity_id):
+    edited = _edits.get(entity_id)
+    return f"Entity {entity_id}" + (f" (edit {edited[0]})" if edited else "")
+
+
+def _uri(value):
+    return {"type": "uri", "value": value}
+
+
+def _literal(value):
+    return {"type": "literal", "value": value, "xml:lang": "en"}
+
+
+def _neighbors(entity_id):
+    number = int(entity_id[1:])
+    return [f"Q{number * NEIGHBORS + k}" for k in range(1, NEIGHBORS + 1)]
+
+
+def sparql_response(query):
+    """Build a SPARQL JSON result for the query shapes sparql_service sends"""
+    ids = re.findall(r"wd:(Q\d+)", query)
+    bindings = []
+
+    if "wikibase:Property" in query:
+        for k in range(1, NEIGHBORS + 1):
+            bindings.append({
+                "property": _uri(f"{ENTITY_URI}P{k}"),
+                "propertyLabel": _literal(f"property {k}"),
+                "type": _uri("http://wikiba.se/ontology#WikibaseItem"),
+            })
+    elif "VALUES" in query and "rdfs:label" in query:
+        # Labels in several languages; the mock speaks English, German and French
+        wanted = re.findall(r'"([a-z-]+)"', query.split("IN (", 1)[1].split(")", 1)[0])
+        names = {"en": "Entity", "de": "Objekt", "fr": "Entité"}
+        for entity_id in re.findall(r"wd:([QP]\d+)", query):
+            for lang in wanted:
+                if lang in names:
+                    label = {"type": "literal", "value": f"{names[lang]} {entity_id}", "xml:lang": lang}
+                    bindings.append({"entity": _uri(ENTITY_URI + entity_id), "label": label})
+    elif "VALUES" in query:
+        for entity_id in ids:
+            bindings.append({
+                "entity": _uri(ENTITY_URI + entity_id),
+                "entityLabel": _literal(_label(entity_id)),
+                "entityDescription": _literal(f"synthetic entity {entity_id}"),
+                "type": _uri(ENTITY_URI + ("Q5" if int(entity_id[1:]) % 3 == 0 else "Q515")),
+            })
+    elif "mwapi" in query or "CONTAINS" in query:
+        match = re.search(r'(?:mwapi:search|LCASE\()\s*"([^"]*)"', query)
+        term = match.group(1) if match else "item"
+        for k in range(1, 11):
+            bindings.append({
+                "item": _uri(f"{ENTITY_URI}Q{k}"),
+                "itemLabel": _literal(f"{term} {k}"),
+                "itemDescription": _literal("synthetic search result"),
+            })
+    elif ids and "COUNT(" in query:
+        for k in range(1, NEIGHBORS + 1):
+            bindings.append({
+                "prop": _uri(f"http://www.wikidata.org/prop/direct/P{k}"),
+                "count": {"type": "literal", "value": str(k)},
+            })
+    elif ids and "UNION" in query:
+        # Property page: k values for each requested Pk, capped by the sub-select LIMIT
+        entity_id = ids[0]
+        for prop_number, cap in re.findall(r"wdt:P(\d+) \?value .*?LIMIT (\d+)", query):
+            for n in range(min(int(prop_number), int(cap))):
+                neighbor = f"Q{int(entity_id[1:]) * NEIGHBORS + n + 1}"
+                bindings.append({
+                    "entity": _uri(ENTITY_URI + entity_id),
+                    "entityLabel": _literal(_label(entity_id)),
+                    "entityDescription": _literal(f"synthetic entity {entity_id}"),
+                    "prop": _uri(f"http://www.wikidata.org/prop/direct/P{prop_number}"),
+                    "propLabel": _literal(f"property {prop_number}"),
+                    "value": _uri(ENTITY_URI + neighbor),
+                    "valueLabel": _literal(_label(neighbor)),
+                })
+    elif ids:
+        entity_id = ids[0]
+        if "?prop" not in query:
+            bindings.append({
+                "entityLabel": _literal(_label(entity_id)),
+                "entityDescription": _literal(f"synthetic entity {entity_id}"),
+            })
+        else:
+            for k, neighbor in enumerate(_neighbors(entity_id), start=1):
+                bindings.append({
+                    "entity": _uri(ENTITY_URI + entity_id),
+                    "entityLabel": _literal(_label(entity_id)),
+                    "entityDescription": _literal(f"synthetic entity {entity_id}"),
+                    "prop": _uri(f"http://www.wikidata.org/prop/direct/P{k}"),
+                    "propLabel": _literal(f"property {k}"),
+                    "value": _uri(ENTITY_URI + neighbor),
+                    "valueLabel": _literal(_label(neighbor)),
+                })
+                if "schema:version" in query:
+                    bindings[-1]["revision"] = {"type": "literal", "value": str(_revision(entity_id)[0])}
+
+    return {"head": {"vars": []}, "results": {"bindings": bindings}}
+
+
+def _claims(entity_id):
+    """The same neighbors the entity-details SPARQL answer has, as wbgetentities claims"""
+    return {
+        f"P{k}": [{
+            "rank": "normal",
+            "mainsnak": {
+                "snaktype": "value",
+                "property": f"P{k}",
+                "datatype": "wikibase-item",
+                "datavalue": {"type": "wikibase-entityid", "value": {"entity-type": "item", "id": neighbor}},
+            },
+        }]
+        for k, neighbor in enumerate(_neighbors(entity_id), start=1)
+    }
+
+
+def api_response(params):
+    """Build a response for wbgetentities and wbsearchentities"""
+    action = params.get("action")
+    if action == "wbsearchentities":
+        term = params.get("search", "item")
+        return {"search": [
+            {"id": f"Q{k}", "label": f"{term} {k}", "description": "synthetic search result"}
+            for k in range(1, int(params.get("limit", 10)) + 1)
+        ]}
+    if action == "wbgetentities":
+        entities = {}
+        for entity_id in params.get("ids", "").split("|"):
+            if not entity_id:
+                continue
+            revision, modified = _revision(entity_id)
+            entities[entity_id] = {
+                "id": entity_id,
+                "lastrevid": revision,
+                "modified": modified,
+                "labels": {"en": {"language": "en", "value": _label(entity_id)}},
+                "descriptions": {"en": {"language": "en", "value": f"synthetic entity {entity_id}"}},
+                "claims": _claims(entity_id) if "claims" in params.get("props", "claims") else {},
+            }
+        return {"entities": entities, "success": 1}
+    return {"error": {"code": "badvalue", "info": f"Unrecognized action {action}"}}
+
+
+def _normalize_query(query):
+    return " ".join(query.split())
+
+
+def recording_key(kind, params):
+    """Stable file name for a request: SPARQL by whitespace-normalized query, API by sorted params"""
+    if kind == "sparql":
+        canonical = _normalize_query(params.get("query", ""))
+    else:
+        canonical = urlencode(sorted((k, v) for k, v in params.items() if k != "format"))
+    return f"{kind}-{hashlib.sha1(canonical.encode('utf-8')).hexdigest()}.json"
+
+
+def load_recording(directory, kind, params):
+    try:
+        with open(os.path.join(directory, recording_key(kind, params)), encoding="utf-8") as f:
+            return json.load(f)["response"]
+    except FileNotFoundError:
+        return None
+
+
+def record_live(directory, kind, params):
+    """Fetch a response from the live Wikidata endpoint and save it"""
+    live_params = dict(params)
+    if kind == "sparql":
+        live_params = {"query": params.get("query", ""), "format": "json"}
+    request = Request(
+        f"{LIVE_ENDPOINTS[kind]}?{urlencode(live_params)}",
+        headers={"User-Agent": RECORD_USER_AGENT, "Accept": "application/json"},
+    )
+    with urlopen(request, timeout=60) as response:
+        payload = json.load(response)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, recording_key(kind, params)), "w", encoding="utf-8") as f:
+        json.dump({"request": params, "response": payload}, f)
+    return payload
+
+
+class MockWikidataHandler(BaseHTTPRequestHandler):
+    server_version = "MockWikidata/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        settings = self.server.settings
+        parsed = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+
+        if settings["latency"]:
+            time.sleep(settings["latency"] + random.uniform(0, settings["jitter"]))
+
+        failing = settings["error_endpoint"] in ("all", "sparql" if parsed.path.endswith("/sparql") else "api")
+        if failing and settings["error_rate"] and random.random() < settings["error_rate"]:
+            self.server.stats["injected_errors"] += 1
+            self._send(settings["error_status"], {"error": "injected failure"}, retry_after=settings["retry_after"])
+            return
+
+        if parsed.path.endswith("/sparql"):
+            kind, synthetic = "sparql", sparql_response
+            argument = params.get("query", "")
+        elif parsed.path.endswith("/api.php"):
+            kind, synthetic = "api", api_response
+            argument = params
+        else:
+            self._send(404, {"error": "not found"})
+            return
+
+        directory = settings["recordings"]
+        if directory:
+            payload = load_recording(directory, kind, params)
+            if payload is None and settings["record"]:
+                try:
+                    payload = record_live(directory, kind, params)
+                except Exception as e:
+                    self._send(502, {"error": f"recording failed: {e}"})
+                    return
+            if payload is not None:
+                self.server.stats["recorded"] += 1
+                self._send(200, payload)
+                return
+        self.server.stats["synthetic"] += 1
+        self._send(200, synthetic(argument))
+
+    def _send(self, status, payload, retry_after=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if retry_after is not None:
+            self.send_header("Retry-After", str(retry_after))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_server(host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503,
+                 retry_after=None, recordings=None, record=False, error_endpoint="all", edit_rate=0.0, edit_range=1000):
+    """Start the stand-in server on a background thread; returns (server, base_url)"""
+    server = ThreadingHTTPServer((host, port), MockWikidataHandler)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    server.settings = {
+        "latency": latency,
+        "jitter": jitter,
+        "error_rate": error_rate,
+        "error_status": error_status,
+        "error_endpoint": error_endpoint,
+        "retry_after": retry_after,
+        "recordings": recordings,
+        "record": record,
+    }
+    server.stats = {"recorded": 0, "synthetic": 0, "injected_errors": 0}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    if edit_rate:
+        threading.Thread(target=_edit_randomly, args=(edit_rate, edit_range), daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def _edit_randomly(rate, entity_range):
+    """Edit random entities among Q1..Q<entity_range>, rate edits per second"""
+    while True:
+        time.sleep(1 / rate)
+        edit(f"Q{random.randint(1, entity_range)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the Wikidata endpoints")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency, up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with an error")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--error-endpoint", choices=("all", "sparql", "api"), default="all",
+                        help="Only inject errors into this endpoint")
+    parser.add_argument("--recordings", help="Directory of recorded responses to serve before synthetic ones")
+    parser.add_argument("--record", action="store_true", help="Fetch and save responses missing from --recordings")
+    parser.add_argument("--edit-rate", type=float, default=0.0, help="Simulated edits per second")
+    parser.add_argument("--edit-range", type=int, default=1000, help="Edit random entities among Q1..Q<N>")
+    args = parser.parse_args()
+    if args.record and not args.recordings:
+        parser.error("--record needs --recordings")
+
+    server, base_url = start_server(
+        args.host, args.port, args.latency, args.jitter, args.error_rate, args.error_status,
+        recordings=args.recordings, record=args.record, error_endpoint=args.error_endpoint,
+        edit_rate=args.edit_rate, edit_range=args.edit_range,
+    )
+    print(f"Mock Wikidata on {base_url} (SPARQL: {base_url}/sparql, API: {base_url}/w/api.php)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import gzip
+import hashlib
+import os
+
+from services.cache_service import TTLCache
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+STATIC_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+STATIC_URL_PATH = "/static"
+
+# Fingerprinted asset URLs change whenever the file does, so they can be cached for a year
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+# Vendored so the graph works without access to a CDN
+D3_SCRIPT = "vendor/d3.v7.min.js"
+GRAPH_SCRIPT = "js/knowledge_graph.js"
+
+# Response bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+_versions = {}  # filename -> (mtime, content hash)
+
+# (body hash, encoding) -> compressed body
+compressed_cache = TTLCache(
+    maxsize=int(os.environ.get("COMPRESSED_CACHE_SIZE", 512)),
+    ttl=int(os.environ.get("COMPRESSED_CACHE_TTL", 3600)),
+    name="compressed",
+)
+
+
+def asset_version(filename):
+    """Short content hash of a file under static/, recomputed only when it changes"""
+    path = os.path.join(STATIC_FOLDER, filename)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    cached = _versions.get(filename)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, "rb") as f:
+        version = hashlib.sha1(f.read()).hexdigest()[:12]
+    _versions[filename] = (mtime, version)
+    return version
+
+
+def is_current(filename, version):
+    """True if version is the fingerprint of the file as it is now (not stale or made up)"""
+    return bool(version) and version == asset_version(filename)
+
+
+def asset_url(filename):
+    """URL of a static file with its fingerprint, for markup built outside a request"""
+    version = asset_version(filename)
+    url = f"{STATIC_URL_PATH}/{filename}"
+    return f"{url}?v={version}" if version else url
+
+
+def negotiate_encoding(accept_encoding):
+    """The best encoding the client accepts: "br" (if brotli is installed), "gzip" or None"""
+    accepted = set()
+    for part in (accept_encoding or "").lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body, key, encoding):
+    """Compress body with encoding, memoized by key (a hash of body) so each version is compressed once"""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+
+    def load():
+        if encoding == "br":
+            return brotli.compress(body, quality=BROTLI_QUALITY)
+        # mtime=0 keeps the output, and so its ETag, the same across processes
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+    return compressed_cache.get_or_load((key, encoding), load)
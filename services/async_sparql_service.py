@@ -0,0 +1,281 @@
+import asyncio
+import time
+
+import httpx
+
+from services import http_service
+from services.breaker_service import UpstreamUnavailable, breakers, sparql_limiter
+from services.search_service import HEDGE_DELAY, HedgedSearch, strategy_request
+from services.sparql_service import (
+    basic_entity_info_flow, entity_cache, entity_details_flow, normalize_query, search_cache, search_flow, search_ttl,
+)
+from services.metrics_service import timed
+
+# Async counterparts of the sparql_service API for the ASGI app (asgi.py).
+# The lookups themselves are sparql_service's flows, with the same caches and
+# store, so both paths return identical shapes; only the driver differs. Store,
+# dump and suggest-index calls block, so they run in worker threads via
+# asyncio.to_thread.
+_client = None
+
+
+def get_client():
+    """Return the shared AsyncClient, created lazily inside the running event loop"""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            headers={"User-Agent": http_service.USER_AGENT, "Accept-Encoding": "gzip, deflate"},
+            limits=httpx.Limits(
+                max_connections=http_service.POOL_MAXSIZE * 10,
+                max_keepalive_connections=http_service.POOL_MAXSIZE,
+            ),
+            timeout=httpx.Timeout(http_service.API_READ_TIMEOUT, connect=http_service.CONNECT_TIMEOUT),
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+class _SlotWaiter:
+    """
+    Non-blocking limiter.acquire: coroutines wait on an asyncio.Event that
+    the limiter's release listener sets, so the event loop is never held.
+    Every release wakes all waiters, like the limiter's notify_all.
+    """
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self._loop = None
+        self._event = None
+        limiter.add_listener(self._released)
+
+    def _released(self):
+        # Called from whichever thread released the slot
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        self._event.set()
+        self._event = asyncio.Event()
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._event = loop, asyncio.Event()
+        deadline = time.monotonic() + self.limiter.queue_timeout
+        while True:
+            # Take the event before trying, so a release in between still wakes us
+            event = self._event
+            if self.limiter.try_acquire():
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.limiter.reject()
+                return False
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+
+_slot_waiters = {sparql_limiter: _SlotWaiter(sparql_limiter)}
+
+
+async def _send(url, endpoint, upstream, params, headers, timeout):
+    breaker = breakers[upstream]
+    if not breaker.allow():
+        raise UpstreamUnavailable(f"{upstream} circuit is open")
+    limiter = sparql_limiter if upstream == "sparql" else None
+    if limiter is not None and not await _slot_waiters[limiter].acquire():
+        breaker.cancel()
+        raise UpstreamUnavailable(f"{upstream} concurrency limit reached")
+
+    start = time.perf_counter()
+    failed = True
+    try:
+        response = await get_client().get(url, params=params, headers=headers, timeout=timeout)
+        failed = response.status_code in http_service.RETRY_STATUSES
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        http_service.observe_latency(endpoint, elapsed, error=failed)
+        breaker.record(failed)
+        if limiter is not None:
+            limiter.release(elapsed, failed)
+
+
+async def request(url, endpoint, params=None, headers=None, read_timeout=http_service.API_READ_TIMEOUT, upstream="api"):
+    """Async version of http_service.request with the same retry, histogram and breaker behavior"""
+    timeout = httpx.Timeout(read_timeout, connect=http_service.CONNECT_TIMEOUT)
+    attempt = 0
+    while True:
+        try:
+            response = await _send(url, endpoint, upstream, params, headers, timeout)
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            if attempt >= http_service.MAX_RETRIES:
+                raise
+            await asyncio.sleep(http_service.backoff_delay(attempt))
+            attempt += 1
+            continue
+
+        if response.status_code not in http_service.RETRY_STATUSES or attempt >= http_service.MAX_RETRIES:
+            response.raise_for_status()
+            return response
+
+        delay = http_service.retry_after_seconds(response)
+        if delay is None:
+            delay = http_service.backoff_delay(attempt)
+        elif delay > http_service.BACKOFF_MAX:
+            response.raise_for_status()
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+async def sparql_query(query_text, read_timeout=http_service.SPARQL_READ_TIMEOUT):
+    response = await request(
+        http_service.SPARQL_ENDPOINT, "sparql",
+        params={"query": query_text, "format": "json"},
+        headers={"Accept": "application/sparql-results+json"},
+        read_timeout=read_timeout,
+        upstream="sparql",
+    )
+    return response.json()
+
+
+async def api_get(params, read_timeout=http_service.API_READ_TIMEOUT):
+    params = dict(params, format="json")
+    response = await request(http_service.API_ENDPOINT, params.get("action", "api"), params=params, read_timeout=read_timeout)
+    return response.json()
+
+
+# Loads in flight per cache key, so concurrent coroutines share one request
+_inflight = {}
+
+
+def _start_load(key, loader):
+    """Return the task loading key, starting loader() if none is in flight"""
+    task = _inflight.get(key)
+    if task is None:
+        task = _inflight[key] = asyncio.ensure_future(loader())
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    return task
+
+
+async def _coalesced(key, loader):
+    return await asyncio.shield(_start_load(key, loader))
+
+
+async def run_flow(flow):
+    """Async driver for sparql_service flows; a list of steps runs concurrently"""
+    result, error = None, None
+    while True:
+        try:
+            step = flow.send(result) if error is None else flow.throw(error)
+        except StopIteration as stop:
+            return stop.value
+        result, error = None, None
+        try:
+            if isinstance(step, list):
+                result = await asyncio.gather(*(_run_step(item) for item in step), return_exceptions=True)
+            else:
+                result = await _run_step(step)
+        except Exception as e:
+            error = e
+
+
+async def _run_step(step):
+    kind = step[0]
+    if kind == "sparql":
+        return await sparql_query(step[1])
+    if kind == "api":
+        return await api_get(step[1])
+    if kind == "search":
+        return await search_entities(*step[1:])
+    if kind == "call":
+        return await asyncio.to_thread(step[1], *step[2:])
+    raise ValueError(f"Unknown flow step {kind!r}")
+
+
+async def _run_strategy(name, query, limit, language):
+    transport, payload, timeout, parse = strategy_request(name, query, limit, language)
+    if transport == "api":
+        return parse(await api_get(payload, read_timeout=timeout))
+    return parse(await sparql_query(payload, read_timeout=timeout))
+
+
+async def search_entities(query, limit=10, language="en", strategies=None, hedge_delay=HEDGE_DELAY):
+    """Async version of search_service.search_entities, racing the strategies as tasks"""
+    race = HedgedSearch(query, strategies, hedge_delay)
+    tasks = {}
+
+    try:
+        while True:
+            name = race.next_strategy()
+            if name is not None:
+                tasks[asyncio.ensure_future(_run_strategy(name, query, limit, language))] = name
+
+            if not race.running:
+                return race.outcome()
+
+            done, _ = await asyncio.wait(tasks, timeout=race.wait_timeout(), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = tasks.pop(task)
+                try:
+                    won = race.answer(name, results=task.result())
+                except Exception as e:
+                    won = race.answer(name, error=e)
+                if won is not None:
+                    return won
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+@timed()
+async def search_wikidata(query, limit=10, language="en"):
+    """Async version of sparql_service.search_wikidata"""
+    key = (normalize_query(query), limit, language)
+    if not key[0]:
+        return []
+
+    cached = search_cache.get(key, count=True)
+    if cached is not None:
+        return cached[0]
+
+    value = await _coalesced(("search",) + key, lambda: run_flow(search_flow(*key)))
+    ttl = search_ttl(value)
+    if ttl > 0:
+        search_cache.set(key, value, ttl)
+    return value[0]
+
+
+@timed()
+async def get_basic_entity_info(entity_id):
+    """Async version of sparql_service.get_basic_entity_info"""
+    return await run_flow(basic_entity_info_flow(entity_id))
+
+
+async def _load_entity_details(entity_id):
+    """Run the entity details flow and cache its answer"""
+    entity_info = await run_flow(entity_details_flow(entity_id))
+    if entity_info is not None:
+        entity_cache.set(entity_id, entity_info)
+    return entity_info
+
+
+@timed()
+async def get_entity_details(entity_id):
+    """Async version of sparql_service.get_entity_details, sharing its cache and store"""
+    cached, refresh = entity_cache.get_revalidate(entity_id)
+    if cached is not None:
+        if refresh:
+            # Stale-while-revalidate: serve the expired copy and reload it in the background
+            _start_load(("entity", entity_id), lambda: _load_entity_details(entity_id))
+        return cached
+    return await _coalesced(("entity", entity_id), lambda: _load_entity_details(entity_id))
@@ -0,0 +1,229 @@
+import os
+import threading
+import time
+from collections import deque
+
+import requests
+
+# Circuit breaker settings, shared by every upstream
+BREAKER_WINDOW = float(os.environ.get("BREAKER_WINDOW", 30))              # seconds of outcomes considered
+BREAKER_MIN_CALLS = int(os.environ.get("BREAKER_MIN_CALLS", 5))           # before the failure rate counts
+BREAKER_FAILURE_RATE = float(os.environ.get("BREAKER_FAILURE_RATE", 0.5))
+BREAKER_COOLDOWN = float(os.environ.get("BREAKER_COOLDOWN", 15))          # seconds open before probing
+
+# Adaptive limit on in-flight SPARQL queries per process
+SPARQL_MIN_CONCURRENCY = int(os.environ.get("SPARQL_MIN_CONCURRENCY", 1))
+SPARQL_MAX_CONCURRENCY = int(os.environ.get("SPARQL_MAX_CONCURRENCY", 16))
+SPARQL_LATENCY_TARGET = float(os.environ.get("SPARQL_LATENCY_TARGET", 5))  # slower answers shrink the limit
+SPARQL_QUEUE_TIMEOUT = float(os.environ.get("SPARQL_QUEUE_TIMEOUT", 2))    # wait for a slot before shedding
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class UpstreamUnavailable(requests.RequestException):
+    """Raised without calling the upstream: its breaker is open or the limiter shed the call"""
+
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker for one upstream
+
+    Closed: calls go through and their outcomes are kept for `window` seconds.
+    Once at least min_calls outcomes are known and failure_rate of them failed,
+    the breaker opens and calls fail fast for `cooldown` seconds. It then goes
+    half-open and lets a single probe through: success closes it, failure
+    opens it again.
+    """
+
+    def __init__(self, name, window=BREAKER_WINDOW, min_calls=BREAKER_MIN_CALLS,
+                 failure_rate=BREAKER_FAILURE_RATE, cooldown=BREAKER_COOLDOWN):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.rejected = 0
+        self.opened = 0
+        self._outcomes = deque()  # (time, failed)
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a call may go out now"""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.cooldown:
+                    self.rejected += 1
+                    return False
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    self.rejected += 1
+                    return False
+                self._probing = True
+            return True
+
+    def is_open(self):
+        """True while calls would be rejected (open and still cooling down)"""
+        with self._lock:
+            return self.state == OPEN and time.monotonic() - self.opened_at < self.cooldown
+
+    def record(self, failed):
+        now = time.monotonic()
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probing = False
+                if failed:
+                    self._open(now)
+                else:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                return
+            if self.state == OPEN:
+                return
+
+            self._outcomes.append((now, failed))
+            while self._outcomes and now - self._outcomes[0][0] > self.window:
+                self._outcomes.popleft()
+            failures = sum(1 for _, outcome in self._outcomes if outcome)
+            if len(self._outcomes) >= self.min_calls and failures >= self.failure_rate * len(self._outcomes):
+                self._open(now)
+
+    def cancel(self):
+        """The call allowed by allow() was never made"""
+        with self._lock:
+            self._probing = False
+
+    def _open(self, now):
+        self.state = OPEN
+        self.opened_at = now
+        self.opened += 1
+        self._outcomes.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"name": self.name, "state": self.state, "opened": self.opened, "rejected": self.rejected}
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit: grows by one per `limit` fast successes, halves on
+    a failure or an answer slower than latency_target. Callers beyond the
+    limit wait up to queue_timeout for a slot and are shed after that.
+    """
+
+    def __init__(self, name, initial=None, minimum=SPARQL_MIN_CONCURRENCY, maximum=SPARQL_MAX_CONCURRENCY,
+                 latency_target=SPARQL_LATENCY_TARGET, queue_timeout=SPARQL_QUEUE_TIMEOUT):
+        self.name = name
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(initial or max(minimum, maximum // 2))
+        self.latency_target = latency_target
+        self.queue_timeout = queue_timeout
+        self.inflight = 0
+        self.shed = 0
+        self._condition = threading.Condition()
+        self._listeners = []
+
+    def acquire(self, timeout=None):
+        """Take a slot, waiting up to timeout (default queue_timeout); False if shed"""
+        deadline = time.monotonic() + (self.queue_timeout if timeout is None else timeout)
+        with self._condition:
+            while self.inflight >= int(self.limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.shed += 1
+                    return False
+                self._condition.wait(remaining)
+            self.inflight += 1
+            return True
+
+    def try_acquire(self):
+        """Take a slot if one is free, without waiting or counting a refusal (for callers that wait elsewhere)"""
+        with self._condition:
+            if self.inflight >= int(self.limit):
+                return False
+            self.inflight += 1
+            return True
+
+    def reject(self):
+        """Count a call shed by a caller that waited elsewhere"""
+        with self._condition:
+            self.shed += 1
+
+    def release(self, seconds, failed):
+        with self._condition:
+            self.inflight -= 1
+            if failed or seconds > self.latency_target:
+                self.limit = max(self.minimum, self.limit / 2)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+        for callback in self._listeners:
+            callback()
+
+    def add_listener(self, callback):
+        """Call callback() from the releasing thread after every release, to wake waiters on other loops"""
+        self._listeners.append(callback)
+
+    def stats(self):
+        with self._condition:
+            return {"name": self.name, "limit": int(self.limit), "inflight": self.inflight, "shed": self.shed}
+
+
+class TokenBucket:
+    """
+    Rate budget for background work: rate tokens per second on average, in
+    bursts of up to burst tokens
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, wanted=1):
+        """Block until at least one token is free; returns how many of wanted were granted"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+                self._refilled_at = now
+                if self._tokens >= 1:
+                    granted = min(wanted, int(self._tokens))
+                    self._tokens -= granted
+                    return granted
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def give_back(self, amount):
+        """Return tokens taken but not spent"""
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + amount)
+
+
+breakers = {
+    "sparql": CircuitBreaker("sparql"),
+    "api": CircuitBreaker("api"),
+}
+
+sparql_limiter = AdaptiveLimiter("sparql")
+
+
+def upstream_available(upstream):
+    """False while the upstream's breaker is open, so callers can skip straight to a fallback"""
+    return not breakers[upstream].is_open()
+
+
+def get_breaker_stats():
+    return {
+        "breakers": {name: breaker.stats() for name, breaker in breakers.items()},
+        "limiters": {sparql_limiter.name: sparql_limiter.stats()},
+    }
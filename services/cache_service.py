@@ -0,0 +1,203 @@
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+
+# Every live cache, so metrics can report on all of them
+_instances = weakref.WeakSet()
+
+
+def all_caches():
+    """Return the caches created so far, ordered by name"""
+    return sorted(list(_instances), key=lambda cache: cache.name)
+
+
+class _InFlight:
+    """A pending load that concurrent callers for the same key wait on"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """
+    Thread-safe in-process cache with TTL expiry and LRU eviction
+
+    Concurrent misses for the same key are coalesced so only one loader call
+    is in flight at a time. If stale_ttl is set, entries that have expired
+    less than stale_ttl seconds ago are returned immediately while a background
+    thread refreshes them (stale-while-revalidate).
+    """
+
+    def __init__(self, maxsize=1024, ttl=3600, stale_ttl=0, name="cache"):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.name = name
+        self._data = OrderedDict()  # key -> (value, expires_at)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.evictions = 0
+        self.coalesced = 0
+        _instances.add(self)
+
+    def get(self, key, default=None, count=False):
+        """
+        Return a fresh cached value or default, without loading
+        With count, the lookup is recorded as a hit or miss
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                if count:
+                    self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            if count:
+                self.hits += 1
+            return entry[0]
+
+    def get_revalidate(self, key, default=None):
+        """
+        Non-loading half of get_or_load for callers that load themselves (the
+        async service): returns (value, refresh), where refresh is True for an
+        entry served within stale_ttl of expiry that should be reloaded in the
+        background, or (default, False) on a miss. Counts hits and misses.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value, False
+                if now - expires_at < self.stale_ttl:
+                    self._data.move_to_end(key)
+                    self.stale_hits += 1
+                    return value, True
+            self.misses += 1
+            return default, False
+
+    def get_stale(self, key, default=None):
+        """Return a cached value even if it has expired (for when the source is unreachable)"""
+        with self._lock:
+            entry = self._data.get(key)
+            return default if entry is None else entry[0]
+
+    def set(self, key, value, ttl=None):
+        """Store a value, evicting the least recently used entries if full"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def touch(self, key, ttl=None):
+        """Give an entry a fresh TTL without changing its LRU position; False if it is gone"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False
+            self._data[key] = (entry[0], time.monotonic() + (self.ttl if ttl is None else ttl))
+            return True
+
+    def keys(self):
+        """Snapshot of the cached keys, expired ones included, least recently used first"""
+        with self._lock:
+            return list(self._data)
+
+    def expiring(self):
+        """Snapshot of the cached keys, expired ones included, the soonest to expire first"""
+        with self._lock:
+            entries = list(self._data.items())
+        return [key for key, _ in sorted(entries, key=lambda item: item[1][1])]
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def get_or_load(self, key, loader, ttl_for=None):
+        """
+        Return the cached value for key, calling loader() on a miss
+        None results are not cached so failed lookups are retried next time
+        ttl_for(value) may pick a TTL per value; a TTL <= 0 skips caching
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                if now - expires_at < self.stale_ttl:
+                    self._data.move_to_end(key)
+                    self.stale_hits += 1
+                    if key not in self._inflight:
+                        self._inflight[key] = _InFlight()
+                        threading.Thread(
+                            target=self._load, args=(key, loader, self._inflight[key], ttl_for), daemon=True
+                        ).start()
+                    return value
+
+            pending = self._inflight.get(key)
+            if pending is None:
+                self.misses += 1
+                pending = self._inflight[key] = _InFlight()
+                owner = True
+            else:
+                self.coalesced += 1
+                owner = False
+
+        if owner:
+            self._load(key, loader, pending, ttl_for)
+        else:
+            pending.event.wait()
+
+        if pending.error is not None:
+            raise pending.error
+        return pending.value
+
+    def _load(self, key, loader, pending, ttl_for=None):
+        try:
+            pending.value = loader()
+            if pending.value is not None:
+                ttl = ttl_for(pending.value) if ttl_for else None
+                if ttl is None or ttl > 0:
+                    self.set(key, pending.value, ttl)
+        except Exception as e:
+            pending.error = e
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            pending.event.set()
+
+    def stats(self):
+        """Return hit/miss/eviction counters and current size"""
+        with self._lock:
+            return {
+                "name": self.name,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale_hits": self.stale_hits,
+                "evictions": self.evictions,
+                "coalesced": self.coalesced,
+                "inflight": len(self._inflight),
+            }
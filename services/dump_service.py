@@ -0,0 +1,501 @@
+import bz2
+import gzip
+import json
+import mmap
+import os
+import re
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+DEFAULT_DUMP_STORE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "dump_store")
+DUMP_STORE_PATH = os.environ.get("WIKIDATA_DUMP_STORE", DEFAULT_DUMP_STORE_PATH)
+
+STORE_VERSION = 2
+
+ENTITY_URI = "http://www.wikidata.org/entity/"
+DIRECT_PROP_URI = "http://www.wikidata.org/prop/direct/"
+COMMONS_FILE_URI = "http://commons.wikimedia.org/wiki/Special:FilePath/"
+
+# Edge value kinds
+KIND_ITEM = 0      # value column holds a numeric QID
+KIND_LITERAL = 1   # value column indexes the string table
+
+# Edges are written to disk in chunks of this many rows
+WRITE_CHUNK = 65536
+
+# Column files of a store; ingest_dump writes each as {name}.bin.tmp and
+# renames them into place, meta.json last, once all are complete
+STORE_FILES = (
+    "subjects", "offsets", "counts", "edge_pid", "edge_kind", "edge_value", "strings", "strings_offsets",
+    "labels", "labels_offsets", "labels_keys", "descriptions", "descriptions_offsets", "descriptions_keys",
+)
+
+_NT_LINE = re.compile(r'^<([^>]+)>\s+<([^>]+)>\s+(.+?)\s*\.\s*$')
+_NT_LITERAL = re.compile(r'^"(.*)"(?:@([A-Za-z0-9-]+)|\^\^<[^>]+>)?$')
+RDFS_LABEL = "http://www.w3.org/2000/01/rdf-schema#label"
+SCHEMA_DESCRIPTION = "http://schema.org/description"
+_NT_ESCAPE = re.compile(r'\\(?:u([0-9A-Fa-f]{4})|U([0-9A-Fa-f]{8})|(.))')
+_NT_ESCAPES = {"t": "\t", "n": "\n", "r": "\r", "b": "\b", "f": "\f"}
+
+
+def _nt_unescape(text):
+    """Decode N-Triples string escapes (\\", \\n, \\uXXXX...)"""
+    def replace(match):
+        code = match.group(1) or match.group(2)
+        if code:
+            return chr(int(code, 16))
+        return _NT_ESCAPES.get(match.group(3), match.group(3))
+    return _NT_ESCAPE.sub(replace, text)
+
+
+def _open_dump(path):
+    """Open a plain, .gz or .bz2 dump as text"""
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rt", encoding="utf-8")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+def _snak_value(snak):
+    """Convert a JSON dump mainsnak to (kind, value) or None"""
+    if snak.get("snaktype") != "value":
+        return None
+    datavalue = snak.get("datavalue", {})
+    value = datavalue.get("value")
+    value_type = datavalue.get("type")
+
+    if value_type == "wikibase-entityid":
+        entity_id = value.get("id", "")
+        if entity_id.startswith("Q"):
+            return KIND_ITEM, entity_id
+        return KIND_LITERAL, ENTITY_URI + entity_id
+    if snak.get("datatype") == "commonsMedia":
+        return KIND_LITERAL, COMMONS_FILE_URI + value.replace(" ", "%20")
+    if value_type == "string":
+        return KIND_LITERAL, value
+    if value_type == "time":
+        return KIND_LITERAL, value.get("time", "").lstrip("+")
+    if value_type == "quantity":
+        return KIND_LITERAL, value.get("amount", "").lstrip("+")
+    if value_type == "monolingualtext":
+        return KIND_LITERAL, value.get("text", "")
+    if value_type == "globecoordinate":
+        return KIND_LITERAL, f"Point({value.get('longitude')} {value.get('latitude')})"
+    return None
+
+
+def iter_json_dump(path, languages, properties=None):
+    """
+    Stream entities from a Wikidata JSON dump (one entity per line)
+    Yields (entity_id, labels, descriptions, claims) with claims as [(pid, kind, value)]
+    """
+    with _open_dump(path) as f:
+        for line in f:
+            line = line.strip().rstrip(",")
+            if not line or line in ("[", "]"):
+                continue
+            entity = json.loads(line)
+            entity_id = entity.get("id", "")
+
+            labels = {lang: entity.get("labels", {})[lang]["value"]
+                      for lang in languages if lang in entity.get("labels", {})}
+            descriptions = {lang: entity.get("descriptions", {})[lang]["value"]
+                            for lang in languages if lang in entity.get("descriptions", {})}
+
+            claims = []
+            for pid, statements in entity.get("claims", {}).items():
+                if properties is not None and pid not in properties:
+                    continue
+                # Best rank only, like wdt: in SPARQL: preferred statements if any, else normal ones
+                best = [statement for statement in statements if statement.get("rank") == "preferred"]
+                if not best:
+                    best = [statement for statement in statements if statement.get("rank", "normal") == "normal"]
+                for statement in best:
+                    converted = _snak_value(statement.get("mainsnak", {}))
+                    if converted is not None:
+                        claims.append((pid, converted[0], converted[1]))
+
+            yield entity_id, labels, descriptions, claims
+
+
+def iter_nt_dump(path, languages, properties=None):
+    """
+    Stream entities from an N-Triples dump of truthy statements
+    Consecutive triples with the same subject are grouped into one entity
+    """
+    current = None
+    labels, descriptions, claims = {}, {}, []
+
+    with _open_dump(path) as f:
+        for line in f:
+            match = _NT_LINE.match(line)
+            if not match:
+                continue
+            subject, predicate, obj = match.groups()
+            if not subject.startswith(ENTITY_URI):
+                continue
+            entity_id = subject[len(ENTITY_URI):]
+
+            if entity_id != current:
+                if current is not None:
+                    yield current, labels, descriptions, claims
+                current = entity_id
+                labels, descriptions, claims = {}, {}, []
+
+            if predicate in (RDFS_LABEL, SCHEMA_DESCRIPTION):
+                literal = _NT_LITERAL.match(obj)
+                if literal and literal.group(2) in languages:
+                    text = _nt_unescape(literal.group(1))
+                    (labels if predicate == RDFS_LABEL else descriptions)[literal.group(2)] = text
+            elif predicate.startswith(DIRECT_PROP_URI):
+                pid = predicate[len(DIRECT_PROP_URI):]
+                if properties is not None and pid not in properties:
+                    continue
+                if obj.startswith("<" + ENTITY_URI + "Q"):
+                    claims.append((pid, KIND_ITEM, obj[len(ENTITY_URI) + 1:-1]))
+                elif obj.startswith("<"):
+                    claims.append((pid, KIND_LITERAL, obj[1:-1]))
+                else:
+                    literal = _NT_LITERAL.match(obj)
+                    if literal:
+                        claims.append((pid, KIND_LITERAL, _nt_unescape(literal.group(1))))
+
+    if current is not None:
+        yield current, labels, descriptions, claims
+
+
+def _text_key(entity_id):
+    """Sort key of an entity in the label tables: QIDs and PIDs interleaved by number"""
+    return int(entity_id[1:]) * 2 + (entity_id[0] == "P")
+
+
+def _staged(output, name):
+    """Path a store file is written to before ingest_dump renames it into place"""
+    return os.path.join(output, f"{name}.bin.tmp")
+
+
+def _write_texts(output, name, texts):
+    """Write strings as a UTF-8 blob plus an int64 offsets column (one more row than strings)"""
+    offsets = array("q", [0])
+    with open(_staged(output, name), "wb") as f:
+        for text in texts:
+            data = text.encode("utf-8")
+            f.write(data)
+            offsets.append(offsets[-1] + len(data))
+    with open(_staged(output, f"{name}_offsets"), "wb") as f:
+        offsets.tofile(f)
+
+
+def _write_text_table(output, name, table, languages):
+    """
+    Write {entity_id: {language: text}} as a sorted int64 key column
+    (entity key * number of languages + language index) and a text blob
+    """
+    rows = sorted(
+        (_text_key(entity_id) * len(languages) + languages.index(language), text)
+        for entity_id, texts in table.items()
+        for language, text in texts.items()
+    )
+    with open(_staged(output, f"{name}_keys"), "wb") as f:
+        array("q", (key for key, _ in rows)).tofile(f)
+    _write_texts(output, name, (text for _, text in rows))
+
+
+def ingest_dump(path, output=DUMP_STORE_PATH, languages=("en",), properties=None, entities=None, progress=None):
+    """
+    Stream a dump into a compact columnar store in the output directory
+
+    Only the given languages, properties (PIDs) and entities (QIDs) are kept;
+    None keeps everything. Property entities (P...) always keep their labels,
+    and so do items outside the entities subset that stored statements point
+    to. Edges are written in chunks as they are read, so memory use is bounded
+    by the label and string tables, not the dump size. Returns ingestion counts.
+
+    Every file is written under a temporary name and renamed into place only
+    once all of them are complete, meta.json last, so an interrupted ingest
+    leaves any existing store untouched, and a store is opened only once
+    its files are all in place.
+    """
+    languages = tuple(languages)
+    properties = set(properties) if properties else None
+    entities = set(entities) if entities else None
+    reader = iter_nt_dump if ".nt" in os.path.basename(path) else iter_json_dump
+
+    os.makedirs(output, exist_ok=True)
+    edge_files = {
+        name: open(_staged(output, name), "wb")
+        for name in ("edge_pid", "edge_kind", "edge_value")
+    }
+    buffers = {"edge_pid": array("i"), "edge_kind": array("b"), "edge_value": array("i")}
+    # Labels of items outside the subset, kept aside until we know which are referenced
+    other_labels = open(os.path.join(output, "other_labels.tmp"), "w", encoding="utf-8") if entities else None
+    referenced = set()
+
+    subjects = array("i")
+    starts = array("q")
+    counts = array("i")
+    labels, descriptions = {}, {}
+    strings, string_ids = [], {}
+    edge_count = 0
+    seen = 0
+
+    def flush():
+        for name, buffer in buffers.items():
+            buffer.tofile(edge_files[name])
+            del buffer[:]
+
+    try:
+        for entity_id, entity_labels, entity_descriptions, claims in reader(path, languages, properties):
+            seen += 1
+            if progress and seen % 100000 == 0:
+                progress(seen, len(subjects), edge_count)
+
+            if entity_id.startswith("P"):
+                if entity_labels:
+                    labels[entity_id] = entity_labels
+                continue
+            if not entity_id.startswith("Q"):
+                continue
+            if entities is not None and entity_id not in entities:
+                if entity_labels:
+                    other_labels.write(json.dumps([entity_id, entity_labels], ensure_ascii=False) + "\n")
+                continue
+
+            if entity_labels:
+                labels[entity_id] = entity_labels
+            if entity_descriptions:
+                descriptions[entity_id] = entity_descriptions
+
+            subjects.append(int(entity_id[1:]))
+            starts.append(edge_count)
+            counts.append(len(claims))
+            for pid, kind, value in claims:
+                buffers["edge_pid"].append(int(pid[1:]))
+                buffers["edge_kind"].append(kind)
+                if kind == KIND_ITEM:
+                    buffers["edge_value"].append(int(value[1:]))
+                    if entities is not None and value not in entities:
+                        referenced.add(value)
+                else:
+                    string_id = string_ids.get(value)
+                    if string_id is None:
+                        string_id = string_ids[value] = len(strings)
+                        strings.append(value)
+                    buffers["edge_value"].append(string_id)
+            edge_count += len(claims)
+            if len(buffers["edge_pid"]) >= WRITE_CHUNK:
+                flush()
+        flush()
+    finally:
+        for f in edge_files.values():
+            f.close()
+        if other_labels:
+            other_labels.close()
+
+    if other_labels:
+        other_path = os.path.join(output, "other_labels.tmp")
+        with open(other_path, encoding="utf-8") as f:
+            for line in f:
+                entity_id, entity_labels = json.loads(line)
+                if entity_id in referenced:
+                    labels[entity_id] = entity_labels
+        os.remove(other_path)
+
+    # Sort the per-subject index by QID so lookups can bisect
+    order = sorted(range(len(subjects)), key=subjects.__getitem__)
+    with open(_staged(output, "subjects"), "wb") as f:
+        array("i", (subjects[i] for i in order)).tofile(f)
+    with open(_staged(output, "offsets"), "wb") as f:
+        array("q", (starts[i] for i in order)).tofile(f)
+    with open(_staged(output, "counts"), "wb") as f:
+        array("i", (counts[i] for i in order)).tofile(f)
+
+    _write_texts(output, "strings", strings)
+    _write_text_table(output, "labels", labels, languages)
+    _write_text_table(output, "descriptions", descriptions, languages)
+
+    meta = {
+        "version": STORE_VERSION,
+        "source": os.path.basename(path),
+        "languages": list(languages),
+        "properties": sorted(properties) if properties else None,
+        "subjects": len(subjects),
+        "edges": edge_count,
+        "strings": len(strings),
+        "entities_read": seen,
+    }
+
+    # Unpublish the old store first, so nothing opens a mix of old and new files;
+    # stores already open keep their memory-mapped copies of the old ones
+    meta_path = os.path.join(output, "meta.json")
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    for name in STORE_FILES:
+        os.replace(_staged(output, name), os.path.join(output, f"{name}.bin"))
+    with open(f"{meta_path}.tmp", "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(f"{meta_path}.tmp", meta_path)
+    return meta
+
+
+class DumpStore:
+    """
+    Read-only view of an ingested dump
+
+    All columns, including the label and string tables, are memory-mapped,
+    so every worker shares one copy. Entities come back in the same dict
+    shape as sparql_service.get_entity_details.
+    """
+
+    def __init__(self, path=DUMP_STORE_PATH):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != STORE_VERSION:
+            raise ValueError(f"Unsupported dump store version {self.meta.get('version')}")
+
+        self._maps = []
+        self.subjects = self._column("subjects", "i")
+        self.offsets = self._column("offsets", "q")
+        self.counts = self._column("counts", "i")
+        self.edge_pid = self._column("edge_pid", "i")
+        self.edge_kind = self._column("edge_kind", "b")
+        self.edge_value = self._column("edge_value", "i")
+
+        self.languages = self.meta["languages"]
+        self._strings = (self._column("strings_offsets", "q"), self._blob("strings"))
+        self._labels = (self._column("labels_keys", "q"), self._column("labels_offsets", "q"), self._blob("labels"))
+        self._descriptions = (self._column("descriptions_keys", "q"), self._column("descriptions_offsets", "q"),
+                              self._blob("descriptions"))
+
+    def _map(self, name):
+        file_path = os.path.join(self.path, f"{name}.bin")
+        if os.path.getsize(file_path) == 0:
+            return None
+        with open(file_path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        return mapped
+
+    def _column(self, name, typecode):
+        mapped = self._map(name)
+        return array(typecode) if mapped is None else memoryview(mapped).cast(typecode)
+
+    def _blob(self, name):
+        mapped = self._map(name)
+        return b"" if mapped is None else mapped
+
+    def string(self, index):
+        """Literal value number index of the string table"""
+        offsets, blob = self._strings
+        return blob[offsets[index]:offsets[index + 1]].decode("utf-8")
+
+    def _text(self, table, entity_id, language, fallback=True):
+        """Text of entity_id in language, else (with fallback) in any stored language, else None"""
+        keys, offsets, blob = table
+        first = _text_key(entity_id) * len(self.languages)
+        if language in self.languages:
+            row = bisect_left(keys, first + self.languages.index(language))
+            if row < len(keys) and keys[row] == first + self.languages.index(language):
+                return blob[offsets[row]:offsets[row + 1]].decode("utf-8")
+        if fallback:
+            row = bisect_left(keys, first)
+            if row < len(keys) and keys[row] < first + len(self.languages):
+                return blob[offsets[row]:offsets[row + 1]].decode("utf-8")
+        return None
+
+    def _label(self, entity_id, language):
+        return self._text(self._labels, entity_id, language)
+
+    def _description(self, entity_id, language):
+        return self._text(self._descriptions, entity_id, language, fallback=False) or ""
+
+    def _edges(self, entity_id):
+        """Yield (pid, kind, value) for every stored statement of an entity"""
+        if not entity_id.startswith("Q") or not entity_id[1:].isdigit():
+            return
+        number = int(entity_id[1:])
+        lo = bisect_left(self.subjects, number)
+        hi = bisect_right(self.subjects, number, lo)
+        for row in range(lo, hi):
+            start = self.offsets[row]
+            for i in range(start, start + self.counts[row]):
+                yield self.edge_pid[i], self.edge_kind[i], self.edge_value[i]
+
+    def __contains__(self, entity_id):
+        if not entity_id.startswith("Q") or not entity_id[1:].isdigit():
+            return False
+        number = int(entity_id[1:])
+        i = bisect_left(self.subjects, number)
+        return i < len(self.subjects) and self.subjects[i] == number
+
+    def get_entity(self, entity_id, language="en"):
+        """Return an entity dict like get_entity_details, or None if not stored"""
+        if entity_id not in self:
+            return None
+
+        properties = []
+        for pid_number, kind, value in self._edges(entity_id):
+            pid = f"P{pid_number}"
+            if kind == KIND_ITEM:
+                value_id = f"Q{value}"
+                raw_value = ENTITY_URI + value_id
+                display = self._label(value_id, language) or value_id
+            else:
+                raw_value = self.string(value)
+                display = raw_value
+            properties.append({
+                "id": pid,
+                "label": self._label(pid, language) or pid,
+                "value": display,
+                "raw_value": raw_value
+            })
+
+        return {
+            "id": entity_id,
+            "label": self._label(entity_id, language) or entity_id,
+            "description": self._description(entity_id, language),
+            "properties": properties
+        }
+
+    def get_summary(self, entity_id, language="en"):
+        """Return a summary like get_entities_details_batch, or None if not stored"""
+        if entity_id not in self:
+            return None
+        image = None
+        types = []
+        for pid_number, kind, value in self._edges(entity_id):
+            if pid_number == 18 and kind == KIND_LITERAL and image is None:
+                image = self.string(value)
+            elif pid_number == 31 and kind == KIND_ITEM:
+                type_id = f"Q{value}"
+                types.append({"id": type_id, "label": self._label(type_id, language) or type_id})
+        return {
+            "id": entity_id,
+            "label": self._label(entity_id, language) or entity_id,
+            "description": self._description(entity_id, language),
+            "image": image,
+            "types": types
+        }
+
+
+_dump_store = None
+_dump_store_checked = False
+_dump_store_lock = threading.Lock()
+
+
+def get_dump_store():
+    """Return the local dump store if one has been ingested, else None"""
+    global _dump_store, _dump_store_checked
+    if not _dump_store_checked:
+        with _dump_store_lock:
+            if not _dump_store_checked:
+                if os.path.exists(os.path.join(DUMP_STORE_PATH, "meta.json")):
+                    try:
+                        _dump_store = DumpStore(DUMP_STORE_PATH)
+                    except (OSError, ValueError) as e:
+                        print(f"Could not open dump store at {DUMP_STORE_PATH}: {e}")
+                _dump_store_checked = True
+    return _dump_store
@@ -0,0 +1,338 @@
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from xml.sax.saxutils import escape, quoteattr
+
+from services.graph_service import generate_knowledge_graph
+from services.metrics_service import increment
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export needs pyarrow; JSONL and GraphML do not
+    pa = pq = None
+
+# Bulk export: build the knowledge graph of many seed entities with a worker
+# pool and stream them out as they finish. Only the graphs in flight (and, when
+# writing part files, the current part) are held in memory; GraphML also
+# remembers node and edge IDs, to write each once.
+
+EXPORT_FORMATS = ("jsonl", "graphml", "parquet")
+CONTENT_TYPES = {
+    "jsonl": "application/x-ndjson",
+    "graphml": "application/graphml+xml",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+EXPORT_WORKERS = int(os.environ.get("EXPORT_WORKERS", 4))
+MAX_EXPORT_SEEDS = int(os.environ.get("MAX_EXPORT_SEEDS", 1000))      # per /api/export request
+PARQUET_ROW_GROUP = int(os.environ.get("EXPORT_PARQUET_ROW_GROUP", 50))  # graphs per row group
+EXPORT_PART_SIZE = int(os.environ.get("EXPORT_PART_SIZE", PARQUET_ROW_GROUP))  # seeds per GraphML/Parquet part file
+PROGRESS_INTERVAL = 2.0  # seconds between progress reports
+
+GRAPHML_HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<graphml xmlns="http://graphml.graphdrawing.org/xmlns">
+  <key id="label" for="node" attr.name="label" attr.type="string"/>
+  <key id="type" for="node" attr.name="type" attr.type="string"/>
+  <key id="image" for="node" attr.name="image" attr.type="string"/>
+  <key id="seed" for="node" attr.name="seed" attr.type="string"/>
+  <key id="edge_label" for="edge" attr.name="label" attr.type="string"/>
+  <key id="relationship" for="edge" attr.name="relationship" attr.type="string"/>
+  <graph id="export" edgedefault="directed">
+"""
+GRAPHML_FOOTER = "  </graph>\n</graphml>\n"
+
+
+def check_format(fmt):
+    """Raise ValueError for an unknown format and RuntimeError if its library is missing"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}, expected one of {', '.join(EXPORT_FORMATS)}")
+    if fmt == "parquet" and pa is None:
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+
+
+def load_checkpoint(path):
+    """The seed QIDs a previous export finished, one per line in the checkpoint file"""
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def iter_graphs(entity_ids, workers=EXPORT_WORKERS, **graph_args):
+    """
+    Yield (entity_id, graph, error) in completion order, building up to
+    workers graphs at once; graph_args go to generate_knowledge_graph
+    """
+    entity_ids = iter(entity_ids)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export") as executor:
+        pending = {}
+
+        def submit_next():
+            for entity_id in entity_ids:
+                pending[executor.submit(generate_knowledge_graph, entity_id, **graph_args)] = entity_id
+                return True
+            return False
+
+        for _ in range(workers):
+            if not submit_next():
+                break
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                entity_id = pending.pop(future)
+                try:
+                    yield entity_id, future.result(), None
+                except Exception as e:
+                    yield entity_id, None, e
+                submit_next()
+
+
+def _jsonl_chunks(graphs):
+    for entity_id, graph in graphs:
+        record = {"seed": entity_id, "nodes": graph["nodes"], "links": graph["links"],
+                  "truncated": bool(graph.get("truncated"))}
+        yield (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"), [entity_id]
+
+
+def _graphml_data(key, value):
+    return f'      <data key="{key}">{escape(str(value))}</data>\n'
+
+
+def _graphml_chunks(graphs):
+    """One merged directed graph; nodes and edges reached from several seeds are written once"""
+    seen_nodes = set()
+    seen_edges = set()
+    yield GRAPHML_HEADER.encode("utf-8"), []
+    for entity_id, graph in graphs:
+        parts = []
+        for node in graph["nodes"]:
+            if node["id"] in seen_nodes:
+                continue
+            seen_nodes.add(node["id"])
+            parts.append(f"    <node id={quoteattr(node['id'])}>\n")
+            parts.append(_graphml_data("label", node.get("label", node["id"])))
+            parts.append(_graphml_data("type", node.get("type", "default")))
+            if node.get("image"):
+                parts.append(_graphml_data("image", node["image"]))
+            parts.append(_graphml_data("seed", entity_id))
+            parts.append("    </node>\n")
+        for link in graph["links"]:
+            edge = (link["source"], link["target"], link.get("relationship"))
+            if edge in seen_edges:
+                continue
+            seen_edges.add(edge)
+            parts.append(f"    <edge source={quoteattr(link['source'])} target={quoteattr(link['target'])}>\n")
+            parts.append(_graphml_data("edge_label", link.get("label", "")))
+            parts.append(_graphml_data("relationship", link.get("relationship", "")))
+            parts.append("    </edge>\n")
+        yield "".join(parts).encode("utf-8"), [entity_id]
+    yield GRAPHML_FOOTER.encode("utf-8"), []
+
+
+def _parquet_schema():
+    node = pa.struct([("id", pa.string()), ("label", pa.string()), ("type", pa.string()), ("image", pa.string())])
+    link = pa.struct([("source", pa.string()), ("target", pa.string()),
+                      ("label", pa.string()), ("relationship", pa.string())])
+    return pa.schema([("seed", pa.string()), ("truncated", pa.bool_()),
+                      ("nodes", pa.list_(node)), ("links", pa.list_(link))])
+
+
+class _ChunkSink:
+    """A write-only file object that hands back what was written since the last drain"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def writable(self):
+        return True
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parquet_chunks(graphs, row_group=PARQUET_ROW_GROUP):
+    """One row per seed with nested node and link lists, written PARQUET_ROW_GROUP graphs per row group"""
+    schema = _parquet_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    rows = []
+    seeds = []
+
+    def flush_rows():
+        writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+        rows.clear()
+        done = seeds[:]
+        seeds.clear()
+        return sink.drain(), done
+
+    for entity_id, graph in graphs:
+        rows.append({"seed": entity_id, "truncated": bool(graph.get("truncated")),
+                     "nodes": graph["nodes"], "links": graph["links"]})
+        seeds.append(entity_id)
+        if len(rows) >= row_group:
+            yield flush_rows()
+    if rows:
+        yield flush_rows()
+    writer.close()
+    yield sink.drain(), []
+
+
+def _build(entity_ids, workers, finished, progress, graph_args):
+    """
+    Start building the graphs of the seeds not in finished
+
+    Returns (stats, report, graphs): graphs yields (entity_id, graph) for the
+    seeds that were built, and report(force=False) calls progress with a copy
+    of stats at most every PROGRESS_INTERVAL seconds unless forced.
+    """
+    unique_ids = list(dict.fromkeys(entity_ids))
+    seeds = [entity_id for entity_id in unique_ids if entity_id not in finished]
+    stats = {"total": len(seeds), "skipped": len(finished.intersection(unique_ids)), "done": 0, "failed": 0,
+             "nodes": 0, "links": 0, "bytes": 0, "elapsed": 0.0, "seeds_per_second": 0.0}
+    started = time.monotonic()
+    reported = [started]
+
+    def report(force=False):
+        now = time.monotonic()
+        if progress is None or (not force and now - reported[0] < PROGRESS_INTERVAL):
+            return
+        reported[0] = now
+        stats["elapsed"] = round(now - started, 3)
+        stats["seeds_per_second"] = round(stats["done"] / stats["elapsed"], 2) if stats["elapsed"] else 0.0
+        progress(dict(stats))
+
+    def graphs():
+        for entity_id, graph, error in iter_graphs(seeds, workers, **graph_args):
+            if error is not None:
+                print(f"Export failed for {entity_id}: {error}")
+                increment("export", outcome="error")
+                stats["failed"] += 1
+                report()
+                continue
+            increment("export", outcome="ok")
+            stats["nodes"] += len(graph["nodes"])
+            stats["links"] += len(graph["links"])
+            yield entity_id, graph
+
+    return stats, report, graphs()
+
+
+CHUNK_WRITERS = {"jsonl": _jsonl_chunks, "graphml": _graphml_chunks, "parquet": _parquet_chunks}
+
+
+def export_graphs(entity_ids, fmt="jsonl", workers=EXPORT_WORKERS, progress=None, **graph_args):
+    """
+    Build the graph of every seed QID and yield the export as bytes chunks
+
+    Failed seeds are left out. progress, if given, is called with a stats
+    dict every PROGRESS_INTERVAL seconds and at the end.
+    """
+    check_format(fmt)
+    stats, report, graphs = _build(entity_ids, workers, set(), progress, graph_args)
+    for data, done in CHUNK_WRITERS[fmt](graphs):
+        if data:
+            stats["bytes"] += len(data)
+            yield data
+        if done:
+            stats["done"] += len(done)
+            report()
+    report(force=True)
+
+
+def part_path(output, number):
+    """The numbered part file of an export, e.g. graphs.3.parquet"""
+    base, extension = os.path.splitext(output)
+    return f"{base}.{number}{extension}"
+
+
+def _sync(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def export_to_file(entity_ids, output, fmt="jsonl", workers=EXPORT_WORKERS, checkpoint=None, progress=None,
+                   part_size=EXPORT_PART_SIZE, **graph_args):
+    """
+    Build the graph of every seed QID and write the export to disk; returns the paths written
+
+    JSONL goes to output, appended to when resuming. GraphML and Parquet
+    files cannot be appended to, so they are written part_size seeds per
+    numbered part file (graphs.1.parquet, graphs.2.parquet, ...), each one
+    written to a temporary file and renamed once complete.
+
+    Seeds listed in the checkpoint file are skipped, and a seed is appended
+    to it only once the data holding it is on disk: after the JSONL output
+    is synced, or after its part file is closed and renamed, so an export
+    resumed after a crash never misses a checkpointed seed (at worst the
+    last JSONL line is written again). Failed seeds are not checkpointed and
+    are retried on the next run.
+    """
+    check_format(fmt)
+    finished = load_checkpoint(checkpoint)
+    stats, report, graphs = _build(entity_ids, workers, finished, progress, graph_args)
+    checkpoint_file = open(checkpoint, "a") if checkpoint else None
+    paths = []
+
+    def commit(done):
+        stats["done"] += len(done)
+        if checkpoint_file:
+            checkpoint_file.write("".join(entity_id + "\n" for entity_id in done))
+            _sync(checkpoint_file)
+        report()
+
+    try:
+        if fmt == "jsonl":
+            paths.append(output)
+            with open(output, "ab" if finished else "wb") as f:
+                for data, done in _jsonl_chunks(graphs):
+                    f.write(data)
+                    stats["bytes"] += len(data)
+                    _sync(f)
+                    commit(done)
+        else:
+            number = 1
+            while True:
+                part = list(itertools.islice(graphs, max(1, part_size)))
+                if not part:
+                    break
+                while os.path.exists(part_path(output, number)):
+                    number += 1
+                path = part_path(output, number)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                done = []
+                with open(tmp_path, "wb") as f:
+                    for data, seeds in CHUNK_WRITERS[fmt](iter(part)):
+                        f.write(data)
+                        stats["bytes"] += len(data)
+                        done.extend(seeds)
+                    _sync(f)
+                os.replace(tmp_path, path)
+                paths.append(path)
+                commit(done)
+    finally:
+        if checkpoint_file:
+            checkpoint_file.close()
+    report(force=True)
+    return paths
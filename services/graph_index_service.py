@@ -0,0 +1,305 @@
+import threading
+
+import numpy as np
+
+ENTITY_URI = "http://www.wikidata.org/entity/"
+
+
+class GraphBuilder:
+    """
+    Insertion-ordered directed graph used to assemble one visualization
+
+    Holds just what a request needs (node and edge attribute dicts) without
+    the per-object overhead of a networkx DiGraph. Re-adding an edge between
+    the same pair replaces its attributes, as in networkx.
+    """
+
+    def __init__(self):
+        self.nodes = {}  # node ID -> attributes
+        self.edges = {}  # (source, target) -> attributes
+
+    def __contains__(self, node_id):
+        return node_id in self.nodes
+
+    def number_of_nodes(self):
+        return len(self.nodes)
+
+    def add_node(self, node_id, **attrs):
+        self.nodes.setdefault(node_id, {}).update(attrs)
+
+    def add_edge(self, source, target, **attrs):
+        self.nodes.setdefault(source, {})
+        self.nodes.setdefault(target, {})
+        self.edges[(source, target)] = attrs
+
+
+class CSRGraph:
+    """
+    Compact directed graph of Wikidata items in CSR (compressed sparse row) form
+
+    Node IDs are int32 indices into an interned QID/label table. Edges live in
+    three parallel arrays: offsets (one row per node), targets and property
+    IDs (the numeric part of the PID). New edges are buffered and folded into
+    the arrays on the next query, so merging a fetched neighborhood is cheap.
+    """
+
+    def __init__(self, max_edges=None):
+        self.max_edges = max_edges
+        self._ids = {}        # QID -> node index
+        self.qids = []        # node index -> QID
+        self.labels = []      # node index -> label
+        self._pending_src = []
+        self._pending_dst = []
+        self._pending_pid = []
+        self.offsets = np.zeros(1, dtype=np.int32)
+        self.targets = np.zeros(0, dtype=np.int32)
+        self.pids = np.zeros(0, dtype=np.int32)
+        self._reverse = None  # (offsets, sources, pids) for incoming edges
+        self._lock = threading.RLock()
+
+    def intern(self, qid, label=None):
+        """Return the node index for qid, adding it if needed"""
+        index = self._ids.get(qid)
+        if index is None:
+            index = self._ids[qid] = len(self.qids)
+            self.qids.append(qid)
+            self.labels.append(label or qid)
+        elif label and self.labels[index] == qid:
+            self.labels[index] = label
+        return index
+
+    def node_count(self):
+        return len(self.qids)
+
+    def edge_count(self):
+        with self._lock:
+            self._compact()
+            return len(self.targets)
+
+    def add_edges(self, sources, targets, pids):
+        """Buffer edges given as sequences of QIDs and PIDs ("P31" or 31)"""
+        with self._lock:
+            for source, target, pid in zip(sources, targets, pids):
+                self._pending_src.append(self.intern(source))
+                self._pending_dst.append(self.intern(target))
+                self._pending_pid.append(int(pid[1:]) if isinstance(pid, str) else int(pid))
+
+    def add_edge_arrays(self, sources, targets, pids):
+        """Buffer edges given as arrays of node indices (already interned)"""
+        with self._lock:
+            self._pending_src.extend(np.asarray(sources, dtype=np.int32).tolist())
+            self._pending_dst.extend(np.asarray(targets, dtype=np.int32).tolist())
+            self._pending_pid.extend(np.asarray(pids, dtype=np.int32).tolist())
+
+    def merge_entity(self, entity_data):
+        """Merge the item-valued properties of a get_entity_details result"""
+        if not entity_data:
+            return
+        with self._lock:
+            if self.max_edges is not None and len(self.targets) + len(self._pending_src) >= self.max_edges:
+                return
+            source = self.intern(entity_data["id"], entity_data.get("label"))
+            for prop in entity_data.get("properties", []):
+                raw_value = prop.get("raw_value", "")
+                if not raw_value.startswith(ENTITY_URI + "Q"):
+                    continue
+                target = self.intern(raw_value[len(ENTITY_URI):], prop.get("value"))
+                self._pending_src.append(source)
+                self._pending_dst.append(target)
+                self._pending_pid.append(int(prop["id"][1:]) if prop["id"][1:].isdigit() else 0)
+
+    def _compact(self):
+        """Fold buffered edges into the CSR arrays, dropping duplicates"""
+        if not self._pending_src and len(self.offsets) == len(self.qids) + 1:
+            return
+
+        sources = np.repeat(np.arange(len(self.offsets) - 1, dtype=np.int32), np.diff(self.offsets))
+        sources = np.concatenate([sources, np.asarray(self._pending_src, dtype=np.int32)])
+        targets = np.concatenate([self.targets, np.asarray(self._pending_dst, dtype=np.int32)])
+        pids = np.concatenate([self.pids, np.asarray(self._pending_pid, dtype=np.int32)])
+        self._pending_src, self._pending_dst, self._pending_pid = [], [], []
+
+        # Sort by (source, target, pid) and drop repeated edges
+        order = np.lexsort((pids, targets, sources))
+        sources, targets, pids = sources[order], targets[order], pids[order]
+        if len(sources):
+            keep = np.ones(len(sources), dtype=bool)
+            keep[1:] = (sources[1:] != sources[:-1]) | (targets[1:] != targets[:-1]) | (pids[1:] != pids[:-1])
+            sources, targets, pids = sources[keep], targets[keep], pids[keep]
+
+        counts = np.bincount(sources, minlength=len(self.qids))
+        self.offsets = np.zeros(len(self.qids) + 1, dtype=np.int32)
+        np.cumsum(counts, out=self.offsets[1:])
+        self.targets = targets.astype(np.int32, copy=False)
+        self.pids = pids.astype(np.int32, copy=False)
+        self._reverse = None
+
+    def _reverse_csr(self):
+        if self._reverse is None:
+            sources = np.repeat(np.arange(len(self.offsets) - 1, dtype=np.int32), np.diff(self.offsets))
+            order = np.argsort(self.targets, kind="stable")
+            counts = np.bincount(self.targets, minlength=len(self.qids))
+            offsets = np.zeros(len(self.qids) + 1, dtype=np.int32)
+            np.cumsum(counts, out=offsets[1:])
+            self._reverse = (offsets, sources[order], self.pids[order])
+        return self._reverse
+
+    @staticmethod
+    def _gather(offsets, values, nodes):
+        """Concatenate the CSR rows of nodes; returns (row owner, values)"""
+        starts = offsets[nodes]
+        lengths = offsets[nodes + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+        owners = np.repeat(nodes, lengths)
+        # Position of each gathered edge: its row start plus its rank within the row
+        row_starts = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        positions = row_starts + np.arange(total)
+        return owners, values[positions]
+
+    def _expand(self, frontier, directed, reverse=False):
+        """
+        Return (parents, neighbors) for every edge leaving the frontier
+        Follows incoming edges instead when reverse is set, and both when not directed
+        """
+        if directed:
+            if reverse:
+                offsets, sources, _ = self._reverse_csr()
+                return self._gather(offsets, sources, frontier)
+            return self._gather(self.offsets, self.targets, frontier)
+        parents, neighbors = self._gather(self.offsets, self.targets, frontier)
+        offsets, sources, _ = self._reverse_csr()
+        in_parents, in_neighbors = self._gather(offsets, sources, frontier)
+        return np.concatenate([parents, in_parents]), np.concatenate([neighbors, in_neighbors])
+
+    def k_hop(self, qid, k=1, directed=False, max_nodes=None):
+        """Return node indices within k hops of qid, in BFS order"""
+        with self._lock:
+            self._compact()
+            start = self._ids.get(qid)
+            if start is None:
+                return np.zeros(0, dtype=np.int32)
+
+            visited = np.zeros(len(self.qids), dtype=bool)
+            visited[start] = True
+            frontier = np.array([start], dtype=np.int32)
+            order = [frontier]
+            found = 1
+            for _ in range(k):
+                _, neighbors = self._expand(frontier, directed)
+                neighbors = np.unique(neighbors)
+                frontier = neighbors[~visited[neighbors]]
+                if max_nodes is not None and found + len(frontier) > max_nodes:
+                    frontier = frontier[:max_nodes - found]
+                if not len(frontier):
+                    break
+                visited[frontier] = True
+                order.append(frontier)
+                found += len(frontier)
+            return np.concatenate(order)
+
+    def shortest_path(self, source_qid, target_qid, directed=False, max_hops=6):
+        """
+        Return the QIDs on a shortest path between two items, or None
+        Searches from both ends at once, always expanding the smaller frontier
+        """
+        with self._lock:
+            self._compact()
+            source = self._ids.get(source_qid)
+            target = self._ids.get(target_qid)
+            if source is None or target is None:
+                return None
+            if source == target:
+                return [source_qid]
+
+            # Per side: parent of each reached node and its distance from that side's root
+            parent = [np.full(len(self.qids), -1, dtype=np.int32) for _ in range(2)]
+            distance = [np.full(len(self.qids), -1, dtype=np.int32) for _ in range(2)]
+            frontier = [np.array([source], dtype=np.int32), np.array([target], dtype=np.int32)]
+            for side, root in enumerate((source, target)):
+                parent[side][root] = root
+                distance[side][root] = 0
+
+            for _ in range(max_hops):
+                side = 0 if len(frontier[0]) <= len(frontier[1]) else 1
+                other = 1 - side
+                parents, neighbors = self._expand(frontier[side], directed, reverse=side == 1)
+                fresh = parent[side][neighbors] == -1
+                parents, neighbors = parents[fresh], neighbors[fresh]
+                # Keep the first parent seen for each newly reached node
+                neighbors, first = np.unique(neighbors, return_index=True)
+                if not len(neighbors):
+                    return None
+                parent[side][neighbors] = parents[first]
+                distance[side][neighbors] = distance[side][parents[first[0]]] + 1
+                frontier[side] = neighbors
+
+                met = neighbors[distance[other][neighbors] != -1]
+                if len(met):
+                    meet = int(met[np.argmin(distance[other][met])])
+                    return self._join_paths(parent, source, target, meet)
+            return None
+
+    def _join_paths(self, parent, source, target, meet):
+        forward = [meet]
+        while forward[-1] != source:
+            forward.append(int(parent[0][forward[-1]]))
+        backward = [meet]
+        while backward[-1] != target:
+            backward.append(int(parent[1][backward[-1]]))
+        return [self.qids[i] for i in forward[::-1] + backward[1:]]
+
+    def degree_ranking(self, top=10, directed=False):
+        """Return [(qid, degree)] for the best-connected nodes"""
+        with self._lock:
+            self._compact()
+            degree = np.diff(self.offsets).astype(np.int64)
+            if not directed:
+                degree += np.bincount(self.targets, minlength=len(self.qids))
+            top = min(top, len(degree))
+            if top == 0:
+                return []
+            best = np.argpartition(-degree, top - 1)[:top]
+            best = best[np.argsort(-degree[best], kind="stable")]
+            return [(self.qids[i], int(degree[i])) for i in best]
+
+    def subgraph(self, nodes):
+        """Return the edges among nodes in the {"nodes", "links"} visualization format"""
+        with self._lock:
+            self._compact()
+            nodes = np.asarray(nodes, dtype=np.int32)
+            member = np.zeros(len(self.qids), dtype=bool)
+            member[nodes] = True
+            sources, targets = self._gather(self.offsets, self.targets, nodes)
+            _, pids = self._gather(self.offsets, self.pids, nodes)
+            inside = member[targets]
+            return {
+                "nodes": [
+                    {"id": self.qids[i], "label": self.labels[i], "type": "related"}
+                    for i in nodes.tolist()
+                ],
+                "links": [
+                    {
+                        "source": self.qids[s],
+                        "target": self.qids[t],
+                        "label": f"Property:P{p}",
+                        "relationship": f"Property:P{p}"
+                    }
+                    for s, t, p in zip(sources[inside].tolist(), targets[inside].tolist(), pids[inside].tolist())
+                ],
+            }
+
+    def nbytes(self):
+        """Approximate memory used by the edge arrays and node tables"""
+        with self._lock:
+            self._compact()
+            arrays = self.offsets.nbytes + self.targets.nbytes + self.pids.nbytes
+            if self._reverse is not None:
+                arrays += sum(a.nbytes for a in self._reverse)
+            return {
+                "arrays": arrays,
+                "nodes": len(self.qids),
+                "edges": len(self.targets),
+            }
+
@@ -1,49 +1,56 @@
-import networkx as nx
-from services.sparql_service import get_entity_details
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from services.sparql_service import get_entity_details, get_entities_details_batch
+from services.cache_service import TTLCache
+from services.graph_index_service import CSRGraph, GraphBuilder
+from services.property_service import property_metadata
+from services.metrics_service import timed
+from services.layout_service import apply_layout, compute_layout
+from services.label_service import localize_graph
 import plotly.graph_objects as go
 import json
 
+# Bounded pool used to fetch each frontier level of a multi-hop graph concurrently
+GRAPH_WORKERS = int(os.environ.get("GRAPH_WORKERS", 8))
+_executor = ThreadPoolExecutor(max_workers=GRAPH_WORKERS, thread_name_prefix="graph")
 
+# Defaults that keep deep expansions from running away
+DEFAULT_MAX_NODES = 200
+DEFAULT_DEADLINE = 10.0
 
+# Finished graphs by (entity, max_relations, depth, fanout), so repeat views
+# of the graph API don't rebuild them
+graph_cache = TTLCache(
+    maxsize=int(os.environ.get("GRAPH_CACHE_SIZE", 512)),
+    ttl=int(os.environ.get("GRAPH_CACHE_TTL", 600)),
+    name="graph",
+)
 
-def generate_knowledge_graph(entity_id, max_relations=15):
+
+# Properties left out of graphs and paths: they link nearly everything through
+# a few hub classes ("human", "male")
+SKIPPED_PROPERTIES = ("P31", "P21")
+
+
+def _add_relations(G, entity_id, entity_data, max_relations, max_nodes=None):
     """
-    Generate a knowledge graph for visualization starting from the given entity
-    Returns data structure suitable for visualization
+    Add an entity's properties to the graph as edges to related entities and media
+    Returns the IDs of Wikidata entities that were newly added as nodes
     """
-    # Create a directed graph
-    G = nx.DiGraph()
-    
-    # Start with the main entity
-    entity_data = get_entity_details(entity_id)
-    if not entity_data:
-        print(f"No entity data found for {entity_id}")
-        # Create a minimal graph with just the entity
-        G.add_node(entity_id, label=entity_id, type="main", image=None)
-        nodes = [{"id": entity_id, "label": entity_id, "type": "main"}]
-        return {"nodes": nodes, "links": []}
-    
-    # Add the main entity as a node
-    G.add_node(entity_id, 
-              label=entity_data["label"], 
-              type="main",
-              image=None)  # Main entity is centered
-    
-    # Add edges for each property (limited to max_relations)
+    new_entities = []
     relations_added = 0
-    
-    # Process properties
-    if not entity_data.get("properties"):
-        print(f"No properties found for entity {entity_id}")
-        nodes = [{"id": entity_id, "label": entity_data["label"], "type": "main"}]
-        return {"nodes": nodes, "links": []}
-    
+
     for prop in entity_data["properties"][:max_relations*2]:  # Look at more properties
         # Skip certain internal property IDs
-        if prop["id"] in ["P31", "P21"]:
+        if prop["id"] in SKIPPED_PROPERTIES:
             continue
-            
+
+        if max_nodes is not None and G.number_of_nodes() >= max_nodes:
+            break
+
         # Determine if this property represents an entity or media
+        category = property_metadata.category(prop["id"], prop["label"])
         is_wikidata = "wikidata.org/entity/" in prop["raw_value"]
         is_commons = "commons.wikimedia.org" in prop["raw_value"] or "wikimedia.org/wiki" in prop["raw_value"]
         is_url = prop["raw_value"].startswith("http") and not is_wikidata
@@ -58,40 +65,31 @@ def generate_knowledge_graph(entity_id, max_relations=15):
         if is_wikidata:
             object_id = prop["raw_value"].split("/")[-1]
             
-            # Determine node type
-            node_type = "related"
-            
-            # Check property type
-            if "location" in prop["label"].lower() or "place" in prop["label"].lower() or "country" in prop["label"].lower():
-                node_type = "location"
-            elif ("person" in prop["label"].lower() or "creator" in prop["label"].lower() or 
-                  "author" in prop["label"].lower() or "director" in prop["label"].lower() or
-                  "founder" in prop["label"].lower() or "head" in prop["label"].lower()):
-                node_type = "person"
+            # Determine node type from the property's category
+            node_type = category if category in ("location", "person") else "related"
             
-            # Add the object entity as a node
-            G.add_node(object_id, 
-                      label=prop["value"], 
-                      type=node_type,
-                      image=None)
+            # Add the object entity as a node, keeping whatever an earlier level knew about it
+            if object_id not in G:
+                G.add_node(object_id, 
+                          label=prop["value"], 
+                          type=node_type,
+                          image=None)
+                new_entities.append(object_id)
             
-            # Add an edge from the main entity to this object
+            # Add an edge from the entity to this object
             G.add_edge(entity_id, object_id, label=relation_label, relationship=relation_label)
             
             relations_added += 1
         
         # Handle Commons files and images
-        elif is_commons or ("image" in prop["label"].lower() and is_url):
+        elif is_commons or (category == "media" and is_url):
             # For Commons files, try to get a clean ID
-            if is_commons:
-                if "File:" in prop["raw_value"]:
-                    parts = prop["raw_value"].split("File:")
-                    file_name = parts[1].split("?")[0].replace("_", " ")
-                    clean_id = f"File:{file_name}"
-                else:
-                    clean_id = f"media_{relations_added}"
+            if is_commons and "File:" in prop["raw_value"]:
+                parts = prop["raw_value"].split("File:")
+                file_name = parts[1].split("?")[0].replace("_", " ")
+                clean_id = f"File:{file_name}"
             else:
-                clean_id = f"media_{relations_added}"
+                clean_id = f"media_{entity_id}_{relations_added}"
             
             # Add as an image node
             G.add_node(clean_id, 
@@ -106,10 +104,83 @@ def generate_knowledge_graph(entity_id, max_relations=15):
             
         if relations_added >= max_relations:
             break
-    
-    # Convert NetworkX graph to a format suitable for visualization
+
+    return new_entities
+
+
+def _expand_level(G, frontier, fanout, max_nodes, deadline_at):
+    """
+    Fetch every entity in the frontier concurrently and add its relations
+    Returns the next frontier and whether the budget or deadline cut the level short
+    """
+    futures = {_executor.submit(get_entity_details, node_id): node_id for node_id in frontier}
+    next_frontier = []
+    truncated = False
+
+    pending = set(futures)
+    while pending:
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            truncated = True
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            node_id = futures[future]
+            try:
+                entity_data = future.result()
+            except Exception as e:
+                print(f"Error expanding {node_id}: {e}")
+                continue
+            if not entity_data or not entity_data.get("properties"):
+                continue
+            if G.number_of_nodes() >= max_nodes:
+                truncated = True
+                continue
+            next_frontier.extend(_add_relations(G, node_id, entity_data, fanout, max_nodes))
+
+    # Anything not yet started is abandoned; running fetches still fill the entity cache
+    for future in pending:
+        future.cancel()
+
+    return next_frontier, truncated
+
+
+# Wikidata class for humans; neighbors that are instances of it are drawn as people
+HUMAN_QID = "Q5"
+
+
+def _hydrate_nodes(G):
+    """Fill in images, labels and person types for entity nodes with one batched lookup"""
+    entity_nodes = [
+        node_id for node_id, data in G.nodes.items()
+        if data.get("type") not in ("main", "image")
+    ]
+    if not entity_nodes:
+        return
+
+    try:
+        summaries = get_entities_details_batch(entity_nodes)
+    except Exception as e:
+        print(f"Error hydrating graph nodes: {e}")
+        return
+
+    for node_id in entity_nodes:
+        summary = summaries.get(node_id)
+        if not summary:
+            continue
+        data = G.nodes[node_id]
+        if summary.get("image"):
+            data["image"] = summary["image"]
+        if data.get("label") in (None, node_id):
+            data["label"] = summary["label"]
+        if any(t["id"] == HUMAN_QID for t in summary.get("types", [])):
+            data["type"] = "person"
+
+
+def _to_graph_data(G):
+    """Convert a GraphBuilder to the node and link lists used for visualization"""
     nodes = []
-    for node_id, data in G.nodes(data=True):
+    for node_id, data in G.nodes.items():
         node_info = {
             "id": node_id,
             "label": data.get("label", node_id),
@@ -121,221 +192,270 @@ def generate_knowledge_graph(entity_id, max_relations=15):
         nodes.append(node_info)
     
     links = []
-    for source, target, data in G.edges(data=True):
+    for (source, target), data in G.edges.items():
         links.append({
             "source": source,
             "target": target,
             "label": data.get("label", "related to"),
             "relationship": data.get("relationship", "related to")
         })
+    return nodes, links
+
+
+@timed()
+def generate_knowledge_graph(entity_id, max_relations=15, depth=1, fanout=None,
+                             max_nodes=DEFAULT_MAX_NODES, deadline=DEFAULT_DEADLINE, hydrate=True,
+                             languages=None):
+    """
+    Generate a knowledge graph for visualization starting from the given entity
+    Returns data structure suitable for visualization
+
+    The graph is expanded breadth-first up to depth hops. The root entity keeps
+    up to max_relations edges, every deeper entity up to fanout (defaults to
+    max_relations). Each level is fetched concurrently; if max_nodes or the
+    deadline (seconds) is hit, the partial graph is returned with "truncated" set.
+    With hydrate, neighbor images and types are filled in by one batched query.
+    With languages (a fallback chain like ("de", "en", "mul")), node labels
+    are taken from the label cache in the first language that has one.
+    """
+    deadline_at = time.monotonic() + deadline
+    if fanout is None:
+        fanout = max_relations
+
+    # Create a directed graph
+    G = GraphBuilder()
+    
+    # Start with the main entity
+    entity_data = get_entity_details(entity_id)
+    if not entity_data:
+        print(f"No entity data found for {entity_id}")
+        # Create a minimal graph with just the entity
+        G.add_node(entity_id, label=entity_id, type="main", image=None)
+        nodes = [{"id": entity_id, "label": entity_id, "type": "main"}]
+        return {"nodes": nodes, "links": []}
+    
+    # Add the main entity as a node
+    G.add_node(entity_id, 
+              label=entity_data["label"], 
+              type="main",
+              image=None)  # Main entity is centered
+    
+    # Process properties
+    if not entity_data.get("properties"):
+        print(f"No properties found for entity {entity_id}")
+        nodes = [{"id": entity_id, "label": entity_data["label"], "type": "main"}]
+        return {"nodes": nodes, "links": []}
+    
+    frontier = _add_relations(G, entity_id, entity_data, max_relations, max_nodes)
+    truncated = False
+    for _ in range(depth - 1):
+        if not frontier:
+            break
+        if G.number_of_nodes() >= max_nodes or time.monotonic() >= deadline_at:
+            truncated = True
+            break
+        frontier, truncated = _expand_level(G, frontier, fanout, max_nodes, deadline_at)
+        if truncated:
+            break
+    
+    if hydrate:
+        _hydrate_nodes(G)
+
+    nodes, links = _to_graph_data(G)
 
     # Add a check to make sure we have nodes
     if not nodes:
         nodes = [{"id": entity_id, "label": entity_data["label"], "type": "main"}]
     
-    return {
+    graph = {
         "nodes": nodes,
         "links": links
     }
+    if truncated:
+        graph["truncated"] = True
+    if languages:
+        graph = localize_graph(graph, languages)
+    return graph
 
-def generate_3d_graph_html(graph_data):
+def get_knowledge_graph(entity_id, max_relations=15, depth=1, fanout=None, layout=None, languages=None):
     """
-    Generate an HTML string containing a 2D force-directed graph visualization
-    Uses D3.js for visualization to display images directly in nodes
+    Cached generate_knowledge_graph for the JSON API
+    Partial (truncated) graphs are not cached so a later request can complete them
+    With layout ("spectral" or "force"), nodes carry precomputed x/y positions;
+    laid-out graphs are cached separately, next to the plain graph.
+    Graphs are cached once for all languages and relabeled per request.
     """
-    # Convert graph data to D3 format
-    nodes = graph_data["nodes"]
-    links = graph_data["links"]
-    
-    if not nodes:
-        return "<div class='error'>No graph data available</div>"
-    
-    # Prepare data for D3.js
-    d3_nodes = []
-    for node in nodes:
-        node_data = {
-            "id": node["id"],
-            "label": node["label"],
-            "type": node["type"]
-        }
-        # Add image URL if available
-        if "image" in node and node["image"]:
-            node_data["image"] = node["image"]
-        d3_nodes.append(node_data)
-    
-    d3_links = []
-    for link in links:
-        d3_links.append({
-            "source": link["source"],
-            "target": link["target"],
-            "label": link["label"]
-        })
-    
-    # Create a D3.js force-directed graph
-    d3_data = {
-        "nodes": d3_nodes,
-        "links": d3_links
-    }
-    
-    # Generate HTML with embedded D3.js visualization
-    html_content = f"""
-    <div id="knowledge-graph-container" style="width:100%; height:600px; border:1px solid #ddd; position:relative;">
-        <div id="graph-legend" style="position:absolute; top:10px; right:10px; background:rgba(255,255,255,0.9); padding:10px; border-radius:5px; z-index:1000;">
-            <div><span style="display:inline-block; width:15px; height:15px; background-color:rgb(66, 133, 244); border-radius:50%; margin-right:5px;"></span> Main Entity</div>
-            <div><span style="display:inline-block; width:15px; height:15px; background-color:rgb(52, 168, 83); border-radius:50%; margin-right:5px;"></span> Person</div>
-            <div><span style="display:inline-block; width:15px; height:15px; background-color:rgb(66, 197, 244); border-radius:50%; margin-right:5px;"></span> Location</div>
-            <div><span style="display:inline-block; width:15px; height:15px; background-color:rgb(251, 188, 5); border-radius:50%; margin-right:5px;"></span> Image</div>
-            <div><span style="display:inline-block; width:15px; height:15px; background-color:rgb(234, 67, 53); border-radius:50%; margin-right:5px;"></span> Other</div>
-        </div>
-    </div>
-    
-    <script src="https://d3js.org/d3.v7.min.js"></script>
-    <script>
-    (function() {{
-        // Graph data
-        const data = {json.dumps(d3_data)};
-        
-        // D3.js force-directed graph
-        const container = document.getElementById('knowledge-graph-container');
-        const width = container.clientWidth;
-        const height = container.clientHeight;
-        
-        // Create SVG
-        const svg = d3.select('#knowledge-graph-container')
-            .append('svg')
-            .attr('width', width)
-            .attr('height', height)
-            .call(d3.zoom().on("zoom", function(event) {{
-                svg.attr("transform", event.transform);
-            }}))
-            .append("g");
-        
-        // Node color based on type
-        const colorMap = {{
-            'main': 'rgb(66, 133, 244)',  // Blue
-            'person': 'rgb(52, 168, 83)', // Green
-            'location': 'rgb(66, 197, 244)', // Light blue
-            'image': 'rgb(251, 188, 5)',  // Yellow
-            'default': 'rgb(234, 67, 53)' // Red
-        }};
-        
-        // Create force simulation
-        const simulation = d3.forceSimulation(data.nodes)
-            .force('link', d3.forceLink(data.links).id(d => d.id).distance(150))
-            .force('charge', d3.forceManyBody().strength(-300))
-            .force('center', d3.forceCenter(width / 2, height / 2))
-            .force('collision', d3.forceCollide().radius(60));
-        
-        // Create links
-        const link = svg.append('g')
-            .selectAll('path')
-            .data(data.links)
-            .enter().append('path')
-            .attr('stroke', '#999')
-            .attr('stroke-opacity', 0.6)
-            .attr('stroke-width', 1.5)
-            .attr('fill', 'none');
-        
-        // Create link labels
-        const linkText = svg.append('g')
-            .selectAll('text')
-            .data(data.links)
-            .enter().append('text')
-            .attr('fill', '#666')
-            .attr('font-size', '10px')
-            .attr('text-anchor', 'middle')
-            .attr('dominant-baseline', 'text-after-edge')
-            .attr('dy', -3)
-            .text(d => d.label);
-        
-        // Create nodes
-        const node = svg.append('g')
-            .selectAll('.node')
-            .data(data.nodes)
-            .enter().append('g')
-            .attr('class', 'node')
-            .call(d3.drag()
-                .on('start', dragstarted)
-                .on('drag', dragged)
-                .on('end', dragended));
-        
-        // Add circles to all nodes
-        node.append('circle')
-            .attr('r', d => d.type === 'main' ? 25 : 20)
-            .attr('fill', d => colorMap[d.type] || colorMap['default'])
-            .attr('stroke', '#fff')
-            .attr('stroke-width', 2);
-        
-        // Add images for nodes with image URLs
-        node.filter(d => d.image && d.image.startsWith('http'))
-            .append('clipPath')
-            .attr('id', d => `clip-${{d.id.replace(/[^a-zA-Z0-9]/g, '_')}}`)
-            .append('circle')
-            .attr('r', 18);
-        
-        node.filter(d => d.image && d.image.startsWith('http'))
-            .append('image')
-            .attr('xlink:href', d => d.image)
-            .attr('x', -18)
-            .attr('y', -18)
-            .attr('width', 36)
-            .attr('height', 36)
-            .attr('clip-path', d => `url(#clip-${{d.id.replace(/[^a-zA-Z0-9]/g, '_')}})`);
-        
-        // Add text labels
-        node.append('text')
-            .attr('dy', 30)
-            .attr('text-anchor', 'middle')
-            .attr('fill', '#333')
-            .text(d => d.label)
-            .style('font-size', '12px')
-            .each(function(d) {{
-                const textLength = this.getComputedTextLength();
-                if (textLength > 100) {{
-                    d3.select(this).text(d.label.substring(0, 12) + '...');
-                }}
-            }});
-        
-        // Update positions on each tick
-        simulation.on('tick', () => {{
-            // Update link paths to create a curved line
-            link.attr('d', function(d) {{
-                const dx = d.target.x - d.source.x,
-                      dy = d.target.y - d.source.y,
-                      dr = Math.sqrt(dx * dx + dy * dy);
-                return `M${{d.source.x}},${{d.source.y}}A${{dr}},${{dr}} 0 0,1 ${{d.target.x}},${{d.target.y}}`;
-            }});
-            
-            // Update link text positions
-            linkText.attr('transform', function(d) {{
-                const midX = (d.source.x + d.target.x) / 2;
-                const midY = (d.source.y + d.target.y) / 2;
-                return `translate(${{midX}},${{midY}})`;
-            }});
-            
-            // Update node positions
-            node.attr('transform', d => `translate(${{d.x}},${{d.y}})`);
-        }});
-        
-        // Drag functions
-        function dragstarted(event, d) {{
-            if (!event.active) simulation.alphaTarget(0.3).restart();
-            d.fx = d.x;
-            d.fy = d.y;
-        }}
-        
-        function dragged(event, d) {{
-            d.fx = event.x;
-            d.fy = event.y;
-        }}
-        
-        function dragended(event, d) {{
-            if (!event.active) simulation.alphaTarget(0);
-            d.fx = null;
-            d.fy = null;
-        }}
-    }})();
-    </script>
+    if languages:
+        return localize_graph(get_knowledge_graph(entity_id, max_relations, depth, fanout, layout), languages)
+    key = (entity_id, max_relations, depth, fanout)
+    if layout:
+        return graph_cache.get_or_load(
+            key + (layout,),
+            lambda: _layout_graph(get_knowledge_graph(entity_id, max_relations, depth, fanout), layout),
+            ttl_for=lambda graph: 0 if graph.get("truncated") else None,
+        )
+    return graph_cache.get_or_load(
+        key,
+        lambda: generate_knowledge_graph(entity_id, max_relations=max_relations, depth=depth, fanout=fanout),
+        ttl_for=lambda graph: 0 if graph.get("truncated") else None,
+    )
+
+@timed("graph_layout")
+def _layout_graph(graph, method):
+    return apply_layout(graph, compute_layout(graph, method), method)
+
+# Limits for /api/path searches
+DEFAULT_PATH_HOPS = 4
+DEFAULT_PATH_MAX_NODES = 2000
+PATH_BATCH_SIZE = int(os.environ.get("PATH_BATCH_SIZE", 16))
+
+
+def _item_neighbors(entity_data):
+    """Yield (neighbor_id, neighbor_label, property_id) for item-valued properties"""
+    for prop in entity_data.get("properties", []):
+        if prop["id"] in SKIPPED_PROPERTIES:
+            continue
+        if "wikidata.org/entity/Q" in prop["raw_value"]:
+            yield prop["raw_value"].split("/")[-1], prop["value"], prop["id"]
+
+
+def _fetch_batch(batch, deadline_at):
+    """Fetch a batch of entities concurrently; returns ({id: data}, whether the deadline hit)"""
+    futures = {_executor.submit(get_entity_details, node_id): node_id for node_id in batch}
+    done, pending = wait(futures, timeout=max(0.0, deadline_at - time.monotonic()))
+    for future in pending:
+        future.cancel()
+
+    results = {}
+    for future in done:
+        try:
+            results[futures[future]] = future.result()
+        except Exception as e:
+            print(f"Error expanding {futures[future]}: {e}")
+    return results, bool(pending)
+
+
+@timed()
+def find_path(from_id, to_id, max_hops=DEFAULT_PATH_HOPS,
+              max_nodes=DEFAULT_PATH_MAX_NODES, deadline=DEFAULT_DEADLINE):
     """
-    
-    return html_content
\ No newline at end of file
+    Find how two entities are connected through item-valued properties
+    Returns the path in the {"nodes", "links"} visualization format
+
+    Runs a bidirectional breadth-first search: each step expands the smaller
+    of the two frontiers, fetching it concurrently in batches of PATH_BATCH_SIZE
+    and merging the fetched statements into a CSRGraph, which is searched for
+    the shortest path once the two sides meet. Edges are followed in either
+    direction, but links keep their Wikidata direction. Adds "found" and
+    "hops", and "truncated" when max_nodes or the deadline (seconds) stopped
+    the search.
+    """
+    deadline_at = time.monotonic() + deadline
+    G = CSRGraph()
+    G.intern(from_id)
+    G.intern(to_id)
+    relations = {}  # (source, target) -> PID of a fetched statement
+    # Nodes each side has reached, and the frontier it expands next
+    reached = [{from_id}, {to_id}]
+    frontier = [[from_id], [to_id]]
+    depth = [0, 0]
+    path = [from_id] if from_id == to_id else None
+    truncated = False
+
+    while path is None:
+        # Only outgoing edges are known until an entity is fetched, so the sides
+        # can meet at any depth of the other side; expand the smaller open frontier
+        open_sides = [side for side in (0, 1) if frontier[side] and depth[side] < max_hops]
+        if not open_sides:
+            break
+        side = min(open_sides, key=lambda side: len(frontier[side]))
+        other = 1 - side
+        next_frontier = []
+
+        for start in range(0, len(frontier[side]), PATH_BATCH_SIZE):
+            batch = frontier[side][start:start + PATH_BATCH_SIZE]
+            results, timed_out = _fetch_batch(batch, deadline_at)
+            met = False
+            for node_id in batch:
+                entity_data = results.get(node_id)
+                if not entity_data:
+                    continue
+                G.intern(node_id, entity_data.get("label"))
+                neighbors = list(_item_neighbors(entity_data))
+                for neighbor, label, prop_id in neighbors:
+                    G.intern(neighbor, label)
+                    relations.setdefault((node_id, neighbor), prop_id)
+                    met = met or neighbor in reached[other]
+                    if neighbor not in reached[side]:
+                        reached[side].add(neighbor)
+                        next_frontier.append(neighbor)
+                G.add_edges([node_id] * len(neighbors), [neighbor for neighbor, _, _ in neighbors],
+                            [prop_id for _, _, prop_id in neighbors])
+
+            # A path needs a node both sides reached, so only search once they share one
+            if met:
+                path = G.shortest_path(from_id, to_id, max_hops=max_hops)
+                if path:
+                    break
+            if timed_out or len(reached[0]) + len(reached[1]) >= max_nodes:
+                truncated = True
+                break
+
+        if path or truncated:
+            break
+        depth[side] += 1
+        frontier[side] = next_frontier
+
+    if path is None:
+        graph = {"nodes": [], "links": [], "found": False, "hops": None}
+        if truncated:
+            graph["truncated"] = True
+        return graph
+
+    labels = dict(zip(G.qids, G.labels))
+    G = GraphBuilder()
+    for node_id in path:
+        G.add_node(node_id, label=labels.get(node_id, node_id),
+                   type="main" if node_id in (from_id, to_id) else "related", image=None)
+    for node_id, next_id in zip(path, path[1:]):
+        source, target = (node_id, next_id) if (node_id, next_id) in relations else (next_id, node_id)
+        relation_label = f"Property:{relations[(source, target)]}"
+        G.add_edge(source, target, label=relation_label, relationship=relation_label)
+    _hydrate_nodes(G)
+
+    nodes, links = _to_graph_data(G)
+    return {"nodes": nodes, "links": links, "found": True, "hops": len(path) - 1}
+
+
+def compact_graph(graph_data):
+    """
+    Columnar form of what the browser draws, for /api/graph?format=compact:
+    nodes as [id, label, type] rows, links as [source row, target row, label
+    index] with each distinct link label stored once. Images and precomputed
+    positions go in sparse side tables; other top-level keys are kept
+    """
+    index = {}
+    rows = []
+    images = {}
+    positions = []
+    for node in graph_data["nodes"]:
+        index[node["id"]] = len(rows)
+        if node.get("image"):
+            images[len(rows)] = node["image"]
+        # Keep precomputed layout positions
+        if "x" in node:
+            positions.append((node["x"], node["y"]))
+        rows.append((node["id"], node["label"], node["type"]))
+    link_labels = {}
+    links = []
+    for link in graph_data["links"]:
+        if link["source"] in index and link["target"] in index:
+            label = link_labels.setdefault(link["label"], len(link_labels))
+            links.append((index[link["source"]], index[link["target"]], label))
+    data = {key: value for key, value in graph_data.items() if key not in ("nodes", "links")}
+    data.update({"n": rows, "l": links, "ll": list(link_labels)})
+    if images:
+        data["img"] = images
+    if positions and len(positions) == len(rows):
+        data["xy"] = positions
+    return data
@@ -0,0 +1,206 @@
+import bisect
+import email.utils
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from services.breaker_service import UpstreamUnavailable, breakers, sparql_limiter
+
+# Wikidata endpoints; overridable so tests and benchmarks can point at a local stand-in
+SPARQL_ENDPOINT = os.environ.get("WIKIDATA_SPARQL_ENDPOINT", "https://query.wikidata.org/sparql")
+API_ENDPOINT = os.environ.get("WIKIDATA_API_ENDPOINT", "https://www.wikidata.org/w/api.php")
+
+USER_AGENT = os.environ.get("WIKIDATA_USER_AGENT", "WikidataExplorer/1.0 (https://github.com/PratikHdhameliya/Wiki-data-explorer)")
+
+CONNECT_TIMEOUT = float(os.environ.get("WIKIDATA_CONNECT_TIMEOUT", 5))
+SPARQL_READ_TIMEOUT = float(os.environ.get("WIKIDATA_SPARQL_TIMEOUT", 30))
+API_READ_TIMEOUT = float(os.environ.get("WIKIDATA_API_TIMEOUT", 10))
+
+# Connections kept open per host; extra requests wait for a free connection
+POOL_MAXSIZE = int(os.environ.get("WIKIDATA_POOL_SIZE", 10))
+
+MAX_RETRIES = int(os.environ.get("WIKIDATA_MAX_RETRIES", 2))
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class LatencyHistogram:
+    """Cumulative latency histogram for one endpoint"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, error=False):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.total += seconds
+            self.count += 1
+            if error:
+                self.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            cumulative = []
+            running = 0
+            for bound, count in zip(list(self.buckets) + ["+Inf"], self.counts):
+                running += count
+                cumulative.append((bound, running))
+            return {"buckets": cumulative, "sum": self.total, "count": self.count, "errors": self.errors}
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+
+def observe_latency(endpoint, seconds, error=False):
+    """Record one call's latency in the endpoint's histogram"""
+    histogram = _histograms.get(endpoint)
+    if histogram is None:
+        with _histograms_lock:
+            histogram = _histograms.setdefault(endpoint, LatencyHistogram())
+    histogram.observe(seconds, error)
+
+
+def get_latency_histograms():
+    """Return a snapshot of the latency histogram for every endpoint called so far"""
+    with _histograms_lock:
+        items = list(_histograms.items())
+    return {endpoint: histogram.snapshot() for endpoint, histogram in items}
+
+
+def _build_session():
+    session = requests.Session()
+    # Retries are handled in request() so Retry-After and jitter are applied consistently
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_MAXSIZE, pool_block=True, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "User-Agent": USER_AGENT,
+        "Accept-Encoding": "gzip, deflate",
+    })
+    return session
+
+
+session = _build_session()
+
+
+def retry_after_seconds(response):
+    """Parse a Retry-After header (seconds or HTTP date) into seconds, or None"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def _is_upstream_failure(response):
+    """Outcomes that count against the breaker: 429 and 5xx, not client errors like a malformed query"""
+    return response.status_code in RETRY_STATUSES
+
+
+def _send(method, url, endpoint, upstream, params, headers, read_timeout):
+    """One attempt: checks the breaker (and for SPARQL the concurrency limiter) and records the outcome"""
+    breaker = breakers[upstream]
+    if not breaker.allow():
+        raise UpstreamUnavailable(f"{upstream} circuit is open")
+    limiter = sparql_limiter if upstream == "sparql" else None
+    if limiter is not None and not limiter.acquire():
+        # Shedding is our own doing, not an upstream failure: give back a half-open probe without a verdict
+        breaker.cancel()
+        raise UpstreamUnavailable(f"{upstream} concurrency limit reached")
+
+    start = time.perf_counter()
+    failed = True
+    try:
+        response = session.request(
+            method, url, params=params, headers=headers,
+            timeout=(CONNECT_TIMEOUT, read_timeout),
+        )
+        failed = _is_upstream_failure(response)
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        observe_latency(endpoint, elapsed, error=failed)
+        breaker.record(failed)
+        if limiter is not None:
+            limiter.release(elapsed, failed)
+
+
+def request(method, url, endpoint, params=None, headers=None, read_timeout=API_READ_TIMEOUT, upstream="api"):
+    """
+    Send a request through the shared session
+    Retries connection errors and 429/5xx responses, honoring Retry-After.
+    Fails fast with UpstreamUnavailable while the upstream's circuit is open.
+    Returns the final response; raises requests.RequestException on failure.
+    """
+    attempt = 0
+    while True:
+        try:
+            response = _send(method, url, endpoint, upstream, params, headers, read_timeout)
+        except requests.ConnectionError:
+            if attempt >= MAX_RETRIES:
+                raise
+            time.sleep(backoff_delay(attempt))
+            attempt += 1
+            continue
+        # Read timeouts are not retried: the query would most likely time out again
+
+        if not _is_upstream_failure(response) or attempt >= MAX_RETRIES:
+            response.raise_for_status()
+            return response
+
+        delay = retry_after_seconds(response)
+        if delay is None:
+            delay = backoff_delay(attempt)
+        elif delay > BACKOFF_MAX:
+            # The server wants us gone for longer than a request can wait
+            response.raise_for_status()
+        time.sleep(delay)
+        attempt += 1
+
+
+def sparql_query(query_text, read_timeout=SPARQL_READ_TIMEOUT):
+    """Run a SPARQL query against the Wikidata endpoint and return the parsed JSON results"""
+    response = request(
+        "GET", SPARQL_ENDPOINT, "sparql",
+        params={"query": query_text, "format": "json"},
+        headers={"Accept": "application/sparql-results+json"},
+        read_timeout=read_timeout,
+        upstream="sparql",
+    )
+    return response.json()
+
+
+def api_get(params, read_timeout=API_READ_TIMEOUT):
+    """Call the Wikidata action API (wbgetentities, wbsearchentities...) and return the parsed JSON"""
+    params = dict(params, format="json")
+    response = request(
+        "GET", API_ENDPOINT, params.get("action", "api"),
+        params=params,
+        read_timeout=read_timeout,
+    )
+    return response.json()
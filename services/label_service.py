@@ -0,0 +1,239 @@
+import os
+import re
+
+from services.breaker_service import upstream_available
+from services.cache_service import TTLCache
+from services.dump_service import ENTITY_URI
+from services.http_service import api_get, sparql_query
+from services.metrics_service import increment, timed
+from services.property_service import property_metadata
+
+# Entity data is fetched and cached once, with English labels. Other languages
+# are layered on top from a per-entity label cache: one query fetches the
+# labels and descriptions of many entities in every requested language, so
+# switching language is a cache lookup rather than a refetch of each entity.
+
+# Fallback chain used when a request has no lang parameter
+DEFAULT_LANGUAGES = tuple(
+    lang for lang in os.environ.get("LABEL_LANGUAGES", "en").split(",") if lang
+) or ("en",)
+
+# Languages fetched along with any request, so switching between them never
+# needs another query (e.g. "de,fr,mul" for a German and French audience)
+PRELOAD_LANGUAGES = tuple(lang for lang in os.environ.get("LABEL_PRELOAD_LANGUAGES", "mul").split(",") if lang)
+
+MAX_LANGUAGES = 5
+LABEL_QUERY_SIZE = 200
+LABEL_API_SIZE = 50
+
+_LANGUAGE_CODE = re.compile(r"^[a-z]{2,3}(-[a-z0-9]+)*$")
+_ENTITY_ID = re.compile(r"^[QP]\d+$")
+
+# QID/PID -> {"labels": {lang: text}, "descriptions": {lang: text}, "languages": frozenset}
+label_cache = TTLCache(
+    maxsize=int(os.environ.get("LABEL_CACHE_SIZE", 50000)),
+    ttl=int(os.environ.get("LABEL_CACHE_TTL", 24 * 3600)),
+    name="labels",
+)
+
+
+def parse_languages(raw):
+    """Turn "de,en,mul" into a language fallback chain, or DEFAULT_LANGUAGES if nothing valid"""
+    chain = []
+    for lang in (raw or "").lower().replace(" ", "").split(","):
+        if _LANGUAGE_CODE.match(lang) and lang not in chain:
+            chain.append(lang)
+    return tuple(chain[:MAX_LANGUAGES]) or DEFAULT_LANGUAGES
+
+
+def is_default(languages):
+    """
+    Entity data already carries English labels, so only a chain of just "en"
+    needs no lookup; "en,de" still falls back to German where English is missing
+    """
+    return not languages or tuple(languages) == ("en",)
+
+
+def _sparql_strings(values):
+    return ", ".join('"' + value + '"' for value in values)
+
+
+def _labels_query(entity_ids, languages):
+    values = " ".join(f"wd:{entity_id}" for entity_id in entity_ids)
+    langs = _sparql_strings(languages)
+    return f"""
+    SELECT ?entity ?label ?description
+    WHERE {{
+      VALUES ?entity {{ {values} }}
+      {{ ?entity rdfs:label ?label. FILTER(LANG(?label) IN ({langs})) }}
+      UNION
+      {{ ?entity schema:description ?description. FILTER(LANG(?description) IN ({langs})) }}
+    }}
+    """
+
+
+def _query_labels(entity_ids, languages):
+    """Fetch labels and descriptions with one VALUES query; {id: (labels, descriptions)}"""
+    found = {entity_id: ({}, {}) for entity_id in entity_ids}
+    results = sparql_query(_labels_query(entity_ids, languages))
+    for result in results["results"]["bindings"]:
+        entity_id = result["entity"]["value"].split("/")[-1]
+        if entity_id not in found:
+            continue
+        labels, descriptions = found[entity_id]
+        if "label" in result:
+            labels[result["label"].get("xml:lang", "")] = result["label"]["value"]
+        if "description" in result:
+            descriptions[result["description"].get("xml:lang", "")] = result["description"]["value"]
+    return found
+
+
+def _fetch_labels_api(entity_ids, languages):
+    """Fetch labels and descriptions through wbgetentities; {id: (labels, descriptions)}"""
+    found = {}
+    for start in range(0, len(entity_ids), LABEL_API_SIZE):
+        chunk = entity_ids[start:start + LABEL_API_SIZE]
+        data = api_get({
+            "action": "wbgetentities",
+            "ids": "|".join(chunk),
+            "languages": "|".join(languages),
+            "props": "labels|descriptions",
+        })
+        for entity_id, entity in data.get("entities", {}).items():
+            found[entity_id] = (
+                {lang: item["value"] for lang, item in entity.get("labels", {}).items()},
+                {lang: item["value"] for lang, item in entity.get("descriptions", {}).items()},
+            )
+    return found
+
+
+def _fetch_labels(entity_ids, languages):
+    """Fetch in batches, SPARQL first and the action API while SPARQL is failing"""
+    found = {}
+    for start in range(0, len(entity_ids), LABEL_QUERY_SIZE):
+        chunk = entity_ids[start:start + LABEL_QUERY_SIZE]
+        if upstream_available("sparql"):
+            try:
+                found.update(_query_labels(chunk, languages))
+                continue
+            except Exception as e:
+                print(f"SPARQL label query error: {e}")
+                increment("errors", operation="get_labels")
+        try:
+            found.update(_fetch_labels_api(chunk, languages))
+        except Exception as e:
+            print(f"API label error: {e}")
+            increment("errors", operation="get_labels")
+    return found
+
+
+@timed()
+def get_labels(entity_ids, languages):
+    """
+    Return {id: record} for Wikidata items and properties, where a record holds
+    "labels" and "descriptions" by language. Entities whose cached record lacks
+    any requested language are fetched together, in all requested (and
+    preloaded) languages at once.
+    """
+    wanted = set(languages)
+    records = {}
+    missing = []
+    for entity_id in dict.fromkeys(entity_ids):
+        if not _ENTITY_ID.match(entity_id):
+            continue
+        record = label_cache.get(entity_id, count=True)
+        if record is not None:
+            records[entity_id] = record
+            if wanted <= record["languages"]:
+                continue
+        missing.append(entity_id)
+
+    if missing:
+        fetch_languages = tuple(dict.fromkeys(languages + PRELOAD_LANGUAGES))
+        fetched = _fetch_labels(missing, fetch_languages)
+        for entity_id in missing:
+            if entity_id not in fetched:
+                continue
+            labels, descriptions = fetched[entity_id]
+            old = records.get(entity_id) or {"labels": {}, "descriptions": {}, "languages": frozenset()}
+            record = {
+                "labels": dict(old["labels"], **labels),
+                "descriptions": dict(old["descriptions"], **descriptions),
+                "languages": old["languages"] | frozenset(fetch_languages),
+            }
+            label_cache.set(entity_id, record)
+            records[entity_id] = record
+    return records
+
+
+def pick(record, field, languages):
+    """The first of languages that record has a value for, or None"""
+    if record is None:
+        return None
+    values = record[field]
+    for lang in languages:
+        if values.get(lang):
+            return values[lang]
+    return None
+
+
+def _object_id(prop):
+    raw_value = prop.get("raw_value", "")
+    if raw_value.startswith(ENTITY_URI):
+        return raw_value[len(ENTITY_URI):]
+    return None
+
+
+def _property_label(prop):
+    """A property's name from the property snapshot, read when serving so stored entities never keep a stale one"""
+    return property_metadata.label(prop["id"]) or prop["label"]
+
+
+def localize_entity(entity_info, languages):
+    """Return a copy of an entity dict with its label, description, property labels and item values in languages"""
+    if not entity_info:
+        return entity_info
+    if is_default(languages):
+        return dict(entity_info, properties=[
+            dict(prop, label=_property_label(prop)) for prop in entity_info.get("properties", [])
+        ])
+    properties = entity_info.get("properties", [])
+    ids = [entity_info["id"]] + [prop["id"] for prop in properties] + [_object_id(prop) or "" for prop in properties]
+    records = get_labels(ids, languages)
+
+    localized = dict(entity_info)
+    localized["label"] = pick(records.get(entity_info["id"]), "labels", languages) or entity_info["label"]
+    localized["description"] = (
+        pick(records.get(entity_info["id"]), "descriptions", languages) or entity_info.get("description", "")
+    )
+    localized["properties"] = []
+    for prop in properties:
+        prop = dict(prop, label=pick(records.get(prop["id"]), "labels", languages) or _property_label(prop))
+        object_id = _object_id(prop)
+        if object_id:
+            prop["value"] = pick(records.get(object_id), "labels", languages) or prop["value"]
+        localized["properties"].append(prop)
+    return localized
+
+
+def localize_items(items, languages, description=True):
+    """Return copies of {"id", "label", ...} dicts (search results, graph nodes) labeled in languages"""
+    if is_default(languages):
+        return items
+    records = get_labels([item["id"] for item in items], languages)
+    localized = []
+    for item in items:
+        record = records.get(item["id"])
+        item = dict(item, label=pick(record, "labels", languages) or item["label"])
+        if description and "description" in item:
+            item["description"] = pick(record, "descriptions", languages) or item["description"]
+        localized.append(item)
+    return localized
+
+
+def localize_graph(graph, languages):
+    """Return a copy of a graph whose entity node labels are in languages"""
+    if is_default(languages):
+        return graph
+    nodes = localize_items(graph["nodes"], languages, description=False)
+    return dict(graph, nodes=nodes)
@@ -0,0 +1,151 @@
+import os
+
+import numpy as np
+
+# Layout used by /api/graph when the request does not ask for one:
+# "none" (the browser simulates from scratch), "spectral" or "force"
+DEFAULT_LAYOUT = os.environ.get("GRAPH_LAYOUT", "none")
+LAYOUT_METHODS = ("spectral", "force")
+
+# Pixels between linked nodes, matching the link distance of the D3 simulation
+LINK_DISTANCE = 150.0
+
+# Force-directed refinement: exact pairwise repulsion up to this many nodes,
+# sampled repulsion (REPULSION_SAMPLES random partners per node) beyond it
+EXACT_REPULSION_LIMIT = int(os.environ.get("LAYOUT_EXACT_LIMIT", 400))
+REPULSION_SAMPLES = 64
+FORCE_ITERATIONS = int(os.environ.get("LAYOUT_ITERATIONS", 60))
+SPECTRAL_ITERATIONS = 60
+
+
+def _edge_arrays(nodes, links):
+    """Links as (sources, targets) int32 arrays of node positions, without self loops"""
+    index = {node["id"]: i for i, node in enumerate(nodes)}
+    pairs = [
+        (index[link["source"]], index[link["target"]])
+        for link in links
+        if link["source"] in index and link["target"] in index and link["source"] != link["target"]
+    ]
+    if not pairs:
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+    edges = np.asarray(pairs, dtype=np.int32)
+    return edges[:, 0], edges[:, 1]
+
+
+def _circle(n):
+    angles = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    return np.column_stack([np.cos(angles), np.sin(angles)])
+
+
+def spectral_positions(n, sources, targets, iterations=SPECTRAL_ITERATIONS, seed=0):
+    """
+    Approximate spectral layout: the two leading non-trivial eigenvectors of
+    the normalized adjacency matrix, found by orthogonal iteration with
+    sparse products, so the cost is O(iterations * edges) rather than O(n^3)
+    """
+    if n <= 2 or len(sources) == 0:
+        return _circle(n)
+    degree = np.bincount(sources, minlength=n) + np.bincount(targets, minlength=n) + 1.0
+    inv_sqrt = 1.0 / np.sqrt(degree)
+    weights = inv_sqrt[sources] * inv_sqrt[targets]
+    trivial = np.sqrt(degree) / np.linalg.norm(np.sqrt(degree))
+
+    def multiply(vectors):
+        # (D^-1/2 (A + I) D^-1/2 + I) / 2: a self loop per node keeps the spectrum
+        # away from -1, and the shift makes it non-negative so iteration converges
+        product = vectors * (inv_sqrt * inv_sqrt)[:, None]
+        np.add.at(product, sources, vectors[targets] * weights[:, None])
+        np.add.at(product, targets, vectors[sources] * weights[:, None])
+        return (product + vectors) / 2
+
+    vectors = np.random.default_rng(seed).standard_normal((n, 2))
+    for _ in range(iterations):
+        vectors = multiply(vectors)
+        vectors -= np.outer(trivial, trivial @ vectors)
+        vectors, _ = np.linalg.qr(vectors)
+    # Back from the normalized basis, so low-degree leaves sit near their hubs
+    positions = vectors * inv_sqrt[:, None]
+    spread = positions.std(axis=0)
+    spread[spread == 0] = 1.0
+    return (positions - positions.mean(axis=0)) / spread
+
+
+def force_positions(n, sources, targets, initial=None, iterations=FORCE_ITERATIONS, seed=0):
+    """
+    Fruchterman-Reingold layout with every step vectorized over nodes and edges
+    Repulsion is exact for up to EXACT_REPULSION_LIMIT nodes (O(n^2) per step)
+    and estimated from REPULSION_SAMPLES random partners per node beyond it
+    """
+    rng = np.random.default_rng(seed)
+    if initial is None:
+        initial = spectral_positions(n, sources, targets, seed=seed)
+    # Work in units where the ideal edge length is 1
+    positions = np.array(initial, dtype=np.float64) * np.sqrt(n) / 2
+    positions += rng.uniform(-1e-3, 1e-3, positions.shape)
+    temperature = max(1.0, np.sqrt(n) / 4)
+    cooling = temperature / (iterations + 1)
+
+    for _ in range(iterations):
+        displacement = np.zeros_like(positions)
+
+        if n <= EXACT_REPULSION_LIMIT:
+            dx = positions[:, 0, None] - positions[None, :, 0]
+            dy = positions[:, 1, None] - positions[None, :, 1]
+            inverse = dx * dx + dy * dy
+            np.fill_diagonal(inverse, np.inf)
+            np.reciprocal(np.maximum(inverse, 1e-4, out=inverse), out=inverse)
+            displacement[:, 0] += (dx * inverse).sum(axis=1)
+            displacement[:, 1] += (dy * inverse).sum(axis=1)
+        else:
+            partners = rng.integers(0, n, size=(n, REPULSION_SAMPLES))
+            delta = positions[:, None, :] - positions[partners]
+            distance_sq = np.einsum("ijk,ijk->ij", delta, delta)
+            distance_sq[partners == np.arange(n)[:, None]] = np.inf
+            scale = (n - 1) / REPULSION_SAMPLES
+            displacement += scale * (delta / np.maximum(distance_sq, 1e-4)[:, :, None]).sum(axis=1)
+
+        if len(sources):
+            delta = positions[sources] - positions[targets]
+            pull = delta * np.linalg.norm(delta, axis=1)[:, None]
+            np.add.at(displacement, sources, -pull)
+            np.add.at(displacement, targets, pull)
+
+        length = np.linalg.norm(displacement, axis=1)
+        step = np.minimum(length, temperature) / np.maximum(length, 1e-9)
+        positions += displacement * step[:, None]
+        temperature -= cooling
+
+    return positions - positions.mean(axis=0)
+
+
+def compute_layout(graph, method):
+    """
+    Return [(x, y)] in pixels for graph["nodes"], centered on (0, 0)
+    method is "spectral" or "force"
+    """
+    nodes = graph["nodes"]
+    n = len(nodes)
+    if n == 0:
+        return []
+    if n == 1:
+        return [(0.0, 0.0)]
+    sources, targets = _edge_arrays(nodes, graph["links"])
+
+    positions = spectral_positions(n, sources, targets)
+    if method == "force":
+        positions = force_positions(n, sources, targets, initial=positions)
+
+    # Scale so a typical link is as long as the browser simulation makes it
+    if len(sources):
+        lengths = np.linalg.norm(positions[sources] - positions[targets], axis=1)
+        typical = np.median(lengths[lengths > 0]) if np.any(lengths > 0) else 1.0
+    else:
+        typical = 1.0
+    positions = positions * (LINK_DISTANCE / typical)
+    return [(round(float(x), 1), round(float(y), 1)) for x, y in positions]
+
+
+def apply_layout(graph, positions, method):
+    """Return a copy of graph whose nodes carry x and y fields"""
+    nodes = [dict(node, x=x, y=y) for node, (x, y) in zip(graph["nodes"], positions)]
+    return dict(graph, nodes=nodes, layout=method)
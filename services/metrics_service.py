@@ -0,0 +1,207 @@
+import functools
+import inspect
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from services.breaker_service import get_breaker_stats
+from services.cache_service import all_caches
+from services.http_service import LatencyHistogram, get_latency_histograms
+from services.search_service import get_search_stats
+
+# Add a Server-Timing header with the operations each request spent time in
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "").lower() in ("1", "true", "yes")
+
+METRIC_PREFIX = "wikidata_explorer"
+
+CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+# (family, name) -> LatencyHistogram; families are "operation" and "http_request"
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+# (name, sorted label items) -> count
+_counters = {}
+_counters_lock = threading.Lock()
+
+# Spans recorded for the current request: [(name, seconds)], or None outside requests
+_spans = ContextVar("metrics_spans", default=None)
+
+
+def observe(name, seconds, error=False, family="operation"):
+    """Record one timing in the named histogram"""
+    key = (family, name)
+    histogram = _histograms.get(key)
+    if histogram is None:
+        with _histograms_lock:
+            histogram = _histograms.setdefault(key, LatencyHistogram())
+    histogram.observe(seconds, error)
+    spans = _spans.get()
+    if spans is not None and family == "operation":
+        spans.append((name, seconds))
+
+
+def increment(name, amount=1, **labels):
+    """Add to a counter, e.g. increment("fallbacks", kind="search")"""
+    key = (name, tuple(sorted(labels.items())))
+    with _counters_lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+class timer:
+    """Context manager that times a block into the named histogram"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.name, time.perf_counter() - self.start, error=exc_type is not None)
+        return False
+
+
+def timed(name=None):
+    """Decorator that times every call of a function (or coroutine function)"""
+    def decorate(func):
+        metric_name = name or func.__name__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with timer(metric_name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(metric_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+    return decorate
+
+
+# Requests currently being served, so background work can stay out of their way
+_active_requests = 0
+_active_lock = threading.Lock()
+
+
+def active_requests():
+    return _active_requests
+
+
+def begin_request():
+    """Start collecting Server-Timing spans for the current request"""
+    global _active_requests
+    _spans.set([])
+    with _active_lock:
+        _active_requests += 1
+
+
+def end_request(endpoint, seconds, status):
+    """Record the request and return its Server-Timing header value (or None)"""
+    global _active_requests
+    observe(endpoint or "unknown", seconds, error=status >= 500, family="http_request")
+    spans = _spans.get()
+    _spans.set(None)
+    if spans is not None:
+        with _active_lock:
+            _active_requests -= 1
+    if not SERVER_TIMING or spans is None:
+        return None
+
+    totals = {}
+    for name, duration in spans:
+        totals[name] = totals.get(name, 0.0) + duration
+    parts = [f"{name};dur={duration * 1000:.1f}" for name, duration in totals.items()]
+    parts.append(f"total;dur={seconds * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _histogram_lines(metric, label_name, snapshots):
+    lines = [f"# TYPE {metric} histogram"]
+    for label_value, snapshot in sorted(snapshots.items()):
+        for bound, count in snapshot["buckets"]:
+            lines.append(f"{metric}_bucket{_labels(**{label_name: label_value, 'le': bound})} {count}")
+        lines.append(f"{metric}_sum{_labels(**{label_name: label_value})} {snapshot['sum']}")
+        lines.append(f"{metric}_count{_labels(**{label_name: label_value})} {snapshot['count']}")
+    return lines
+
+
+def _family_snapshots(family):
+    with _histograms_lock:
+        items = [(name, histogram) for (kind, name), histogram in _histograms.items() if kind == family]
+    return {name: histogram.snapshot() for name, histogram in items}
+
+
+def render_prometheus():
+    """Return every metric in the Prometheus text exposition format"""
+    lines = []
+
+    families = (
+        ("operation_seconds", "operation", _family_snapshots("operation")),
+        ("http_request_seconds", "endpoint", _family_snapshots("http_request")),
+        ("upstream_request_seconds", "endpoint", get_latency_histograms()),
+    )
+    for metric, label_name, snapshots in families:
+        metric = f"{METRIC_PREFIX}_{metric}"
+        lines.extend(_histogram_lines(metric, label_name, snapshots))
+        errors = f"{metric.rsplit('_seconds', 1)[0]}_errors_total"
+        lines.append(f"# TYPE {errors} counter")
+        for label_value, snapshot in sorted(snapshots.items()):
+            lines.append(f"{errors}{_labels(**{label_name: label_value})} {snapshot['errors']}")
+
+    caches = [cache.stats() for cache in all_caches()]
+    for field in ("hits", "misses", "stale_hits", "evictions", "coalesced"):
+        metric = f"{METRIC_PREFIX}_cache_{field}_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.extend(f"{metric}{_labels(cache=stats['name'])} {stats[field]}" for stats in caches)
+    metric = f"{METRIC_PREFIX}_cache_entries"
+    lines.append(f"# TYPE {metric} gauge")
+    lines.extend(f"{metric}{_labels(cache=stats['name'])} {stats['size']}" for stats in caches)
+
+    metric = f"{METRIC_PREFIX}_search_strategy_total"
+    lines.append(f"# TYPE {metric} counter")
+    for strategy, outcomes in sorted(get_search_stats().items()):
+        for outcome, count in sorted(outcomes.items()):
+            lines.append(f"{metric}{_labels(strategy=strategy, outcome=outcome)} {count}")
+
+    breaker_stats = get_breaker_stats()
+    breakers = sorted(breaker_stats["breakers"].values(), key=lambda stats: stats["name"])
+    metric = f"{METRIC_PREFIX}_circuit_state"  # 0 closed, 1 half-open, 2 open
+    lines.append(f"# TYPE {metric} gauge")
+    lines.extend(f"{metric}{_labels(upstream=stats['name'])} {CIRCUIT_STATES[stats['state']]}" for stats in breakers)
+    for field in ("opened", "rejected"):
+        metric = f"{METRIC_PREFIX}_circuit_{field}_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.extend(f"{metric}{_labels(upstream=stats['name'])} {stats[field]}" for stats in breakers)
+    limiters = sorted(breaker_stats["limiters"].values(), key=lambda stats: stats["name"])
+    for field, kind in (("limit", "gauge"), ("inflight", "gauge"), ("shed", "counter")):
+        metric = f"{METRIC_PREFIX}_concurrency_{field}" + ("_total" if kind == "counter" else "")
+        lines.append(f"# TYPE {metric} {kind}")
+        lines.extend(f"{metric}{_labels(upstream=stats['name'])} {stats[field]}" for stats in limiters)
+
+    with _counters_lock:
+        counters = sorted(_counters.items())
+    declared = set()
+    for (name, labels), count in counters:
+        metric = f"{METRIC_PREFIX}_{name}_total"
+        if metric not in declared:
+            declared.add(metric)
+            lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric}{_labels(**dict(labels)) if labels else ''} {count}")
+
+    return "\n".join(lines) + "\n"
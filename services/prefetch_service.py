@@ -0,0 +1,140 @@
+import heapq
+import os
+import threading
+import time
+
+from services.breaker_service import TokenBucket, upstream_available
+from services.cache_service import TTLCache
+from services.graph_service import _item_neighbors
+from services.metrics_service import active_requests, increment
+from services.sparql_service import entity_cache, prefetch_entity_details
+
+# Off unless enabled: prefetching spends upstream requests on guesses
+PREFETCH_ENABLED = os.environ.get("PREFETCH_ENABLED", "").lower() in ("1", "true", "yes")
+
+PREFETCH_TOP_N = int(os.environ.get("PREFETCH_TOP_N", 5))             # neighbors queued per viewed entity
+PREFETCH_QUEUE_SIZE = int(os.environ.get("PREFETCH_QUEUE_SIZE", 256))
+PREFETCH_BATCH_SIZE = int(os.environ.get("PREFETCH_BATCH_SIZE", 10))  # entities per wbgetentities call
+PREFETCH_RATE = float(os.environ.get("PREFETCH_RATE", 5))             # entities per second, across the process
+# Wait while more foreground requests than this are being served
+PREFETCH_MAX_ACTIVE = int(os.environ.get("PREFETCH_MAX_ACTIVE", 2))
+
+
+class Prefetcher:
+    """
+    Warms the entity cache with the neighbors a user is likely to click next
+
+    enqueue_neighbors() queues the first top_n item neighbors of a viewed
+    entity, in the order the graph draws them. The queue is bounded: lower
+    neighbor ranks go first, newer views before older ones at the same rank,
+    and when it is full the least promising entry is dropped. A single daemon
+    thread takes batches off the queue within a token-bucket rate budget and
+    only while the app is otherwise quiet.
+    """
+
+    def __init__(self, top_n=PREFETCH_TOP_N, queue_size=PREFETCH_QUEUE_SIZE,
+                 batch_size=PREFETCH_BATCH_SIZE, rate=PREFETCH_RATE, max_active=PREFETCH_MAX_ACTIVE):
+        self.top_n = top_n
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.rate = rate
+        self.max_active = max_active
+        self._heap = []       # (rank, -sequence, QID)
+        self._queued = set()
+        self._sequence = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._budget = TokenBucket(rate, burst=batch_size)
+        # Entities warmed by the prefetcher and not viewed yet, for the hit rate
+        self._prefetched = TTLCache(maxsize=queue_size * 16, ttl=entity_cache.ttl, name="prefetched")
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="prefetch", daemon=True)
+        self._thread.start()
+
+    def enqueue_neighbors(self, entity_data):
+        """Queue the top neighbors of an entity that was just viewed"""
+        if self._thread is None or not entity_data:
+            return
+        neighbors = []
+        for neighbor_id, _, _ in _item_neighbors(entity_data):
+            if neighbor_id not in neighbors and neighbor_id != entity_data.get("id"):
+                neighbors.append(neighbor_id)
+            if len(neighbors) >= self.top_n:
+                break
+
+        with self._condition:
+            self._sequence += 1
+            for rank, neighbor_id in enumerate(neighbors):
+                if neighbor_id in self._queued or self._prefetched.get(neighbor_id) is not None:
+                    increment("prefetch", outcome="duplicate")
+                    continue
+                if entity_cache.get(neighbor_id) is not None:
+                    increment("prefetch", outcome="cached")
+                    continue
+                entry = (rank, -self._sequence, neighbor_id)
+                if len(self._heap) >= self.queue_size:
+                    worst = max(self._heap)
+                    if entry >= worst:
+                        increment("prefetch", outcome="dropped")
+                        continue
+                    self._heap.remove(worst)
+                    heapq.heapify(self._heap)
+                    self._queued.discard(worst[2])
+                    increment("prefetch", outcome="dropped")
+                heapq.heappush(self._heap, entry)
+                self._queued.add(neighbor_id)
+                increment("prefetch", outcome="queued")
+            self._condition.notify()
+
+    def record_view(self, entity_id):
+        """Count a foreground view of an entity; a hit if the prefetcher warmed it"""
+        if self._prefetched.get(entity_id) is not None:
+            self._prefetched.delete(entity_id)
+            increment("prefetch", outcome="hit")
+
+    def _next_batch(self):
+        with self._condition:
+            while not self._heap:
+                self._condition.wait()
+        size = self._budget.take(self.batch_size)
+        # Stay out of the way of foreground requests and of a failing upstream
+        while active_requests() > self.max_active or not upstream_available("api"):
+            time.sleep(0.05)
+        with self._condition:
+            batch = [heapq.heappop(self._heap)[2] for _ in range(min(size, len(self._heap)))]
+            self._queued.difference_update(batch)
+        self._budget.give_back(size - len(batch))
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                outcomes = prefetch_entity_details(batch)
+            except Exception as e:
+                print(f"Prefetch failed for {len(batch)} entities: {e}")
+                increment("prefetch", amount=len(batch), outcome="error")
+                continue
+            for outcome, entity_ids in outcomes.items():
+                if entity_ids:
+                    increment("prefetch", amount=len(entity_ids), outcome=outcome)
+            for entity_id in outcomes["fetched"] + outcomes["stored"]:
+                self._prefetched.set(entity_id, True)
+
+    def stats(self):
+        with self._condition:
+            return {"queued": len(self._heap), "running": self._thread is not None}
+
+
+prefetcher = Prefetcher()
+
+
+def start_prefetch():
+    """Start the background prefetch worker if PREFETCH_ENABLED is set"""
+    if PREFETCH_ENABLED:
+        prefetcher.start()
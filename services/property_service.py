@@ -0,0 +1,247 @@
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: refreshes are not coordinated between processes
+    fcntl = None
+
+from services.http_service import sparql_query
+
+DEFAULT_SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "properties.json")
+PROPERTY_SNAPSHOT_PATH = os.environ.get("PROPERTY_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH)
+
+# How old the snapshot may get before the background thread reloads it from
+# Wikidata, in seconds; 0 disables the background refresh
+PROPERTY_REFRESH_INTERVAL = int(os.environ.get("PROPERTY_REFRESH_INTERVAL", 7 * 24 * 3600))
+
+# How often the background thread checks whether another process wrote a newer snapshot
+SNAPSHOT_CHECK_INTERVAL = 60
+
+SNAPSHOT_VERSION = 1
+
+# Categories of well-known properties, used before any snapshot is loaded
+BUILTIN_CATEGORIES = {
+    # People
+    "P50": "person", "P57": "person", "P170": "person", "P112": "person", "P26": "person",
+    "P22": "person", "P25": "person", "P40": "person", "P3373": "person", "P35": "person",
+    "P6": "person", "P169": "person", "P86": "person", "P161": "person", "P175": "person",
+    "P488": "person", "P58": "person", "P162": "person", "P802": "person", "P1066": "person",
+    # Places
+    "P17": "location", "P131": "location", "P276": "location", "P19": "location", "P20": "location",
+    "P27": "location", "P159": "location", "P36": "location", "P30": "location", "P495": "location",
+    "P551": "location", "P740": "location", "P1376": "location", "P150": "location", "P47": "location",
+    "P206": "location", "P706": "location", "P915": "location", "P840": "location", "P291": "location",
+    "P625": "location",
+    # Media files
+    "P18": "media", "P154": "media", "P41": "media", "P94": "media", "P242": "media",
+    "P10": "media", "P51": "media", "P109": "media", "P1943": "media", "P8592": "media",
+}
+
+# Label words that mark a property's category; the order matters, since
+# "headquarters location" is a place, not a person
+_LABEL_KEYWORDS = (
+    ("location", ("location", "place", "country")),
+    ("person", ("person", "creator", "author", "director", "founder", "head")),
+    ("media", ("image",)),
+)
+
+# Wikibase datatypes that decide the category on their own
+_DATATYPE_CATEGORIES = {
+    "CommonsMedia": "media",
+    "GlobeCoordinate": "location",
+}
+
+
+def categorize(label, datatype=None):
+    """Classify a property as person, location, media or other"""
+    if datatype in _DATATYPE_CATEGORIES:
+        return _DATATYPE_CATEGORIES[datatype]
+    label = (label or "").lower()
+    for category, words in _LABEL_KEYWORDS:
+        if any(word in label for word in words):
+            return category
+    return "other"
+
+
+def _properties_query(language="en"):
+    return f"""
+    SELECT ?property ?propertyLabel ?type
+    WHERE {{
+      ?property a wikibase:Property ;
+                wikibase:propertyType ?type .
+      SERVICE wikibase:label {{ bd:serviceParam wikibase:language "{language},en". }}
+    }}
+    """
+
+
+def fetch_properties(language="en"):
+    """Download label and datatype for every Wikidata property"""
+    results = sparql_query(_properties_query(language))
+    properties = {}
+    for result in results["results"]["bindings"]:
+        prop_id = result["property"]["value"].split("/")[-1]
+        label = result.get("propertyLabel", {}).get("value", prop_id)
+        datatype = result["type"]["value"].split("#")[-1]
+        properties[prop_id] = {
+            "label": label,
+            "datatype": datatype,
+            "category": BUILTIN_CATEGORIES.get(prop_id) or categorize(label, datatype),
+        }
+    return properties
+
+
+class PropertyMetadata:
+    """
+    In-memory PID -> {label, datatype, category} dictionary
+
+    Loaded in bulk from a JSON snapshot and swapped wholesale when the
+    snapshot is refreshed, so lookups are plain dict reads without locking.
+    """
+
+    def __init__(self, path=PROPERTY_SNAPSHOT_PATH):
+        self.path = path
+        self._properties = {}
+        self._guessed = {}  # categories inferred from labels for unknown PIDs
+        self.refreshed_at = None
+        self._loaded_mtime = None
+        self._refresh_thread = None
+        self._start_lock = threading.Lock()
+        self.load()
+
+    def _mtime(self):
+        try:
+            return os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def load(self):
+        """Load the snapshot file, if there is one"""
+        mtime = self._mtime()
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            print(f"Ignoring property snapshot {self.path}: {e}")
+            return False
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            print(f"Ignoring property snapshot {self.path}: unknown version")
+            return False
+        self._properties = snapshot.get("properties", {})
+        self._guessed = {}
+        self.refreshed_at = snapshot.get("refreshed_at")
+        self._loaded_mtime = mtime
+        return True
+
+    def save(self, properties):
+        """Write properties to the snapshot file atomically and start using them"""
+        refreshed_at = time.time()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": SNAPSHOT_VERSION, "refreshed_at": refreshed_at, "properties": properties}, f)
+        os.replace(tmp_path, self.path)
+        self._properties = properties
+        self._guessed = {}
+        self.refreshed_at = refreshed_at
+        self._loaded_mtime = self._mtime()
+
+    def refresh(self):
+        """Reload every property from Wikidata; returns the number loaded"""
+        properties = fetch_properties()
+        if not properties:
+            print("Property refresh returned nothing; keeping the current snapshot")
+            return 0
+        self.save(properties)
+        return len(properties)
+
+    def get(self, prop_id):
+        return self._properties.get(prop_id)
+
+    def label(self, prop_id, default=None):
+        entry = self._properties.get(prop_id)
+        return entry["label"] if entry else default
+
+    def category(self, prop_id, label=None):
+        """
+        Return the property's category
+        Unknown PIDs are classified once from the label they came with
+        """
+        entry = self._properties.get(prop_id)
+        if entry is not None:
+            return entry["category"]
+        category = BUILTIN_CATEGORIES.get(prop_id) or self._guessed.get(prop_id)
+        if category is None:
+            category = self._guessed[prop_id] = categorize(label)
+        return category
+
+    def refresh_if_stale(self, interval=PROPERTY_REFRESH_INTERVAL):
+        """
+        Refresh the snapshot if it is older than interval, unless another
+        process on the host is already doing so (it holds path + ".lock");
+        returns True if this process refreshed
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock_file = open(self.path + ".lock", "a")
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return False
+            # Another process may have written a new snapshot while we waited
+            if self._mtime() != self._loaded_mtime:
+                self.load()
+            if time.time() - (self.refreshed_at or 0) < interval:
+                return False
+            self.refresh()
+            return True
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    def start_background_refresh(self, interval=PROPERTY_REFRESH_INTERVAL):
+        """
+        Keep the snapshot fresh from a daemon thread: one process per host
+        downloads it when it is missing or too old, the others pick up the
+        file it writes. Called on the first request, not at import time.
+        """
+        with self._start_lock:
+            if interval <= 0 or self._refresh_thread is not None:
+                return
+            self._refresh_thread = threading.Thread(target=self._refresh_loop, args=(interval,),
+                                                    name="property-refresh", daemon=True)
+        self._refresh_thread.start()
+
+    def _refresh_loop(self, interval):
+        while True:
+            try:
+                if self._mtime() != self._loaded_mtime:
+                    self.load()
+                if time.time() - (self.refreshed_at or 0) >= interval:
+                    self.refresh_if_stale(interval)
+            except Exception as e:
+                print(f"Property refresh failed: {e}")
+                time.sleep(min(interval, 3600))
+                continue
+            time.sleep(min(interval, SNAPSHOT_CHECK_INTERVAL))
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "properties": len(self._properties),
+            "guessed": len(self._guessed),
+            "refreshed_at": self.refreshed_at,
+        }
+
+
+property_metadata = PropertyMetadata()
@@ -0,0 +1,241 @@
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: every process refreshes on its own
+    fcntl = None
+
+from services.breaker_service import TokenBucket, upstream_available
+from services.dump_service import get_dump_store
+from services.graph_service import graph_cache
+from services.http_service import api_get
+from services.label_service import label_cache
+from services.metrics_service import active_requests, increment
+from services.sparql_service import entity_cache, get_entity_details, invalidate_entity
+from services.store_service import get_store
+
+# Off unless enabled: each pass spends upstream requests on revision checks
+REFRESH_ENABLED = os.environ.get("REFRESH_ENABLED", "").lower() in ("1", "true", "yes")
+
+REFRESH_INTERVAL = float(os.environ.get("REFRESH_INTERVAL", 300))    # seconds between passes
+REFRESH_BATCH_SIZE = int(os.environ.get("REFRESH_BATCH_SIZE", 50))   # revisions per wbgetentities call (max 50)
+REFRESH_RATE = float(os.environ.get("REFRESH_RATE", 1))              # upstream requests per second
+# Wait while more foreground requests than this are being served
+REFRESH_MAX_ACTIVE = int(os.environ.get("REFRESH_MAX_ACTIVE", 2))
+
+# Only the worker holding this lock refreshes; the others apply the changes it
+# finds (published in the store) every REFRESH_POLL_INTERVAL seconds
+DEFAULT_LOCK_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "refresh.lock")
+REFRESH_LOCK_PATH = os.environ.get("REFRESH_LOCK_PATH", DEFAULT_LOCK_PATH)
+REFRESH_POLL_INTERVAL = float(os.environ.get("REFRESH_POLL_INTERVAL", 10))
+
+# Store namespace of published changes, kept long enough for every worker to see them
+CHANGES_NAMESPACE = "refresh_changes"
+CHANGES_TTL = 24 * 3600
+
+
+def forget_entities(entity_ids):
+    """
+    Drop this process's copies of entities: details, summaries, labels, and
+    every cached graph that contains one of them (as its center or a neighbor)
+    """
+    entity_ids = set(entity_ids)
+    if not entity_ids:
+        return
+    for key in entity_cache.keys():
+        # Details are keyed by QID, summaries and property pages by (kind, QID, ...)
+        entity_id = key[1] if isinstance(key, tuple) and len(key) > 1 else key
+        if entity_id in entity_ids:
+            entity_cache.delete(key)
+    for entity_id in entity_ids:
+        label_cache.delete(entity_id)
+    for key in graph_cache.keys():
+        graph = graph_cache.get_stale(key)
+        if key[0] in entity_ids or (graph and any(node["id"] in entity_ids for node in graph.get("nodes", ()))):
+            graph_cache.delete(key)
+
+
+class Refresher:
+    """
+    Keeps cached entities fresh by revision instead of by TTL alone
+
+    One worker per host (the holder of lock_path) checks, every interval
+    seconds, the revision IDs of the entities in the shared store and its own
+    cache in batched wbgetentities props=info calls, the entries closest to
+    expiry first. Entities whose cached lastrevid is current get a fresh TTL
+    in the store and the cache, so they are not refetched when it runs out.
+    Changed ones are invalidated (along with their summaries, property pages,
+    labels and the graphs they appear in) and fetched again through
+    get_entity_details, and deleted ones are dropped. Every call, check or
+    refetch, costs one token of the rate budget, and the worker waits while
+    the app is busy or the API circuit is open.
+
+    Changed and deleted QIDs are published in the store; the other workers
+    poll for them and drop their own copies.
+    """
+
+    def __init__(self, interval=REFRESH_INTERVAL, batch_size=REFRESH_BATCH_SIZE, rate=REFRESH_RATE,
+                 max_active=REFRESH_MAX_ACTIVE, lock_path=REFRESH_LOCK_PATH, poll_interval=REFRESH_POLL_INTERVAL):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_active = max_active
+        self.lock_path = lock_path
+        self.poll_interval = poll_interval
+        self.last_pass = None
+        self._budget = TokenBucket(rate, burst=max(1.0, rate))
+        self._lock_file = None
+        self._changes_seen = time.time()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="refresh", daemon=True)
+        self._thread.start()
+
+    def try_lead(self):
+        """Take the host-wide refresh lock if no other process holds it; True while this one does"""
+        if self._lock_file is not None:
+            return True
+        if fcntl is None:
+            self._lock_file = True
+            return True
+        directory = os.path.dirname(self.lock_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock_file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _wait_turn(self):
+        self._budget.take()
+        while active_requests() > self.max_active or not upstream_available("api"):
+            time.sleep(0.05)
+
+    def _check_revisions(self, entity_ids):
+        """
+        Return {QID: lastrevid}, with None for deleted entities; redirected
+        QIDs are left out, as the answer is keyed by the redirect target
+        """
+        data = api_get({"action": "wbgetentities", "ids": "|".join(entity_ids), "props": "info"})
+        revisions = {}
+        for entity_id in entity_ids:
+            entity = data.get("entities", {}).get(entity_id)
+            if entity is not None:
+                revisions[entity_id] = None if "missing" in entity else entity.get("lastrevid")
+        return revisions
+
+    def _publish(self, entity_ids):
+        """Tell the other workers to drop their copies of entity_ids"""
+        store = get_store()
+        for entity_id in entity_ids:
+            store.set(CHANGES_NAMESPACE, entity_id, {"pid": os.getpid()}, ttl=CHANGES_TTL)
+
+    def apply_changes(self):
+        """Drop local copies of entities another worker found changed; returns how many"""
+        changes = get_store().changed_since(CHANGES_NAMESPACE, self._changes_seen)
+        if changes:
+            self._changes_seen = changes[-1][2]
+        changed = [entity_id for entity_id, value, _ in changes if value.get("pid") != os.getpid()]
+        forget_entities(changed)
+        return len(changed)
+
+    def _refetch(self, entity_id, cached):
+        self._wait_turn()
+        invalidate_entity(entity_id)
+        forget_entities([entity_id])
+        try:
+            fresh = get_entity_details(entity_id)
+        except Exception as e:
+            print(f"Refresh failed for {entity_id}: {e}")
+            fresh = None
+        if not fresh or not fresh.get("properties"):
+            # Keep serving the old copy; the next pass tries again
+            entity_cache.set(entity_id, cached)
+            get_store().set("entity", entity_id, cached)
+            return "failed"
+        return "changed"
+
+    def _entity_ids(self):
+        """QIDs in the store and in this process's cache, the soonest to expire first"""
+        local = [key for key in entity_cache.expiring() if isinstance(key, str)]
+        return list(dict.fromkeys(get_store().expiring("entity") + local))
+
+    def refresh_once(self):
+        """Check every cached and stored entity once; returns counts by outcome"""
+        outcomes = dict.fromkeys(("unchanged", "changed", "deleted", "failed", "skipped"), 0)
+        dump_store = get_dump_store()
+        store = get_store()
+        entity_ids = self._entity_ids()
+        for start in range(0, len(entity_ids), self.batch_size):
+            chunk = entity_ids[start:start + self.batch_size]
+            self._wait_turn()
+            try:
+                revisions = self._check_revisions(chunk)
+            except Exception as e:
+                print(f"Revision check failed for {len(chunk)} entities: {e}")
+                increment("errors", operation="refresh")
+                increment("refresh", amount=len(chunk), outcome="failed")
+                outcomes["failed"] += len(chunk)
+                continue
+
+            changed = []
+            for entity_id in chunk:
+                cached = entity_cache.get_stale(entity_id) or store.get("entity", entity_id)
+                if cached is None:
+                    continue
+                if dump_store is not None and dump_store.get_entity(entity_id) is not None:
+                    # Dump entities are refreshed by ingesting a newer dump
+                    outcome = "skipped"
+                elif entity_id in revisions and revisions[entity_id] is None:
+                    invalidate_entity(entity_id)
+                    forget_entities([entity_id])
+                    outcome = "deleted"
+                elif revisions.get(entity_id) is not None and cached.get("lastrevid") == revisions[entity_id]:
+                    entity_cache.touch(entity_id)
+                    store.touch("entity", entity_id)
+                    outcome = "unchanged"
+                else:
+                    # Changed, redirected, or cached without a revision ID
+                    outcome = self._refetch(entity_id, cached)
+                if outcome in ("changed", "deleted"):
+                    changed.append(entity_id)
+                increment("refresh", outcome=outcome)
+                outcomes[outcome] += 1
+            self._publish(changed)
+        return outcomes
+
+    def _run(self):
+        next_pass = time.monotonic()
+        while True:
+            try:
+                if self.try_lead():
+                    if time.monotonic() >= next_pass:
+                        started = time.monotonic()
+                        outcomes = self.refresh_once()
+                        self.last_pass = dict(outcomes, seconds=round(time.monotonic() - started, 3))
+                        next_pass = started + self.interval
+                else:
+                    self.apply_changes()
+            except Exception as e:
+                print(f"Refresh pass failed: {e}")
+            time.sleep(self.poll_interval)
+
+    def stats(self):
+        return {"running": self._thread is not None, "leader": self._lock_file is not None, "last_pass": self.last_pass}
+
+
+refresher = Refresher()
+
+
+def start_refresh():
+    """Start the background refresh worker if REFRESH_ENABLED is set"""
+    if REFRESH_ENABLED:
+        refresher.start()
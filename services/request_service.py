@@ -0,0 +1,117 @@
+import hashlib
+import json
+import re
+import time
+from email.utils import formatdate, parsedate_to_datetime
+
+from services.asset_service import COMPRESS_MIN_BYTES, negotiate_encoding
+from services.cache_service import TTLCache
+
+# Request parsing and JSON response caching shared by the Flask (app.py) and
+# Quart (asgi.py) apps. Importing this module starts nothing; each app starts
+# its own background workers.
+
+# Upper bounds for user-supplied graph expansion parameters
+MAX_GRAPH_DEPTH = 3
+MAX_GRAPH_FANOUT = 15
+MAX_GRAPH_RELATIONS = 50
+MAX_PATH_HOPS = 6
+MAX_PROPERTY_PAGES = 1000
+
+# Cache-Control max-age for JSON API responses
+API_MAX_AGE = 300
+
+# When each response body (by ETag) was first served, for Last-Modified
+_first_served = TTLCache(maxsize=8192, ttl=24 * 3600, name="etags")
+
+def clamp_int(raw, default, upper):
+    """Parse a positive integer, clamped to upper"""
+    try:
+        value = int(raw if raw is not None else default)
+    except (TypeError, ValueError):
+        value = default
+    return max(1, min(value, upper))
+
+def json_cache_headers(payload, max_age=API_MAX_AGE):
+    """
+    Serialize payload and build its caching headers
+    Returns (body, headers); Last-Modified is when this body was first served
+    """
+    body = json.dumps(payload, separators=(",", ":"), sort_keys=True)
+    etag = hashlib.sha1(body.encode("utf-8")).hexdigest()
+    first_served = _first_served.get(etag)
+    if first_served is None:
+        first_served = time.time()
+        _first_served.set(etag, first_served)
+    headers = {
+        "Content-Type": "application/json",
+        "ETag": f'"{etag}"',
+        "Last-Modified": formatdate(first_served, usegmt=True),
+        "Cache-Control": f"public, max-age={max_age}",
+    }
+    return body, headers
+
+def is_not_modified(request_headers, headers):
+    """Check If-None-Match / If-Modified-Since against the response headers"""
+    if_none_match = request_headers.get("If-None-Match")
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return headers["ETag"] in tags or "*" in tags
+    if_modified_since = request_headers.get("If-Modified-Since")
+    if if_modified_since:
+        try:
+            return parsedate_to_datetime(headers["Last-Modified"]) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def response_encoding(body, headers, accept_encoding):
+    """
+    Pick the Content-Encoding for a body and mark it in headers, or None
+    The ETag gets the encoding as a suffix, so each representation validates separately
+    """
+    headers["Vary"] = "Accept-Encoding"
+    encoding = negotiate_encoding(accept_encoding)
+    if encoding is None or len(body) < COMPRESS_MIN_BYTES:
+        return None
+    headers["ETag"] = f'{headers["ETag"][:-1]}-{encoding}"'
+    headers["Content-Encoding"] = encoding
+    return encoding
+
+def normalize_entity_id(entity_id):
+    """Accept bare numbers and prefixed IDs (like wd:Q64) as well as plain QIDs"""
+    if not entity_id.startswith('Q'):
+        # Check if it's a valid numeric ID
+        if entity_id.isdigit():
+            entity_id = f"Q{entity_id}"
+        else:
+            # If it contains a namespace (like wdt:P31), extract just the ID
+            if ":" in entity_id:
+                entity_id = entity_id.split(":")[-1]
+    return entity_id
+
+def parse_seed_ids(values):
+    """Normalize QIDs given as a list or as comma/whitespace separated strings, dropping invalid ones"""
+    ids = []
+    for value in values:
+        for raw in re.split(r"[\s,]+", str(value)):
+            entity_id = normalize_entity_id(raw) if raw else ""
+            if re.match(r"^Q\d+$", entity_id) and entity_id not in ids:
+                ids.append(entity_id)
+    return ids
+
+def body_seed_ids(body):
+    """
+    The 'ids' of an export request body: a list of strings or a single string
+    Raises ValueError for any other body or 'ids' value
+    """
+    if body is None:
+        return []
+    if not isinstance(body, dict):
+        raise ValueError("The request body must be a JSON object")
+    ids = body.get('ids', [])
+    if isinstance(ids, str):
+        return [ids]
+    if not isinstance(ids, list) or not all(isinstance(value, str) for value in ids):
+        raise ValueError("'ids' must be a string or a list of strings")
+    return ids
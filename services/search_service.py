@@ -0,0 +1,231 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from services.http_service import api_get, sparql_query
+
+# Strategies tried in order. The legacy label scan can take the full SPARQL
+# timeout, so it is only used when listed here explicitly.
+SEARCH_STRATEGIES = [
+    name.strip()
+    for name in os.environ.get("SEARCH_STRATEGIES", "wbsearchentities,entitysearch").split(",")
+    if name.strip()
+]
+
+# Read timeout per strategy, in seconds
+STRATEGY_TIMEOUTS = {
+    "wbsearchentities": float(os.environ.get("SEARCH_API_TIMEOUT", 3)),
+    "entitysearch": float(os.environ.get("SEARCH_ENTITYSEARCH_TIMEOUT", 5)),
+    "label_scan": float(os.environ.get("SEARCH_LABEL_SCAN_TIMEOUT", 30)),
+}
+
+# How long to wait for a strategy before also starting the next one
+HEDGE_DELAY = float(os.environ.get("SEARCH_HEDGE_DELAY", 0.8))
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="search")
+
+
+class SearchUnavailable(Exception):
+    """Raised when every search strategy failed"""
+
+
+def _sparql_string(value):
+    """Quote a user-supplied string as a SPARQL string literal"""
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _search_api_params(query, limit, language):
+    """wbsearchentities: the prefix/full-text index behind the Wikidata search box"""
+    return {
+        "action": "wbsearchentities",
+        "language": language,
+        "uselang": language,
+        "type": "item",
+        "search": query,
+        "limit": limit,
+    }
+
+
+def _parse_search_api(data):
+    return [
+        {
+            "id": item.get("id", ""),
+            "label": item.get("label", "Unknown"),
+            "description": item.get("description", "")
+        }
+        for item in data.get("search", [])
+    ]
+
+
+def _entitysearch_query(query, limit, language):
+    """The same search index reached from SPARQL through the mwapi EntitySearch service"""
+    return f"""
+    SELECT ?item ?itemLabel ?itemDescription ?ordinal
+    WHERE {{
+      SERVICE wikibase:mwapi {{
+        bd:serviceParam wikibase:endpoint "www.wikidata.org";
+                        wikibase:api "EntitySearch";
+                        mwapi:search {_sparql_string(query)};
+                        mwapi:language {_sparql_string(language)}.
+        ?item wikibase:apiOutputItem mwapi:item.
+        ?ordinal wikibase:apiOrdinal true.
+      }}
+      SERVICE wikibase:label {{ bd:serviceParam wikibase:language {_sparql_string(language + ",en")}. }}
+    }}
+    ORDER BY ?ordinal
+    LIMIT {int(limit)}
+    """
+
+
+def _label_scan_query(query, limit, language):
+    """Legacy substring scan over every label in the language; slow and prone to timeouts"""
+    return f"""
+    SELECT DISTINCT ?item ?itemLabel ?itemDescription
+    WHERE {{
+      ?item rdfs:label ?label .
+      FILTER(CONTAINS(LCASE(?label), LCASE({_sparql_string(query)})))
+      FILTER(LANG(?label) = {_sparql_string(language)})
+
+      SERVICE wikibase:label {{ bd:serviceParam wikibase:language {_sparql_string(language)}. }}
+      OPTIONAL {{ ?item schema:description ?itemDescription. FILTER(LANG(?itemDescription) = {_sparql_string(language)}). }}
+    }}
+    LIMIT {int(limit)}
+    """
+
+
+def _parse_item_bindings(results):
+    entities = []
+    for result in results["results"]["bindings"]:
+        entity_id = result["item"]["value"].split("/")[-1]
+        entities.append({
+            "id": entity_id,
+            "label": result.get("itemLabel", {}).get("value", "Unknown"),
+            "description": result.get("itemDescription", {}).get("value", "")
+        })
+    return entities
+
+
+# How each strategy is sent and parsed: (transport, request builder, parser).
+# Shared with the async service so both paths return the same shapes.
+STRATEGY_SPECS = {
+    "wbsearchentities": ("api", _search_api_params, _parse_search_api),
+    "entitysearch": ("sparql", _entitysearch_query, _parse_item_bindings),
+    "label_scan": ("sparql", _label_scan_query, _parse_item_bindings),
+}
+
+
+def strategy_request(name, query, limit, language):
+    """Return (transport, request, read timeout, parser) for one strategy's request"""
+    transport, build, parse = STRATEGY_SPECS[name]
+    return transport, build(query, limit, language), STRATEGY_TIMEOUTS.get(name, 10), parse
+
+
+def _run_strategy(name, query, limit, language):
+    transport, payload, timeout, parse = strategy_request(name, query, limit, language)
+    if transport == "api":
+        return parse(api_get(payload, read_timeout=timeout))
+    return parse(sparql_query(payload, read_timeout=timeout))
+
+
+# Per-strategy outcome counters: served (won the race), empty, errors
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _record(strategy, outcome):
+    with _stats_lock:
+        counters = _stats.setdefault(strategy, {"served": 0, "empty": 0, "errors": 0})
+        counters[outcome] += 1
+
+
+def get_search_stats():
+    """Return how often each strategy served, came back empty or failed"""
+    with _stats_lock:
+        return {name: dict(counters) for name, counters in _stats.items()}
+
+
+class HedgedSearch:
+    """
+    The bookkeeping of one strategy race, whatever runs the strategies
+    A driver starts each name next_strategy() hands out, waits at most
+    wait_timeout() seconds for a strategy to finish, and reports it with
+    answer(). When nothing is running any more, outcome() decides the race.
+    """
+
+    def __init__(self, query, strategies=None, hedge_delay=HEDGE_DELAY):
+        self.query = query
+        self.names = [name for name in (strategies or SEARCH_STRATEGIES) if name in STRATEGY_SPECS]
+        self.hedge_delay = hedge_delay
+        self.running = 0
+        self._next_index = 0
+        self._last_launch = 0.0
+        self._empty_strategy = None
+
+    def next_strategy(self):
+        """Return the strategy to start now, or None if it is not yet time"""
+        now = time.monotonic()
+        if self._next_index < len(self.names) and (not self.running or now - self._last_launch >= self.hedge_delay):
+            name = self.names[self._next_index]
+            self._next_index += 1
+            self._last_launch = now
+            self.running += 1
+            return name
+        return None
+
+    def wait_timeout(self):
+        """Seconds until the next strategy is due, or None once all were started"""
+        if self._next_index < len(self.names):
+            return max(0.0, self._last_launch + self.hedge_delay - time.monotonic())
+        return None
+
+    def answer(self, name, results=None, error=None):
+        """Record a finished strategy; returns (results, name) if it won the race"""
+        self.running -= 1
+        if error is not None:
+            print(f"Search strategy {name} failed: {error}")
+            _record(name, "errors")
+            return None
+        if results:
+            _record(name, "served")
+            return results, name
+        _record(name, "empty")
+        self._empty_strategy = self._empty_strategy or name
+        return None
+
+    def outcome(self):
+        """The answer once every strategy finished without winning"""
+        if self._empty_strategy is not None:
+            return [], self._empty_strategy
+        raise SearchUnavailable(f"All search strategies failed for {self.query!r}")
+
+
+def search_entities(query, limit=10, language="en", strategies=None, hedge_delay=HEDGE_DELAY):
+    """
+    Search Wikidata by racing the configured strategies
+    The first strategy is started immediately; each following one is started
+    when the previous fails, answers empty, or is still running after
+    hedge_delay seconds. The first non-empty answer wins.
+    Returns (results, strategy_name); raises SearchUnavailable if all fail.
+    """
+    race = HedgedSearch(query, strategies, hedge_delay)
+    futures = {}
+
+    while True:
+        name = race.next_strategy()
+        if name is not None:
+            futures[_executor.submit(_run_strategy, name, query, limit, language)] = name
+
+        if not race.running:
+            return race.outcome()
+
+        done, _ = wait(futures, timeout=race.wait_timeout(), return_when=FIRST_COMPLETED)
+        for future in done:
+            name = futures.pop(future)
+            try:
+                won = race.answer(name, results=future.result())
+            except Exception as e:
+                won = race.answer(name, error=e)
+            if won is not None:
+                return won
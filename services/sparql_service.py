@@ -1,18 +1,57 @@
-import requests
-from SPARQLWrapper import SPARQLWrapper, JSON
+import os
+from services.cache_service import TTLCache
+from services.store_service import get_store
+from services.dump_service import ENTITY_URI, KIND_ITEM, _snak_value, get_dump_store
+from services.breaker_service import upstream_available
+from services.http_service import SPARQL_ENDPOINT, api_get, sparql_query
+from services.search_service import SearchUnavailable, search_entities
+from services.suggest_service import suggest_index
+from services.metrics_service import increment, timed
 
 # Wikidata SPARQL endpoint
-WIKIDATA_ENDPOINT = "https://query.wikidata.org/sparql"
+WIKIDATA_ENDPOINT = SPARQL_ENDPOINT
 
-def search_wikidata_fallback(query, limit=10):
+# Process-wide entity cache shared by the entity page and the graph builder
+entity_cache = TTLCache(
+    maxsize=int(os.environ.get("ENTITY_CACHE_SIZE", 2048)),
+    ttl=int(os.environ.get("ENTITY_CACHE_TTL", 3600)),
+    stale_ttl=int(os.environ.get("ENTITY_CACHE_STALE_TTL", 0)),
+    name="entity",
+)
+
+# Search results are cached by normalized (query, limit, language); empty
+# answers get a shorter TTL so new Wikidata items show up reasonably soon
+SEARCH_CACHE_TTL = int(os.environ.get("SEARCH_CACHE_TTL", 3600))
+SEARCH_NEGATIVE_TTL = int(os.environ.get("SEARCH_NEGATIVE_TTL", 300))
+search_cache = TTLCache(
+    maxsize=int(os.environ.get("SEARCH_CACHE_SIZE", 4096)),
+    ttl=SEARCH_CACHE_TTL,
+    name="search",
+)
+
+# Placeholder results shown when every search method fails
+FALLBACK_ENTITIES = [
+    {"id": "Q5", "label": "human", "description": "common name of Homo sapiens"},
+    {"id": "Q7725634", "label": "Literary work", "description": "creative work in the literary medium"},
+    {"id": "Q515", "label": "city", "description": "large permanent human settlement"},
+    {"id": "Q35120", "label": "entity", "description": "the ultimate being, a concept in metaphysics"},
+    {"id": "Q146", "label": "house cat", "description": "domesticated species of feline"}
+]
+
+@timed()
+def search_wikidata_fallback(query, limit=10, language="en"):
     """
     Fallback method for searching Wikidata entities using a simpler approach
     """
     # First, try direct HTTP request to Wikidata API
     try:
-        url = f"https://www.wikidata.org/w/api.php?action=wbsearchentities&format=json&language=en&search={query}&limit={limit}"
-        response = requests.get(url)
-        data = response.json()
+        data = api_get({
+            "action": "wbsearchentities",
+            "language": language,
+            "uselang": language,
+            "search": query,
+            "limit": limit,
+        })
         
         if 'search' in data:
             entities = []
@@ -26,68 +65,122 @@ def search_wikidata_fallback(query, limit=10):
             return entities
     except Exception as e:
         print(f"Fallback API search error: {e}")
+        increment("errors", operation="search_wikidata_fallback")
     
     # If direct API fails, create dummy entities
-    return [
-        {"id": "Q5", "label": "human", "description": "common name of Homo sapiens"},
-        {"id": "Q7725634", "label": "Literary work", "description": "creative work in the literary medium"},
-        {"id": "Q515", "label": "city", "description": "large permanent human settlement"},
-        {"id": "Q35120", "label": "entity", "description": "the ultimate being, a concept in metaphysics"},
-        {"id": "Q146", "label": "house cat", "description": "domesticated species of feline"}
-    ]
+    return list(FALLBACK_ENTITIES)
+
+def normalize_query(query):
+    """Collapse whitespace and case so trivially different queries share a cache entry"""
+    return " ".join(query.split()).casefold()
+
+# Lookups with fallbacks are written once, as flows: generators that yield
+# each step they need and are sent its result, or have its exception thrown
+# in. A step is ("sparql", query), ("api", params), ("search", query, limit,
+# language), ("call", function, *args) for blocking local work such as the
+# stores, or a list of steps to run concurrently, answered with a list of
+# results and exceptions. run_flow runs a flow with blocking I/O;
+# async_sparql_service runs the same flows on the event loop.
+
+def run_flow(flow):
+    """Run a flow to completion, one step at a time, and return its result"""
+    result, error = None, None
+    while True:
+        try:
+            step = flow.send(result) if error is None else flow.throw(error)
+        except StopIteration as stop:
+            return stop.value
+        result, error = None, None
+        try:
+            if isinstance(step, list):
+                result = [_run_step_or_error(item) for item in step]
+            else:
+                result = _run_step(step)
+        except Exception as e:
+            error = e
+
+def _run_step_or_error(step):
+    try:
+        return _run_step(step)
+    except Exception as e:
+        return e
+
+def _run_step(step):
+    kind = step[0]
+    if kind == "sparql":
+        return sparql_query(step[1])
+    if kind == "api":
+        return api_get(step[1])
+    if kind == "search":
+        return search_entities(*step[1:])
+    if kind == "call":
+        return step[1](*step[2:])
+    raise ValueError(f"Unknown flow step {kind!r}")
 
-def search_wikidata(query, limit=10):
+@timed()
+def search_wikidata(query, limit=10, language="en"):
     """
     Search Wikidata entities by label
     Returns a list of matching entities with their IDs and labels
     """
-    sparql = SPARQLWrapper(WIKIDATA_ENDPOINT)
-    sparql.setMethod('GET')
-    sparql.setTimeout(30)  
-    
-    # SPARQL query to find entities by label - simplified for reliability
-    query_text = f"""
-    SELECT DISTINCT ?item ?itemLabel ?itemDescription
-    WHERE {{
-      ?item rdfs:label ?label .
-      FILTER(CONTAINS(LCASE(?label), LCASE("{query}")))
-      FILTER(LANG(?label) = "en")
-      
-      SERVICE wikibase:label {{ bd:serviceParam wikibase:language "en". }}
-      OPTIONAL {{ ?item schema:description ?itemDescription. FILTER(LANG(?itemDescription) = "en"). }}
-    }}
-    LIMIT {limit}
+    key = (normalize_query(query), limit, language)
+    if not key[0]:
+        return []
+    results, _ = search_cache.get_or_load(key, lambda: run_flow(search_flow(*key)), ttl_for=search_ttl)
+    return results
+
+def search_ttl(value):
+    """Cache empty answers briefly and degraded placeholder answers not at all"""
+    results, degraded = value
+    if degraded:
+        return 0
+    return SEARCH_CACHE_TTL if results else SEARCH_NEGATIVE_TTL
+
+def search_flow(query, limit, language):
     """
-    
-    sparql.setQuery(query_text)
-    sparql.setReturnFormat(JSON)
-    
+    Flow of a normalized search: read it from the persistent store, else run
+    it against Wikidata and store it. Returns (results, degraded); degraded
+    answers are placeholders, not search results
+    """
+    store_key = f"{language}|{limit}|{query}"
+    stored = yield ("call", get_store().get, "search", store_key)
+    if stored is not None:
+        return stored, False
+
     try:
-        results = sparql.query().convert()
-        
-        entities = []
-        for result in results["results"]["bindings"]:
-            entity_id = result["item"]["value"].split("/")[-1]
-            entity = {
-                "id": entity_id,
-                "label": result.get("itemLabel", {}).get("value", "Unknown"),
-                "description": result.get("itemDescription", {}).get("value", "")
-            }
-            entities.append(entity)
-            
-        return entities
-        
-    except Exception as e:
-        print(f"SPARQL query error: {e}")
-        # Try fallback method
-        return search_wikidata_fallback(query, limit)
+        # search_entities counts which strategy answered
+        results, _ = yield ("search", query, limit, language)
+    except SearchUnavailable as e:
+        print(f"Search error: {e}")
+        increment("fallbacks", kind="search_placeholder")
+        return list(FALLBACK_ENTITIES), True
+    yield ("call", _remember_search, store_key, results)
+    return results, False
 
+def _remember_search(store_key, results):
+    get_store().set("search", store_key, results, ttl=search_ttl((results, False)))
+    suggest_index.add_many(results)
+
+@timed()
 def get_basic_entity_info(entity_id):
     """Fallback method to get basic entity information"""
-    sparql = SPARQLWrapper(WIKIDATA_ENDPOINT)
-    
+    return run_flow(basic_entity_info_flow(entity_id))
+
+def basic_entity_info_flow(entity_id):
+    """Flow of an entity's label and description: the persistent store, else Wikidata"""
+    store = get_store()
+    stored = yield ("call", store.get, "basic", entity_id)
+    if stored is not None:
+        return stored
+
+    info = yield from _fetch_basic_entity_info(entity_id)
+    if info is not None:
+        yield ("call", store.set, "basic", entity_id, info)
+    return info
+
+def _basic_info_query(entity_id):
     # simple query  to get label and description
-    query_text = f"""
+    return f"""
     SELECT ?entityLabel ?entityDescription
     WHERE {{
       BIND(wd:{entity_id} AS ?entity)
@@ -95,60 +188,122 @@ def get_basic_entity_info(entity_id):
     }}
     LIMIT 1
     """
+
+def _basic_info_api_params(entity_id):
+    return {
+        "action": "wbgetentities",
+        "ids": entity_id,
+        "languages": "en",
+        "props": "labels|descriptions",
+    }
+
+def _parse_basic_info(entity_id, results):
+    """Turn basic-info SPARQL results into an entity dict, or None if empty"""
+    if not results["results"]["bindings"]:
+        return None
+
+    result = results["results"]["bindings"][0]
     
-    sparql.setQuery(query_text)
-    sparql.setReturnFormat(JSON)
-    
-    try:
-        results = sparql.query().convert()
-        
-        if not results["results"]["bindings"]:
-            # Try API call directly
-            try:
-                url = f"https://www.wikidata.org/w/api.php?action=wbgetentities&ids={entity_id}&format=json&languages=en"
-                response = requests.get(url)
-                data = response.json()
-                
-                if 'entities' in data and entity_id in data['entities']:
-                    entity = data['entities'][entity_id]
-                    label = entity.get('labels', {}).get('en', {}).get('value', entity_id)
-                    desc = entity.get('descriptions', {}).get('en', {}).get('value', '')
-                    
-                    return {
-                        "id": entity_id,
-                        "label": label,
-                        "description": desc,
-                        "properties": []
-                    }
-            except Exception as api_err:
-                print(f"API error for {entity_id}: {api_err}")
-                
-            return None
-            
-        result = results["results"]["bindings"][0]
+    return {
+        "id": entity_id,
+        "label": result.get("entityLabel", {}).get("value", entity_id),
+        "description": result.get("entityDescription", {}).get("value", ""),
+        "properties": []
+    }
+
+def _parse_basic_info_api(entity_id, data):
+    """Turn a wbgetentities response into an entity dict, or None if missing"""
+    if 'entities' in data and entity_id in data['entities']:
+        entity = data['entities'][entity_id]
+        label = entity.get('labels', {}).get('en', {}).get('value', entity_id)
+        desc = entity.get('descriptions', {}).get('en', {}).get('value', '')
         
         return {
             "id": entity_id,
-            "label": result.get("entityLabel", {}).get("value", entity_id),
-            "description": result.get("entityDescription", {}).get("value", ""),
+            "label": label,
+            "description": desc,
             "properties": []
         }
-    except Exception as e:
-        print(f"Failed to get basic entity info for {entity_id}: {e}")
+    return None
+
+def _fetch_basic_entity_info(entity_id):
+    """Flow querying Wikidata for an entity's label and description, bypassing the store"""
+    # Skip SPARQL entirely while its circuit is open
+    if upstream_available("sparql"):
+        try:
+            results = yield ("sparql", _basic_info_query(entity_id))
+            info = _parse_basic_info(entity_id, results)
+            if info is not None:
+                return info
+        except Exception as e:
+            print(f"Failed to get basic entity info for {entity_id}: {e}")
+            increment("errors", operation="get_basic_entity_info")
+
+    # Try API call directly
+    try:
+        return _parse_basic_info_api(entity_id, (yield ("api", _basic_info_api_params(entity_id))))
+    except Exception as api_err:
+        print(f"API error for {entity_id}: {api_err}")
+        increment("errors", operation="get_basic_entity_info")
         return None
 
+@timed()
 def get_entity_details(entity_id):
     """
     Get detailed information about a specific entity
     Returns a dictionary with entity information and its properties
+    Results are served from the process-wide entity cache when available
     """
-    sparql = SPARQLWrapper(WIKIDATA_ENDPOINT)
-    sparql.setMethod('GET')
-    sparql.setTimeout(30)  # Set a longer timeout
-    
+    return entity_cache.get_or_load(entity_id, lambda: run_flow(entity_details_flow(entity_id)))
+
+def _dump_entity(entity_id):
+    dump_store = get_dump_store()
+    return dump_store.get_entity(entity_id) if dump_store is not None else None
+
+def entity_details_flow(entity_id):
+    """
+    Flow reading an entity from the local dump store or the persistent
+    store, fetching and storing it on a miss
+    """
+    local = yield ("call", _dump_entity, entity_id)
+    if local is not None:
+        increment("store_hits", store="dump")
+        return local
+
+    store = get_store()
+    stored = yield ("call", store.get, "entity", entity_id)
+    if stored is not None:
+        increment("store_hits", store="entity")
+        return stored
+
+    entity_info = yield from _fetch_entity_details(entity_id)
+    # Only persist complete answers; a basic-info fallback (no properties)
+    # usually means the SPARQL query failed and should be retried later
+    if entity_info and entity_info.get("properties"):
+        yield ("call", store.set, "entity", entity_id, entity_info)
+    return entity_info
+
+def invalidate_entity(entity_id):
+    """
+    Forget everything cached and stored about an entity (details, summary,
+    property pages), so the next lookup fetches it again
+    """
+    entity_cache.delete(entity_id)
+    for key in entity_cache.keys():
+        if isinstance(key, tuple) and len(key) > 1 and key[1] == entity_id:
+            entity_cache.delete(key)
+    store = get_store()
+    store.delete("entity", entity_id)
+    store.delete("basic", entity_id)
+    store.delete_prefix("properties", f"{entity_id}|")
+
+# Property values returned with entity details
+ENTITY_DETAILS_LIMIT = 100
+
+def _entity_details_query(entity_id):
     # Simpler SPARQL query to get entity details
-    query_text = f"""
-    SELECT ?entity ?entityLabel ?entityDescription ?prop ?propLabel ?value ?valueLabel
+    return f"""
+    SELECT ?entity ?entityLabel ?entityDescription ?revision ?prop ?value ?valueLabel
     WHERE {{
       BIND(wd:{entity_id} AS ?entity)
       ?entity ?prop ?value .
@@ -156,59 +311,504 @@ def get_entity_details(entity_id):
       # Filter for direct properties only
       FILTER(STRSTARTS(STR(?prop), "http://www.wikidata.org/prop/direct/"))
       
+      # The revision these values come from, for refresh_service
+      OPTIONAL {{ ?entity schema:version ?revision . }}
+      
       # Get labels in English
       SERVICE wikibase:label {{ bd:serviceParam wikibase:language "en". }}
     }}
-    LIMIT 100
+    LIMIT {ENTITY_DETAILS_LIMIT}
     """
+
+def _parse_entity_details(entity_id, results):
+    """Turn entity-details SPARQL results into an entity dict, or None if empty"""
+    if not results["results"]["bindings"]:
+        return None
+        
+    # Extract entity information
+    entity_info = {
+        "id": entity_id,
+        "label": "Unknown Entity",
+        "description": "",
+        "properties": []
+    }
     
-    sparql.setQuery(query_text)
-    sparql.setReturnFormat(JSON)
+    # Try to get entity label and description
+    for result in results["results"]["bindings"]:
+        if "entityLabel" in result:
+            entity_info["label"] = result["entityLabel"]["value"]
+            break
+            
+    for result in results["results"]["bindings"]:
+        if "entityDescription" in result:
+            entity_info["description"] = result["entityDescription"]["value"]
+            break
+
+    for result in results["results"]["bindings"]:
+        if "revision" in result:
+            entity_info["lastrevid"] = int(result["revision"]["value"])
+            break
     
-    try:
-        results = sparql.query().convert()
-        
-        if not results["results"]["bindings"]:
-            print(f"No results returned for entity {entity_id}")
-            return get_basic_entity_info(entity_id)
+    # Extract properties
+    for result in results["results"]["bindings"]:
+        if "prop" in result and "value" in result:
+            prop_uri = result["prop"]["value"]
+            prop_id = prop_uri.split("/")[-1]
             
-        # Extract entity information
-        entity_info = {
-            "id": entity_id,
-            "label": "Unknown Entity",
-            "description": "",
-            "properties": []
-        }
-        
-        # Try to get entity label and description
-        for result in results["results"]["bindings"]:
-            if "entityLabel" in result:
-                entity_info["label"] = result["entityLabel"]["value"]
-                break
-                
-        for result in results["results"]["bindings"]:
-            if "entityDescription" in result:
-                entity_info["description"] = result["entityDescription"]["value"]
-                break
-        
-        # Extract properties
-        for result in results["results"]["bindings"]:
-            if "prop" in result and "value" in result:
-                prop_uri = result["prop"]["value"]
-                prop_id = prop_uri.split("/")[-1]
-                
-                property_info = {
-                    "id": prop_id,
-                    "label": result.get("propLabel", {}).get("value", prop_id),
-                    "value": result.get("valueLabel", {}).get("value", result["value"]["value"]),
-                    "raw_value": result["value"]["value"]
-                }
-                
-                entity_info["properties"].append(property_info)
-        
-        return entity_info
-        
+            property_info = {
+                "id": prop_id,
+                # Stored as the PID; label_service.localize_entity names it when serving
+                "label": result.get("propLabel", {}).get("value", prop_id),
+                "value": result.get("valueLabel", {}).get("value", result["value"]["value"]),
+                "raw_value": result["value"]["value"]
+            }
+            
+            entity_info["properties"].append(property_info)
+    
+    return entity_info
+
+def _fetch_entity_details(entity_id):
+    """
+    Flow querying Wikidata for an entity, bypassing the cache
+    Falls back to the action API (while SPARQL is failing or its circuit is
+    open), then to an expired cached copy, then to basic entity info
+    """
+    if upstream_available("sparql"):
+        try:
+            entity_info = _parse_entity_details(entity_id, (yield ("sparql", _entity_details_query(entity_id))))
+        except Exception as e:
+            print(f"SPARQL query error for entity {entity_id}: {e}")
+            increment("errors", operation="get_entity_details")
+        else:
+            if entity_info is not None:
+                return entity_info
+            print(f"No results returned for entity {entity_id}")
+            increment("fallbacks", kind="basic_entity_info")
+            return (yield from basic_entity_info_flow(entity_id))
+
+    if upstream_available("api"):
+        try:
+            entity_info = (yield from _fetch_entities_details_api([entity_id])).get(entity_id)
+            if entity_info is not None:
+                increment("fallbacks", kind="entity_details_api")
+                return entity_info
+        except Exception as e:
+            print(f"API error for entity {entity_id}: {e}")
+            increment("errors", operation="get_entity_details")
+
+    stale = entity_cache.get_stale(entity_id)
+    if stale is not None:
+        increment("fallbacks", kind="stale_cache")
+        return stale
+
+    increment("fallbacks", kind="basic_entity_info")
+    # Try a fallback basic query
+    return (yield from basic_entity_info_flow(entity_id))
+
+def _entity_claims_api_params(entity_ids):
+    return {
+        "action": "wbgetentities",
+        "ids": "|".join(entity_ids),
+        "languages": "en",
+        "props": "info|labels|descriptions|claims",
+    }
+
+def _best_rank_claims(claims):
+    """The claims a wdt: triple would show: preferred ones if any, else the normal ones"""
+    preferred = [claim for claim in claims if claim.get("rank") == "preferred"]
+    return preferred or [claim for claim in claims if claim.get("rank", "normal") == "normal"]
+
+def _parse_entity_claims_api(entity_id, data):
+    """
+    Turn a wbgetentities claims response into an entity dict shaped like
+    _parse_entity_details, or None if missing. Item values are left as QIDs;
+    _apply_value_labels fills in their labels.
+    """
+    entity = data.get("entities", {}).get(entity_id)
+    if entity is None or "missing" in entity:
+        return None
+
+    entity_info = {
+        "id": entity_id,
+        "label": entity.get("labels", {}).get("en", {}).get("value", entity_id),
+        "description": entity.get("descriptions", {}).get("en", {}).get("value", ""),
+        "properties": []
+    }
+    if "lastrevid" in entity:
+        entity_info["lastrevid"] = entity["lastrevid"]
+    for prop_id, claims in entity.get("claims", {}).items():
+        for claim in _best_rank_claims(claims):
+            converted = _snak_value(claim.get("mainsnak", {}))
+            if converted is None:
+                continue
+            kind, value = converted
+            entity_info["properties"].append({
+                "id": prop_id,
+                "label": prop_id,
+                "value": value,
+                "raw_value": ENTITY_URI + value if kind == KIND_ITEM else value
+            })
+            if len(entity_info["properties"]) >= ENTITY_DETAILS_LIMIT:
+                return entity_info
+    return entity_info
+
+def _value_label_ids(entity_infos):
+    """QIDs of item values that still need a label"""
+    return list(dict.fromkeys(
+        prop["value"] for entity_info in entity_infos for prop in entity_info["properties"]
+        if prop["raw_value"] == ENTITY_URI + prop["value"]
+    ))
+
+def _label_api_params(entity_ids):
+    return {
+        "action": "wbgetentities",
+        "ids": "|".join(entity_ids),
+        "languages": "en",
+        "props": "labels",
+    }
+
+def _apply_value_labels(entity_infos, data):
+    labels = {
+        entity_id: entity["labels"]["en"]["value"]
+        for entity_id, entity in data.get("entities", {}).items()
+        if "en" in entity.get("labels", {})
+    }
+    for entity_info in entity_infos:
+        for prop in entity_info["properties"]:
+            if prop["raw_value"] == ENTITY_URI + prop["value"] and prop["value"] in labels:
+                prop["value"] = labels[prop["value"]]
+
+def _fetch_entities_details_api(entity_ids):
+    """
+    Flow building entity details from wbgetentities claims, 50 entities per
+    call; the value label batches are one concurrent step
+    Returns {QID: entity dict} for the entities that were found
+    """
+    found = {}
+    for start in range(0, len(entity_ids), BATCH_API_SIZE):
+        chunk = entity_ids[start:start + BATCH_API_SIZE]
+        data = yield ("api", _entity_claims_api_params(chunk))
+        for entity_id in chunk:
+            entity_info = _parse_entity_claims_api(entity_id, data)
+            if entity_info is not None:
+                found[entity_id] = entity_info
+
+    label_ids = _value_label_ids(found.values())
+    if label_ids:
+        responses = yield [("api", _label_api_params(label_ids[start:start + BATCH_API_SIZE]))
+                           for start in range(0, len(label_ids), BATCH_API_SIZE)]
+        for data in responses:
+            if isinstance(data, Exception):
+                # Unlabeled values still show their QIDs
+                print(f"API label error: {data}")
+                increment("errors", operation="get_entity_details")
+                continue
+            _apply_value_labels(found.values(), data)
+    return found
+
+@timed()
+def prefetch_entity_details(entity_ids):
+    """
+    Warm the entity cache for entities that are likely to be viewed next
+    Entities already cached are skipped, stored ones are copied into the cache,
+    and the rest are fetched together through wbgetentities. Returns the QIDs
+    by outcome: {"cached", "stored", "fetched", "missing"}.
+    """
+    outcomes = {"cached": [], "stored": [], "fetched": [], "missing": []}
+    dump_store = get_dump_store()
+    store = get_store()
+    wanted = []
+    for entity_id in dict.fromkeys(entity_ids):
+        if entity_cache.get(entity_id) is not None:
+            outcomes["cached"].append(entity_id)
+            continue
+        local = dump_store.get_entity(entity_id) if dump_store is not None else None
+        if local is None:
+            local = store.get("entity", entity_id)
+        if local is not None:
+            entity_cache.set(entity_id, local)
+            outcomes["stored"].append(entity_id)
+        else:
+            wanted.append(entity_id)
+
+    if wanted:
+        found = run_flow(_fetch_entities_details_api(wanted))
+        for entity_id, entity_info in found.items():
+            entity_cache.set(entity_id, entity_info)
+            if entity_info["properties"]:
+                store.set("entity", entity_id, entity_info)
+        outcomes["fetched"] = list(found)
+        outcomes["missing"] = [entity_id for entity_id in wanted if entity_id not in found]
+    return outcomes
+
+# Properties listed first when an entity's properties are paged, most useful first
+PRIORITY_PROPERTIES = [
+    "P31", "P279", "P21", "P106", "P27", "P17", "P131", "P276", "P19", "P20",
+    "P569", "P570", "P18", "P50", "P170", "P57", "P112", "P169", "P159", "P36",
+    "P35", "P6", "P22", "P25", "P26", "P40", "P39", "P69", "P108", "P463",
+    "P166", "P800", "P361", "P527", "P150",
+]
+_PRIORITY_RANK = {prop_id: rank for rank, prop_id in enumerate(PRIORITY_PROPERTIES)}
+
+# Rows per property page, and values kept per property (a country has
+# thousands of "contains" values; the first few say enough)
+PROPERTY_PAGE_SIZE = int(os.environ.get("PROPERTY_PAGE_SIZE", 100))
+PROPERTY_VALUE_CAP = int(os.environ.get("PROPERTY_VALUE_CAP", 20))
+
+def _property_rank(prop_id):
+    number = int(prop_id[1:]) if prop_id[1:].isdigit() else 0
+    return (_PRIORITY_RANK.get(prop_id, len(PRIORITY_PROPERTIES)), number)
+
+def _property_counts_query(entity_id):
+    return f"""
+    SELECT ?prop (COUNT(?value) AS ?count)
+    WHERE {{
+      wd:{entity_id} ?prop ?value .
+      FILTER(STRSTARTS(STR(?prop), "http://www.wikidata.org/prop/direct/"))
+    }}
+    GROUP BY ?prop
+    """
+
+def _plan_property_pages(counts, page_size, value_cap):
+    """
+    Split {property ID: value count} into pages of property IDs
+    Properties are ordered by priority and each contributes at most value_cap
+    rows, so every page stays near page_size rows however large the entity is
+    """
+    pages = []
+    current, rows = [], 0
+    for prop_id in sorted(counts, key=_property_rank):
+        size = min(counts[prop_id], value_cap)
+        if current and rows + size > page_size:
+            pages.append(current)
+            current, rows = [], 0
+        current.append(prop_id)
+        rows += size
+    if current:
+        pages.append(current)
+    return pages
+
+def _property_page_query(entity_id, prop_ids, value_cap):
+    # One capped sub-select per property, so large properties never return all values
+    parts = "\n      UNION\n".join(
+        f"      {{ SELECT ?prop ?value WHERE {{ wd:{entity_id} wdt:{prop_id} ?value . "
+        f"BIND(wdt:{prop_id} AS ?prop) }} LIMIT {int(value_cap)} }}"
+        for prop_id in prop_ids
+    )
+    return f"""
+    SELECT ?entity ?entityLabel ?entityDescription ?prop ?value ?valueLabel
+    WHERE {{
+      BIND(wd:{entity_id} AS ?entity)
+{parts}
+      SERVICE wikibase:label {{ bd:serviceParam wikibase:language "en". }}
+    }}
+    """
+
+def _property_plan(entity_id, page_size, value_cap):
+    """Return (pages of property IDs, {property ID: value count}) for an entity"""
+    def load():
+        dump_store = get_dump_store()
+        local = dump_store.get_entity(entity_id) if dump_store is not None else None
+        if local is not None:
+            counts = {}
+            for prop in local["properties"]:
+                counts[prop["id"]] = counts.get(prop["id"], 0) + 1
+        else:
+            results = sparql_query(_property_counts_query(entity_id))
+            counts = {
+                result["prop"]["value"].split("/")[-1]: int(result["count"]["value"])
+                for result in results["results"]["bindings"]
+            }
+        return _plan_property_pages(counts, page_size, value_cap), counts
+
+    return entity_cache.get_or_load(("property_plan", entity_id, page_size, value_cap), load)
+
+@timed()
+def get_entity_properties_page(entity_id, page=1, page_size=PROPERTY_PAGE_SIZE, value_cap=PROPERTY_VALUE_CAP):
+    """
+    Return one page of an entity's properties, most important properties first
+    Each property keeps at most value_cap values. The result has the usual
+    entity fields plus page, pages, has_more and capped (property ID -> total
+    values, for properties that were cut). Returns None if nothing was found.
+    """
+    try:
+        pages, counts = _property_plan(entity_id, page_size, value_cap)
     except Exception as e:
-        print(f"SPARQL query error for entity {entity_id}: {e}")
-        # Try a fallback basic query
-        return get_basic_entity_info(entity_id)
\ No newline at end of file
+        print(f"Failed to plan property pages for {entity_id}: {e}")
+        increment("errors", operation="get_entity_properties_page")
+        return None
+    if not 1 <= page <= len(pages):
+        return None
+    prop_ids = pages[page - 1]
+
+    def load():
+        dump_store = get_dump_store()
+        local = dump_store.get_entity(entity_id) if dump_store is not None else None
+        if local is not None:
+            wanted = set(prop_ids)
+            entity_info = dict(local, properties=[])
+            kept = {}
+            for prop in sorted(local["properties"], key=lambda prop: _property_rank(prop["id"])):
+                if prop["id"] in wanted and kept.get(prop["id"], 0) < value_cap:
+                    kept[prop["id"]] = kept.get(prop["id"], 0) + 1
+                    entity_info["properties"].append(prop)
+            return entity_info
+
+        store = get_store()
+        store_key = f"{entity_id}|{page}|{page_size}|{value_cap}"
+        stored = store.get("properties", store_key)
+        if stored is not None:
+            return stored
+        try:
+            entity_info = _parse_entity_details(
+                entity_id, sparql_query(_property_page_query(entity_id, prop_ids, value_cap))
+            )
+        except Exception as e:
+            print(f"SPARQL query error for {entity_id} property page {page}: {e}")
+            increment("errors", operation="get_entity_properties_page")
+            return None
+        if entity_info is not None:
+            entity_info["properties"].sort(key=lambda prop: _property_rank(prop["id"]))
+            store.set("properties", store_key, entity_info)
+        return entity_info
+
+    entity_info = entity_cache.get_or_load(("properties", entity_id, page, page_size, value_cap), load)
+    if entity_info is None:
+        return None
+    return dict(
+        entity_info,
+        page=page,
+        pages=len(pages),
+        has_more=page < len(pages),
+        capped={prop_id: counts[prop_id] for prop_id in prop_ids if counts[prop_id] > value_cap},
+    )
+
+def iter_entity_properties(entity_id, page_size=PROPERTY_PAGE_SIZE, value_cap=PROPERTY_VALUE_CAP):
+    """Yield an entity's property pages one at a time, fetching each only when it is needed"""
+    page = 1
+    while True:
+        entity_page = get_entity_properties_page(entity_id, page, page_size, value_cap)
+        if entity_page is None:
+            return
+        yield entity_page
+        if not entity_page["has_more"]:
+            return
+        page += 1
+
+# Maximum QIDs per VALUES query and per wbgetentities call
+BATCH_QUERY_SIZE = 200
+BATCH_API_SIZE = 50
+
+@timed()
+def get_entities_details_batch(entity_ids):
+    """
+    Get label, description, image (P18) and types (P31) for many entities at once
+    Returns a dictionary mapping each found QID to its summary
+
+    Summaries are cached in the entity cache, so only uncached IDs are queried,
+    in chunks of one VALUES query each instead of one query per entity.
+    """
+    summaries = {}
+    missing = []
+    dump_store = get_dump_store()
+    for entity_id in dict.fromkeys(entity_ids):
+        cached = entity_cache.get(("summary", entity_id))
+        if cached is None and dump_store is not None:
+            cached = dump_store.get_summary(entity_id)
+        if cached is not None:
+            summaries[entity_id] = cached
+        else:
+            missing.append(entity_id)
+
+    for start in range(0, len(missing), BATCH_QUERY_SIZE):
+        chunk = missing[start:start + BATCH_QUERY_SIZE]
+        try:
+            fetched = _query_summaries(chunk)
+        except Exception as e:
+            print(f"SPARQL batch query error: {e}")
+            increment("errors", operation="get_entities_details_batch")
+            increment("fallbacks", kind="summaries_api")
+            fetched = _fetch_summaries_api(chunk)
+        for entity_id, summary in fetched.items():
+            entity_cache.set(("summary", entity_id), summary)
+        summaries.update(fetched)
+
+    return summaries
+
+def _query_summaries(entity_ids):
+    """Fetch entity summaries with a single VALUES query"""
+    values = " ".join(f"wd:{entity_id}" for entity_id in entity_ids)
+    query_text = f"""
+    SELECT ?entity ?entityLabel ?entityDescription ?image ?type ?typeLabel
+    WHERE {{
+      VALUES ?entity {{ {values} }}
+      OPTIONAL {{ ?entity wdt:P18 ?image. }}
+      OPTIONAL {{ ?entity wdt:P31 ?type. }}
+      SERVICE wikibase:label {{ bd:serviceParam wikibase:language "en". }}
+    }}
+    """
+    results = sparql_query(query_text)
+
+    summaries = {}
+    for result in results["results"]["bindings"]:
+        entity_id = result["entity"]["value"].split("/")[-1]
+        summary = summaries.get(entity_id)
+        if summary is None:
+            summary = summaries[entity_id] = {
+                "id": entity_id,
+                "label": result.get("entityLabel", {}).get("value", entity_id),
+                "description": result.get("entityDescription", {}).get("value", ""),
+                "image": None,
+                "types": []
+            }
+        if "image" in result and summary["image"] is None:
+            summary["image"] = result["image"]["value"]
+        if "type" in result:
+            type_id = result["type"]["value"].split("/")[-1]
+            if all(t["id"] != type_id for t in summary["types"]):
+                summary["types"].append({
+                    "id": type_id,
+                    "label": result.get("typeLabel", {}).get("value", type_id)
+                })
+    return summaries
+
+def _fetch_summaries_api(entity_ids):
+    """Fetch entity summaries through wbgetentities, 50 IDs per call"""
+    summaries = {}
+    for start in range(0, len(entity_ids), BATCH_API_SIZE):
+        chunk = entity_ids[start:start + BATCH_API_SIZE]
+        try:
+            data = api_get({
+                "action": "wbgetentities",
+                "ids": "|".join(chunk),
+                "languages": "en",
+                "props": "labels|descriptions|claims",
+            })
+        except Exception as e:
+            print(f"API batch error: {e}")
+            increment("errors", operation="get_entities_details_batch")
+            continue
+
+        for entity_id, entity in data.get("entities", {}).items():
+            if "missing" in entity:
+                continue
+            claims = entity.get("claims", {})
+            image = None
+            for claim in claims.get("P18", []):
+                file_name = claim.get("mainsnak", {}).get("datavalue", {}).get("value")
+                if file_name:
+                    image = "http://commons.wikimedia.org/wiki/Special:FilePath/" + file_name.replace(" ", "%20")
+                    break
+            types = []
+            for claim in claims.get("P31", []):
+                type_id = claim.get("mainsnak", {}).get("datavalue", {}).get("value", {}).get("id")
+                if type_id:
+                    types.append({"id": type_id, "label": type_id})
+            summaries[entity_id] = {
+                "id": entity_id,
+                "label": entity.get("labels", {}).get("en", {}).get("value", entity_id),
+                "description": entity.get("descriptions", {}).get("en", {}).get("value", ""),
+                "image": image,
+                "types": types
+            }
+    return summaries
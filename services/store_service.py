@@ -0,0 +1,268 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from services.metrics_service import increment
+
+# Bump when the table layout or the shape of stored values changes.
+# Stores written with a different version are discarded on open.
+SCHEMA_VERSION = 1
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "entity_store.sqlite3")
+
+STORE_BACKEND = os.environ.get("ENTITY_STORE_BACKEND", "sqlite")
+STORE_PATH = os.environ.get("ENTITY_STORE_PATH", DEFAULT_STORE_PATH)
+STORE_TTL = int(os.environ.get("ENTITY_STORE_TTL", 7 * 24 * 3600))
+STORE_MAX_BYTES = int(os.environ.get("ENTITY_STORE_MAX_BYTES", 256 * 1024 * 1024))
+
+# How many writes between size checks
+COMPACT_EVERY = 500
+
+
+class NullStore:
+    """Store backend that keeps nothing, used when persistence is disabled"""
+
+    def get(self, namespace, key):
+        return None
+
+    def set(self, namespace, key, value, ttl=None):
+        pass
+
+    def delete(self, namespace, key):
+        pass
+
+    def delete_prefix(self, namespace, prefix):
+        pass
+
+    def touch(self, namespace, key, ttl=None):
+        return False
+
+    def expiring(self, namespace):
+        return []
+
+    def changed_since(self, namespace, since):
+        return []
+
+    def compact(self):
+        return 0
+
+    def stats(self):
+        return {"backend": "none"}
+
+
+class SQLiteStore:
+    """
+    Key-value store on a local SQLite database in WAL mode
+
+    WAL lets every gunicorn worker on the host read concurrently while one
+    writes, so entries survive restarts and are shared between workers.
+    Values are JSON-encoded and grouped by namespace (entity, basic, search...).
+    """
+
+    def __init__(self, path=STORE_PATH, ttl=STORE_TTL, max_bytes=STORE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._init_schema()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        # Take the write lock before checking so workers starting together
+        # don't race to rebuild the table
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            row = conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+            if row is None or int(row[0]) != SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS entries")
+                conn.execute(
+                    """
+                    CREATE TABLE entries (
+                        namespace TEXT NOT NULL,
+                        key TEXT NOT NULL,
+                        value TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        stored_at REAL NOT NULL,
+                        expires_at REAL NOT NULL,
+                        PRIMARY KEY (namespace, key)
+                    )
+                    """
+                )
+                conn.execute("CREATE INDEX entries_stored_at ON entries (stored_at)")
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)",
+                    (str(SCHEMA_VERSION),),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get(self, namespace, key):
+        """Return the stored value, or None if missing or expired"""
+        try:
+            row = self._connect().execute(
+                "SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Store read error for {namespace}/{key}: {e}")
+            increment("errors", operation="store_read")
+            return None
+        if row is None or row[1] <= time.time():
+            return None
+        return json.loads(row[0])
+
+    def set(self, namespace, key, value, ttl=None):
+        """Store a JSON-serializable value"""
+        encoded = json.dumps(value, separators=(",", ":"))
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        try:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, size, stored_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, key, encoded, len(encoded), now, expires_at),
+            )
+        except sqlite3.Error as e:
+            print(f"Store write error for {namespace}/{key}: {e}")
+            increment("errors", operation="store_write")
+            return
+
+        with self._lock:
+            self._writes += 1
+            due = self._writes % COMPACT_EVERY == 0
+        if due:
+            self.compact()
+
+    def delete(self, namespace, key):
+        try:
+            self._connect().execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+        except sqlite3.Error as e:
+            print(f"Store delete error for {namespace}/{key}: {e}")
+            increment("errors", operation="store_delete")
+
+    def delete_prefix(self, namespace, prefix):
+        """Delete every entry in namespace whose key starts with prefix"""
+        try:
+            self._connect().execute(
+                "DELETE FROM entries WHERE namespace = ? AND substr(key, 1, ?) = ?", (namespace, len(prefix), prefix)
+            )
+        except sqlite3.Error as e:
+            print(f"Store delete error for {namespace}/{prefix}*: {e}")
+            increment("errors", operation="store_delete")
+
+    def touch(self, namespace, key, ttl=None):
+        """Give an entry a fresh TTL without rewriting it; False if it is missing"""
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        try:
+            return self._connect().execute(
+                "UPDATE entries SET expires_at = ? WHERE namespace = ? AND key = ?", (expires_at, namespace, key)
+            ).rowcount > 0
+        except sqlite3.Error as e:
+            print(f"Store write error for {namespace}/{key}: {e}")
+            increment("errors", operation="store_write")
+            return False
+
+    def expiring(self, namespace):
+        """Keys in namespace, expired ones included, the soonest to expire first"""
+        try:
+            rows = self._connect().execute(
+                "SELECT key FROM entries WHERE namespace = ? ORDER BY expires_at", (namespace,)
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Store read error for {namespace}: {e}")
+            increment("errors", operation="store_read")
+            return []
+        return [row[0] for row in rows]
+
+    def changed_since(self, namespace, since):
+        """[(key, value, stored_at)] for unexpired entries in namespace written after since, oldest first"""
+        try:
+            rows = self._connect().execute(
+                "SELECT key, value, stored_at FROM entries WHERE namespace = ? AND stored_at > ? AND expires_at > ? "
+                "ORDER BY stored_at",
+                (namespace, since, time.time()),
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Store read error for {namespace}: {e}")
+            increment("errors", operation="store_read")
+            return []
+        return [(key, json.loads(value), stored_at) for key, value, stored_at in rows]
+
+    def compact(self):
+        """
+        Drop expired entries, then the oldest ones until the store fits
+        within max_bytes, and checkpoint the WAL. Returns rows removed.
+        """
+        conn = self._connect()
+        try:
+            removed = conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),)).rowcount
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total > self.max_bytes:
+                # Trim to 80% of the cap so we don't compact again on the next write
+                excess = total - int(self.max_bytes * 0.8)
+                freed = 0
+                cutoff = None
+                for stored_at, size in conn.execute("SELECT stored_at, size FROM entries ORDER BY stored_at"):
+                    freed += size
+                    cutoff = stored_at
+                    if freed >= excess:
+                        break
+                if cutoff is not None:
+                    removed += conn.execute("DELETE FROM entries WHERE stored_at <= ?", (cutoff,)).rowcount
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            return removed
+        except sqlite3.Error as e:
+            print(f"Store compaction error: {e}")
+            return 0
+
+    def stats(self):
+        conn = self._connect()
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "schema_version": SCHEMA_VERSION,
+            "entries": count,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the process-wide store selected by ENTITY_STORE_BACKEND"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if STORE_BACKEND == "sqlite":
+                    try:
+                        _store = SQLiteStore()
+                    except (sqlite3.Error, OSError) as e:
+                        print(f"Could not open entity store at {STORE_PATH}: {e}")
+                        _store = NullStore()
+                else:
+                    _store = NullStore()
+    return _store
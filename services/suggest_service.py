@@ -0,0 +1,516 @@
+import atexit
+import contextlib
+import heapq
+import mmap
+import os
+import struct
+import threading
+import time
+import unicodedata
+
+try:
+    import fcntl
+except ImportError:  # Windows: rebuilds are not coordinated between processes
+    fcntl = None
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "suggest_index.bin")
+INDEX_PATH = os.environ.get("SUGGEST_INDEX_PATH", DEFAULT_INDEX_PATH)
+
+# Pending updates are written, by a background thread, to a new segment file
+# next to the index once this many entities changed
+FLUSH_THRESHOLD = int(os.environ.get("SUGGEST_FLUSH_THRESHOLD", 200))
+
+# Segments are merged into the base index file once there are this many, or
+# once together they reach SEGMENT_MERGE_RATIO of the base file's size
+MAX_SEGMENTS = int(os.environ.get("SUGGEST_MAX_SEGMENTS", 8))
+SEGMENT_MERGE_RATIO = 0.25
+
+# How often a worker checks for a replaced index file or new segments
+RELOAD_INTERVAL = 5.0
+
+# Prefixes matched by more records than this get a precomputed top list when
+# the file is written, so short prefixes are ranked across all their matches
+# and longer ones scan at most MAX_SCAN records
+MAX_SCAN = 500
+TOP_K = 100  # best records kept per such prefix (above the /api/suggest limit, as QIDs repeat)
+
+# Popularity added per occurrence
+SEARCH_WEIGHT = 1
+VISIT_WEIGHT = 5
+
+# File layout, shared by the base index and its segments: header (record and
+# top-list counts, and for the base the last segment merged into it), one
+# uint64 file offset per record, one per top list, then the records and the
+# top lists. Records are "key\tscore\tqid\tlabel\tdescription\n" sorted by
+# key; top lists are "prefix\trecord,record,...\n" sorted by prefix, best
+# record first. A segment holds the score added since the previous one.
+MAGIC = b"WDSX"
+FORMAT_VERSION = 3
+HEADER = struct.Struct("<4sIQQQ")
+OFFSET = struct.Struct("<Q")
+
+
+def normalize(text):
+    """Case-fold and strip accents so "Zürich" and "zurich" share a key"""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    return " ".join("".join(c for c in text if not unicodedata.combining(c)).split())
+
+
+def _clean(text):
+    return (text or "").replace("\t", " ").replace("\n", " ")
+
+
+def _keys_for(label):
+    """Index the full label and every later word, so "einstein" finds "Albert Einstein" """
+    words = normalize(label).split(" ")
+    return [" ".join(words[i:]) for i in range(len(words)) if words[i]]
+
+
+def _combine(entities, qid, entry):
+    """Fold entry into entities[qid]: the later label wins and scores add up"""
+    existing = entities.get(qid)
+    if existing is None:
+        entities[qid] = dict(entry)
+    else:
+        existing["label"] = entry["label"]
+        existing["description"] = entry.get("description") or existing["description"]
+        existing["score"] += entry.get("score", 0)
+
+
+class _IndexFile:
+    """One memory-mapped index file: the base index or a segment"""
+
+    def __init__(self, path, mapped, file_id):
+        self.path = path
+        self.file_id = file_id
+        self._mmap = mapped
+        _, _, self.count, self.top_count, self.generation = HEADER.unpack_from(mapped, 0)
+
+    @classmethod
+    def open(cls, path):
+        """Map the file at path; None if it is missing or not an index file"""
+        try:
+            stat = os.stat(path)
+            if stat.st_size < HEADER.size:
+                return None
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None  # merged and deleted since it was listed
+        magic, version = HEADER.unpack_from(mapped, 0)[:2]
+        if magic != MAGIC or version != FORMAT_VERSION:
+            print(f"Ignoring suggest index {path}: unknown format")
+            mapped.close()
+            return None
+        return cls(path, mapped, (stat.st_ino, stat.st_mtime_ns, stat.st_size))
+
+    def close(self):
+        self._mmap.close()
+
+    def _line(self, i, end_char=b"\n"):
+        """Line number i (records first, then top lists) up to end_char"""
+        start = OFFSET.unpack_from(self._mmap, HEADER.size + i * OFFSET.size)[0]
+        return self._mmap[start:self._mmap.find(end_char, start)].decode("utf-8")
+
+    def _record(self, i):
+        return self._line(i).split("\t")
+
+    def _lower_bound(self, prefix, lo, hi):
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._line(mid, b"\t") < prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _top_records(self, prefix):
+        """Record numbers of prefix's precomputed top list, or None if it has none"""
+        first = self.count
+        i = self._lower_bound(prefix, first, first + self.top_count)
+        if i < first + self.top_count:
+            top_prefix, records = self._line(i).split("\t")
+            if top_prefix == prefix:
+                return [int(record) for record in records.split(",")]
+        return None
+
+    def matches(self, prefix):
+        """Records whose key starts with prefix: the top list if it has one, else all of them"""
+        top = self._top_records(prefix)
+        if top is not None:
+            for i in top:
+                yield self._record(i)
+            return
+        i = self._lower_bound(prefix, 0, self.count)
+        while i < self.count:
+            record = self._record(i)
+            if not record[0].startswith(prefix):
+                break
+            yield record
+            i += 1
+
+    def entities(self):
+        """Every entity in the file, one entry per QID"""
+        entities = {}
+        for i in range(self.count):
+            key, score, qid, label, description = self._record(i)
+            if qid not in entities:
+                entities[qid] = {"label": label, "description": description, "score": int(score)}
+        return entities
+
+
+class PrefixIndex:
+    """
+    Sorted, memory-mapped prefix index for search suggestions
+
+    All workers map the same files read-only, so the OS shares their pages.
+    New entries are kept in a small in-process overlay and periodically
+    written, on a background thread, to a small segment file next to the base
+    index. Queries combine the base index, its segments and the overlay; once
+    the segments pile up they are merged into a freshly written base file
+    that replaces the old one atomically.
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._base = None
+        self._segments = {}  # sequence number -> _IndexFile, not yet merged into the base
+        self._checked_at = 0.0
+        self._pending = {}   # qid -> {"label", "description", "score"}
+        self._flushing = {}  # pending entries being written, still served until their segment is mapped
+        self._flush_wanted = threading.Event()
+        self._flusher = None
+        self._reload()
+
+    def _segment_paths(self):
+        """[(sequence number, path)] of the segment files on disk, oldest first"""
+        directory = os.path.dirname(self.path) or "."
+        prefix = os.path.basename(self.path) + "."
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return []
+        segments = []
+        for name in names:
+            number = name[len(prefix):-len(".seg")]
+            if name.startswith(prefix) and name.endswith(".seg") and number.isdigit():
+                segments.append((int(number), os.path.join(directory, name)))
+        return sorted(segments)
+
+    def _segment_path(self, number):
+        return f"{self.path}.{number:08d}.seg"
+
+    def _reload(self):
+        try:
+            stat = os.stat(self.path)
+            base_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            base_id = None
+        if base_id is None:
+            if self._base is not None:
+                self._base.close()
+                self._base = None
+        elif self._base is None or self._base.file_id != base_id:
+            opened = _IndexFile.open(self.path)
+            if opened is not None:
+                if self._base is not None:
+                    self._base.close()
+                self._base = opened
+
+        # Segments already merged into the base are left for their writer to delete
+        generation = self._base.generation if self._base is not None else 0
+        current = {number: path for number, path in self._segment_paths() if number > generation}
+        for number in list(self._segments):
+            if number not in current:
+                self._segments.pop(number).close()
+        for number, path in current.items():
+            if number not in self._segments:
+                opened = _IndexFile.open(path)
+                if opened is not None:
+                    self._segments[number] = opened
+
+    def _files(self):
+        """The mapped base index and segments, oldest first"""
+        files = [self._base] if self._base is not None else []
+        return files + [self._segments[number] for number in sorted(self._segments)]
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at >= RELOAD_INTERVAL:
+            self._checked_at = now
+            self._reload()
+
+    def suggest(self, query, limit=10):
+        """Return up to limit entities whose label (or a word in it) starts with query"""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+
+        candidates = {}
+
+        def add_candidate(qid, entry):
+            existing = candidates.get(qid)
+            if existing is None:
+                candidates[qid] = {"id": qid, "label": entry["label"], "description": entry["description"],
+                                   "score": entry["score"]}
+            else:
+                _combine(candidates, qid, entry)
+
+        with self._lock:
+            self._maybe_reload()
+            for index_file in self._files():
+                found = {}
+                for key, score, qid, label, description in index_file.matches(prefix):
+                    found.setdefault(qid, {"label": label, "description": description, "score": int(score)})
+                for qid, entry in found.items():
+                    add_candidate(qid, entry)
+
+            overlay = dict(self._flushing)
+            for qid, entry in self._pending.items():
+                if qid in overlay:
+                    entry = dict(entry, score=overlay[qid]["score"] + entry["score"])
+                overlay[qid] = entry
+            for qid, entry in overlay.items():
+                if any(key.startswith(prefix) for key in _keys_for(entry["label"])):
+                    add_candidate(qid, entry)
+
+        ranked = sorted(candidates.values(), key=lambda c: (-c["score"], len(c["label"])))
+        return ranked[:limit]
+
+    def add(self, entity_id, label, description="", weight=SEARCH_WEIGHT):
+        """Record an entity (or bump its popularity) without touching the shared files"""
+        if not entity_id or not label:
+            return
+        with self._lock:
+            entry = self._pending.get(entity_id)
+            if entry is None:
+                entry = self._pending[entity_id] = {"label": label, "description": description or "", "score": 0}
+            entry["score"] += weight
+            due = len(self._pending) >= FLUSH_THRESHOLD
+        if due:
+            self._flush_in_background()
+
+    def add_many(self, entities, weight=SEARCH_WEIGHT):
+        for entity in entities:
+            self.add(entity.get("id"), entity.get("label"), entity.get("description", ""), weight)
+
+    def _flush_in_background(self):
+        """Wake the flusher thread, starting it on first use, so request threads never write files"""
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="suggest-flush", daemon=True)
+                self._flusher.start()
+        self._flush_wanted.set()
+
+    def _flush_loop(self):
+        while True:
+            self._flush_wanted.wait()
+            self._flush_wanted.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Suggest index flush failed: {e}")
+
+    def flush(self):
+        """Write pending entries to a new segment, merging the segments into the base when due"""
+        with self._lock:
+            if self._flushing:
+                return  # another flush is running; these entries wait for the next one
+            pending, self._pending = self._pending, {}
+            self._flushing = pending
+        try:
+            if pending:
+                with self._file_lock():
+                    self._append_segment(pending)
+                    if self._merge_due():
+                        self._merge({})
+            with self._lock:
+                self._reload()
+                self._flushing = {}
+        except Exception:
+            with self._lock:
+                # Put the entries back so the next flush retries them
+                for qid, entry in pending.items():
+                    current = self._pending.setdefault(qid, dict(entry, score=0))
+                    current["score"] += entry["score"]
+                self._flushing = {}
+            raise
+
+    def rebuild(self, updates, replace=False):
+        """
+        Write a new base index merging updates (qid -> label/description/score)
+        into the current index and its segments, unless replace is set. Scores
+        are added together.
+        """
+        with self._file_lock():
+            self._merge(updates, replace)
+        with self._lock:
+            self._reload()
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Serialize segment writes and merges across the processes sharing the index"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock_file = open(self.path + ".lock", "a")
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    @contextlib.contextmanager
+    def _on_disk(self):
+        """
+        Map the base index and its unmerged segments afresh, apart from the
+        ones suggest() reads; yields (base or None, [(number, segment)])
+        """
+        base = _IndexFile.open(self.path)
+        generation = base.generation if base is not None else 0
+        segments = []
+        try:
+            for number, path in self._segment_paths():
+                if number > generation:
+                    opened = _IndexFile.open(path)
+                    if opened is not None:
+                        segments.append((number, opened))
+            yield base, segments
+        finally:
+            for _, segment in segments:
+                segment.close()
+            if base is not None:
+                base.close()
+
+    @staticmethod
+    def _last_merged(base, segments):
+        """Number of the newest segment among base and segments (0 if none)"""
+        return max([base.generation if base is not None else 0] + [number for number, _ in segments])
+
+    def _append_segment(self, updates):
+        with self._on_disk() as (base, segments):
+            number = self._last_merged(base, segments) + 1
+        self._write(self._segment_path(number), updates)
+
+    def _merge_due(self):
+        with self._on_disk() as (base, segments):
+            base_size = base.file_id[2] if base is not None else 0
+            segment_size = sum(segment.file_id[2] for _, segment in segments)
+            return len(segments) >= MAX_SEGMENTS or segment_size >= base_size * SEGMENT_MERGE_RATIO
+
+    def _merge(self, updates, replace=False):
+        """Write a new base from the current one, its segments and updates, then delete the merged segments"""
+        with self._on_disk() as (base, segments):
+            entities = {}
+            if not replace:
+                if base is not None:
+                    entities = base.entities()
+                for _, segment in segments:
+                    for qid, entry in segment.entities().items():
+                        _combine(entities, qid, entry)
+            generation = self._last_merged(base, segments)
+        for qid, entry in updates.items():
+            _combine(entities, qid, entry)
+
+        self._write(self.path, entities, generation)
+        for number, _ in segments:
+            try:
+                os.remove(self._segment_path(number))
+            except FileNotFoundError:
+                pass
+
+    def _write(self, path, entities, generation=0):
+        records = []
+        for qid, entry in entities.items():
+            label = _clean(entry["label"])
+            description = _clean(entry.get("description"))
+            for key in _keys_for(label):
+                records.append((key, entry.get("score", 0), qid, label, description))
+        records.sort()
+        top_lists = _top_lists([record[0] for record in records], [record[1] for record in records])
+
+        chunks = [f"{key}\t{score}\t{qid}\t{label}\t{description}\n".encode("utf-8")
+                  for key, score, qid, label, description in records]
+        chunks.extend(f"{prefix}\t{','.join(map(str, top))}\n".encode("utf-8") for prefix, top in top_lists)
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(records), len(top_lists), generation))
+            position = HEADER.size + len(chunks) * OFFSET.size
+            for chunk in chunks:
+                f.write(OFFSET.pack(position))
+                position += len(chunk)
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp_path, path)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "path": self.path,
+                "records": sum(index_file.count for index_file in self._files()),
+                "segments": len(self._segments),
+                "pending": len(self._pending),
+            }
+
+
+def _top_lists(keys, scores):
+    """
+    [(prefix, record numbers)] for every prefix of the sorted keys matched by
+    more than MAX_SCAN records, each with its TOP_K highest-scoring records
+    """
+    top_lists = []
+    open_prefixes = []  # [count, heap of (score, -record)] for each prefix length of the current key
+    previous = ""
+
+    def close(length):
+        while len(open_prefixes) > length:
+            count, heap = open_prefixes.pop()
+            if count > MAX_SCAN:
+                best = [-record for _, record in sorted(heap, reverse=True)]
+                top_lists.append((previous[:len(open_prefixes) + 1], best))
+
+    for i, key in enumerate(keys):
+        shared = 0
+        while shared < min(len(key), len(previous), len(open_prefixes)) and key[shared] == previous[shared]:
+            shared += 1
+        close(shared)
+        previous = key
+        while len(open_prefixes) < len(key):
+            open_prefixes.append([0, []])
+        for entry in open_prefixes:
+            entry[0] += 1
+            if len(entry[1]) < TOP_K:
+                heapq.heappush(entry[1], (scores[i], -i))
+            elif (scores[i], -i) > entry[1][0]:
+                heapq.heapreplace(entry[1], (scores[i], -i))
+    close(0)
+    top_lists.sort()
+    return top_lists
+
+
+def load_label_dump(path):
+    """
+    Read an offline label dump: one "QID<TAB>label[<TAB>description[<TAB>score]]" per line
+    Returns entries suitable for PrefixIndex.rebuild()
+    """
+    entities = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) < 2 or not parts[0] or parts[0].startswith("#"):
+                continue
+            entities[parts[0]] = {
+                "label": parts[1],
+                "description": parts[2] if len(parts) > 2 else "",
+                "score": int(parts[3]) if len(parts) > 3 and parts[3].isdigit() else 0,
+            }
+    return entities
+
+
+suggest_index = PrefixIndex()
+atexit.register(suggest_index.flush)
@@ -0,0 +1,238 @@
+// Knowledge graph visualization. Loaded once as a static asset; graph data is
+// fetched lazily from the URL in a container's data-graph-url attribute.
+(function() {
+    // Node color based on type
+    const colorMap = {
+        'main': 'rgb(66, 133, 244)',  // Blue
+        'person': 'rgb(52, 168, 83)', // Green
+        'location': 'rgb(66, 197, 244)', // Light blue
+        'image': 'rgb(251, 188, 5)',  // Yellow
+        'default': 'rgb(234, 67, 53)' // Red
+    };
+
+    // Laid-out graphs larger than this are drawn as they are, without a simulation
+    const STATIC_LAYOUT_NODES = 300;
+
+    function renderKnowledgeGraph(container, data) {
+        // D3.js force-directed graph
+        const width = container.clientWidth;
+        const height = container.clientHeight;
+        
+        // Create SVG
+        const svg = d3.select(container)
+            .append('svg')
+            .attr('width', width)
+            .attr('height', height)
+            .call(d3.zoom().on("zoom", function(event) {
+                svg.attr("transform", event.transform);
+            }))
+            .append("g");
+        
+        // Server-side layouts are centered on (0, 0)
+        const laidOut = Boolean(data.layout);
+        if (laidOut) {
+            data.nodes.forEach(d => {
+                d.x += width / 2;
+                d.y += height / 2;
+            });
+        }
+        const isStatic = laidOut && data.nodes.length > STATIC_LAYOUT_NODES;
+        
+        // Create force simulation
+        const simulation = d3.forceSimulation(data.nodes)
+            .force('link', d3.forceLink(data.links).id(d => d.id).distance(150))
+            .force('charge', d3.forceManyBody().strength(-300))
+            .force('center', d3.forceCenter(width / 2, height / 2))
+            .force('collision', d3.forceCollide().radius(60));
+        if (isStatic) {
+            simulation.stop();
+        } else if (laidOut) {
+            // Already near equilibrium: only settle collisions
+            simulation.alpha(0.2);
+        }
+        
+        // Create links
+        const link = svg.append('g')
+            .selectAll('path')
+            .data(data.links)
+            .enter().append('path')
+            .attr('stroke', '#999')
+            .attr('stroke-opacity', 0.6)
+            .attr('stroke-width', 1.5)
+            .attr('fill', 'none');
+        
+        // Create link labels
+        const linkText = svg.append('g')
+            .selectAll('text')
+            .data(data.links)
+            .enter().append('text')
+            .attr('fill', '#666')
+            .attr('font-size', '10px')
+            .attr('text-anchor', 'middle')
+            .attr('dominant-baseline', 'text-after-edge')
+            .attr('dy', -3)
+            .text(d => d.label);
+        
+        // Create nodes
+        const node = svg.append('g')
+            .selectAll('.node')
+            .data(data.nodes)
+            .enter().append('g')
+            .attr('class', 'node')
+            .call(d3.drag()
+                .on('start', dragstarted)
+                .on('drag', dragged)
+                .on('end', dragended));
+        
+        // Add circles to all nodes
+        node.append('circle')
+            .attr('r', d => d.type === 'main' ? 25 : 20)
+            .attr('fill', d => colorMap[d.type] || colorMap['default'])
+            .attr('stroke', '#fff')
+            .attr('stroke-width', 2);
+        
+        // Add images for nodes with image URLs
+        node.filter(d => d.image && d.image.startsWith('http'))
+            .append('clipPath')
+            .attr('id', d => `clip-${d.id.replace(/[^a-zA-Z0-9]/g, '_')}`)
+            .append('circle')
+            .attr('r', 18);
+        
+        node.filter(d => d.image && d.image.startsWith('http'))
+            .append('image')
+            .attr('xlink:href', d => d.image)
+            .attr('x', -18)
+            .attr('y', -18)
+            .attr('width', 36)
+            .attr('height', 36)
+            .attr('clip-path', d => `url(#clip-${d.id.replace(/[^a-zA-Z0-9]/g, '_')})`);
+        
+        // Add text labels
+        node.append('text')
+            .attr('dy', 30)
+            .attr('text-anchor', 'middle')
+            .attr('fill', '#333')
+            .text(d => d.label)
+            .style('font-size', '12px')
+            .each(function(d) {
+                const textLength = this.getComputedTextLength();
+                if (textLength > 100) {
+                    d3.select(this).text(d.label.substring(0, 12) + '...');
+                }
+            });
+        
+        // Update positions on each tick
+        function ticked() {
+            // Update link paths to create a curved line
+            link.attr('d', function(d) {
+                const dx = d.target.x - d.source.x,
+                      dy = d.target.y - d.source.y,
+                      dr = Math.sqrt(dx * dx + dy * dy);
+                return `M${d.source.x},${d.source.y}A${dr},${dr} 0 0,1 ${d.target.x},${d.target.y}`;
+            });
+            
+            // Update link text positions
+            linkText.attr('transform', function(d) {
+                const midX = (d.source.x + d.target.x) / 2;
+                const midY = (d.source.y + d.target.y) / 2;
+                return `translate(${midX},${midY})`;
+            });
+            
+            // Update node positions
+            node.attr('transform', d => `translate(${d.x},${d.y})`);
+        }
+        simulation.on('tick', ticked);
+        if (isStatic) {
+            ticked();
+        }
+        
+        // Drag functions
+        function dragstarted(event, d) {
+            if (isStatic) return;
+            if (!event.active) simulation.alphaTarget(0.3).restart();
+            d.fx = d.x;
+            d.fy = d.y;
+        }
+        
+        function dragged(event, d) {
+            if (isStatic) {
+                d.x = event.x;
+                d.y = event.y;
+                ticked();
+                return;
+            }
+            d.fx = event.x;
+            d.fy = event.y;
+        }
+        
+        function dragended(event, d) {
+            if (isStatic) return;
+            if (!event.active) simulation.alphaTarget(0);
+            d.fx = null;
+            d.fy = null;
+        }
+    }
+
+    function showError(container) {
+        container.innerHTML = "<div class='error'>No graph data available</div>";
+    }
+
+    function loadKnowledgeGraph(container) {
+        fetch(container.dataset.graphUrl)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`Graph request failed: ${response.status}`);
+                }
+                return response.json();
+            })
+            .then(data => {
+                container.classList.remove('loading');
+                if (data.n) {
+                    data = expandGraph(data);
+                }
+                if (!data.nodes || !data.nodes.length) {
+                    showError(container);
+                    return;
+                }
+                renderKnowledgeGraph(container, data);
+            })
+            .catch(error => {
+                console.error(error);
+                showError(container);
+            });
+    }
+
+    // Compact graphs (?format=compact) are columnar: nodes as [id, label, type]
+    // rows and links as [source row, target row, label index] (see compact_graph
+    // in graph_service)
+    function expandGraph(blob) {
+        const nodes = blob.n.map((row, i) => {
+            const node = {id: row[0], label: row[1], type: row[2]};
+            if (blob.img && blob.img[i]) node.image = blob.img[i];
+            if (blob.xy) {
+                node.x = blob.xy[i][0];
+                node.y = blob.xy[i][1];
+            }
+            return node;
+        });
+        const links = blob.l.map(row => ({
+            source: nodes[row[0]].id,
+            target: nodes[row[1]].id,
+            label: blob.ll[row[2]]
+        }));
+        return {nodes: nodes, links: links, layout: blob.layout};
+    }
+
+    window.renderKnowledgeGraph = renderKnowledgeGraph;
+
+    function init() {
+        document.querySelectorAll('[data-graph-url]').forEach(loadKnowledgeGraph);
+    }
+
+    // The script may run after the document has already been parsed
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', init);
+    } else {
+        init();
+    }
+})();
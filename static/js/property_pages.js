@@ -0,0 +1,62 @@
+// Property paging for large entities. The page renders the first properties
+// from the server; the button swaps in the priority-ordered pages from the
+// JSON API one at a time.
+(function() {
+    function propertyRow(prop) {
+        const row = document.createElement('tr');
+        const labelCell = document.createElement('td');
+        labelCell.textContent = prop.label;
+        const valueCell = document.createElement('td');
+        const match = prop.raw_value.match(/wikidata\.org\/entity\/(Q\d+)$/);
+        if (match) {
+            const link = document.createElement('a');
+            link.href = `/entity/${match[1]}`;
+            link.textContent = prop.value;
+            valueCell.appendChild(link);
+        } else {
+            valueCell.textContent = prop.value;
+        }
+        row.appendChild(labelCell);
+        row.appendChild(valueCell);
+        return row;
+    }
+
+    function loadNextPage(button) {
+        const page = Number(button.dataset.nextPage || 1);
+        const tbody = button.parentNode.querySelector('tbody');
+        // The URL may already carry a query string (e.g. ?lang=de)
+        const url = new URL(button.dataset.propertiesUrl, window.location.origin);
+        url.searchParams.set('page', page);
+        button.disabled = true;
+        fetch(url)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`Properties request failed: ${response.status}`);
+                }
+                return response.json();
+            })
+            .then(data => {
+                if (page === 1) {
+                    tbody.innerHTML = '';
+                }
+                data.properties.forEach(prop => tbody.appendChild(propertyRow(prop)));
+                if (data.has_more) {
+                    button.dataset.nextPage = page + 1;
+                    button.textContent = `Show more properties (page ${page + 1} of ${data.pages})`;
+                    button.disabled = false;
+                } else {
+                    button.remove();
+                }
+            })
+            .catch(error => {
+                console.error('Error loading properties:', error);
+                button.textContent = 'Could not load more properties';
+            });
+    }
+
+    document.addEventListener('DOMContentLoaded', function() {
+        document.querySelectorAll('[data-properties-url]').forEach(button => {
+            button.addEventListener('click', () => loadNextPage(button));
+        });
+    });
+})();
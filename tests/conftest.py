@@ -0,0 +1,17 @@
+import os
+import sys
+import tempfile
+
+# Let the tests import app modules (services.*, benchmarks.*) from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Keep the services from touching the files under data/; they read these at import time
+_scratch = tempfile.mkdtemp(prefix="wikidata-explorer-tests-")
+os.environ.setdefault("ENTITY_STORE_BACKEND", "none")
+os.environ.setdefault("SUGGEST_INDEX_PATH", os.path.join(_scratch, "suggest_index.bin"))
+os.environ.setdefault("WIKIDATA_DUMP_STORE", os.path.join(_scratch, "dump_store"))
+os.environ.setdefault("PROPERTY_SNAPSHOT_PATH", os.path.join(_scratch, "properties.json"))
+os.environ.setdefault("REFRESH_LOCK_PATH", os.path.join(_scratch, "refresh.lock"))
+os.environ.setdefault("PROPERTY_REFRESH_INTERVAL", "0")
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+import app as app_module
+
+
+def _stub_export(ids, fmt, **graph_args):
+    yield json.dumps({"seeds": ids, "format": fmt}).encode("utf-8")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app_module, "export_graphs", _stub_export)
+    return app_module.app.test_client()
+
+
+def test_export_accepts_id_list_and_single_string(client):
+    response = client.post("/api/export", json={"ids": ["Q1", "wd:Q2"]})
+    assert response.status_code == 200
+    assert json.loads(response.data)["seeds"] == ["Q1", "Q2"]
+
+    response = client.post("/api/export", json={"ids": "Q3, Q4", "format": "jsonl"})
+    assert response.status_code == 200
+    assert json.loads(response.data)["seeds"] == ["Q3", "Q4"]
+
+
+@pytest.mark.parametrize("body", [
+    ["Q1"],
+    "Q1",
+    {"ids": 42},
+    {"ids": {"Q1": True}},
+    {"ids": ["Q1", 2]},
+])
+def test_export_rejects_malformed_bodies(client, body):
+    response = client.post("/api/export", json=body)
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+
+def test_graph_api_compact_format(client, monkeypatch):
+    graph = {"nodes": [{"id": "Q1", "label": "one", "type": "main"}, {"id": "Q2", "label": "two", "type": "related"}],
+             "links": [{"source": "Q1", "target": "Q2", "label": "P50", "relationship": "P50"}]}
+    monkeypatch.setattr(app_module, "get_knowledge_graph", lambda entity_id, **kwargs: graph)
+
+    assert client.get("/api/graph/Q1").get_json() == graph
+    compact = client.get("/api/graph/Q1?format=compact").get_json()
+    assert compact == {"n": [["Q1", "one", "main"], ["Q2", "two", "related"]], "l": [[0, 1, 0]], "ll": ["P50"]}
+
+
+def _stub_entity(entity_id):
+    return {"id": entity_id, "label": "Douglas Adams", "description": "", "properties": []}
+
+
+def test_entity_api_answers_conditional_requests_with_304(client, monkeypatch):
+    monkeypatch.setattr(app_module, "get_entity_details", _stub_entity)
+    response = client.get("/api/entity/Q42")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    last_modified = response.headers["Last-Modified"]
+    assert response.headers["Cache-Control"].startswith("public, max-age=")
+
+    revalidated = client.get("/api/entity/Q42", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b""
+    assert revalidated.headers["ETag"] == etag
+
+    assert client.get("/api/entity/Q42", headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get("/api/entity/Q42", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_entity_api_etag_changes_with_the_body(client, monkeypatch):
+    monkeypatch.setattr(app_module, "get_entity_details", _stub_entity)
+    etag = client.get("/api/entity/Q42").headers["ETag"]
+    monkeypatch.setattr(app_module, "get_entity_details", lambda entity_id: dict(_stub_entity(entity_id), label="Adams"))
+    response = client.get("/api/entity/Q42", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
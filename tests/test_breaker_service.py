@@ -0,0 +1,90 @@
+import threading
+import time
+
+from services.breaker_service import CLOSED, HALF_OPEN, OPEN, AdaptiveLimiter, CircuitBreaker
+
+
+def test_breaker_opens_once_enough_calls_fail():
+    breaker = CircuitBreaker("test", window=60, min_calls=4, failure_rate=0.5, cooldown=60)
+    for failed in (True, False, True):
+        assert breaker.allow()
+        breaker.record(failed)
+    assert breaker.state == CLOSED
+    breaker.record(False)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.is_open()
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_half_open_breaker_lets_one_probe_through():
+    breaker = CircuitBreaker("test", window=60, min_calls=1, failure_rate=0.5, cooldown=0.05)
+    breaker.record(True)
+    assert breaker.state == OPEN
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record(False)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_failed_probe_opens_the_breaker_again():
+    breaker = CircuitBreaker("test", window=60, min_calls=1, failure_rate=0.5, cooldown=0.05)
+    breaker.record(True)
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == OPEN
+    assert breaker.stats()["opened"] == 2
+
+
+def test_cancelled_probe_frees_the_half_open_slot():
+    breaker = CircuitBreaker("test", window=60, min_calls=1, failure_rate=0.5, cooldown=0.05)
+    breaker.record(True)
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.cancel()
+    assert breaker.allow()
+
+
+def test_limiter_sheds_calls_beyond_the_limit_after_queue_timeout():
+    limiter = AdaptiveLimiter("test", initial=1, minimum=1, maximum=4, queue_timeout=0.05)
+    assert limiter.acquire()
+    assert not limiter.acquire()
+    assert not limiter.try_acquire()
+    assert limiter.stats() == {"name": "test", "limit": 1, "inflight": 1, "shed": 1}
+
+
+def test_limiter_wakes_a_waiting_caller_on_release():
+    limiter = AdaptiveLimiter("test", initial=1, minimum=1, maximum=4, queue_timeout=5)
+    assert limiter.acquire()
+    threading.Timer(0.05, limiter.release, args=(0.0, False)).start()
+    started = time.monotonic()
+    assert limiter.acquire()
+    assert time.monotonic() - started < 1
+
+
+def test_limiter_grows_on_fast_successes_and_halves_on_failures():
+    limiter = AdaptiveLimiter("test", initial=4, minimum=1, maximum=8, latency_target=1)
+    # Each fast success adds 1/limit
+    for _ in range(5):
+        limiter.acquire()
+        limiter.release(0.1, False)
+    assert int(limiter.limit) == 5
+    limiter.acquire()
+    limiter.release(0.1, True)
+    assert int(limiter.limit) == 2
+    limiter.acquire()
+    limiter.release(2.0, False)
+    assert int(limiter.limit) == 1
+
+
+def test_limiter_calls_release_listeners():
+    limiter = AdaptiveLimiter("test", initial=1, minimum=1, maximum=1)
+    released = []
+    limiter.add_listener(lambda: released.append(limiter.inflight))
+    limiter.acquire()
+    limiter.release(0.0, False)
+    assert released == [0]
@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+
+from services.cache_service import TTLCache
+
+
+def test_concurrent_misses_share_one_load():
+    cache = TTLCache(ttl=60)
+    calls = []
+    release = threading.Event()
+
+    def loader():
+        calls.append(1)
+        release.wait(5)
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("k", loader))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    # Let every thread reach the cache before the load finishes
+    deadline = time.monotonic() + 5
+    while cache.stats()["coalesced"] < 7 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == ["value"] * 8
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["coalesced"] == 7
+
+
+def test_a_failed_load_raises_and_is_not_cached():
+    cache = TTLCache(ttl=60)
+
+    def failing():
+        raise RuntimeError("down")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_load("k", failing)
+    assert cache.get("k") is None
+    assert cache.get_or_load("k", lambda: "value") == "value"
+
+
+def test_none_and_zero_ttl_values_are_not_cached():
+    cache = TTLCache(ttl=60)
+    assert cache.get_or_load("missing", lambda: None) is None
+    assert cache.get_or_load("degraded", lambda: "placeholder", ttl_for=lambda value: 0) == "placeholder"
+    assert cache.keys() == []
+
+
+def test_expired_entry_is_served_stale_while_it_reloads():
+    cache = TTLCache(ttl=60, stale_ttl=60)
+    cache.set("k", "old", ttl=0)
+    reloaded = threading.Event()
+
+    def loader():
+        reloaded.set()
+        return "new"
+
+    assert cache.get_or_load("k", loader) == "old"
+    assert reloaded.wait(5)
+    deadline = time.monotonic() + 5
+    while cache.get("k") != "new" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.get("k") == "new"
+    assert cache.stats()["stale_hits"] == 1
+
+
+def test_entries_past_the_stale_window_are_loaded_again():
+    cache = TTLCache(ttl=60, stale_ttl=0)
+    cache.set("k", "old", ttl=0)
+    assert cache.get_stale("k") == "old"
+    assert cache.get_or_load("k", lambda: "new") == "new"
+
+
+def test_get_revalidate_flags_stale_entries():
+    cache = TTLCache(ttl=60, stale_ttl=60)
+    cache.set("fresh", 1)
+    cache.set("stale", 2, ttl=0)
+    assert cache.get_revalidate("fresh") == (1, False)
+    assert cache.get_revalidate("stale") == (2, True)
+    assert cache.get_revalidate("missing") == (None, False)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.keys() == ["a", "c"]
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,136 @@
+import os
+
+import pytest
+
+from conftest import FIXTURES
+from services import dump_service
+from services.dump_service import DumpStore, ingest_dump, iter_json_dump
+
+JSON_DUMP = os.path.join(FIXTURES, "dump.json")
+NT_DUMP = os.path.join(FIXTURES, "dump.nt")
+
+
+def _values(entity, pid):
+    return [prop["value"] for prop in entity["properties"] if prop["id"] == pid]
+
+
+@pytest.fixture
+def json_store(tmp_path):
+    ingest_dump(JSON_DUMP, output=str(tmp_path), languages=("en", "de"))
+    return DumpStore(str(tmp_path))
+
+
+def test_json_dump_keeps_best_rank_only():
+    claims = {entity_id: claims for entity_id, _, _, claims in iter_json_dump(JSON_DUMP, ("en",))}
+    assert [value for pid, _, value in claims["Q64"] if pid == "P1082"] == ["100"]
+    # No preferred statement: every normal one is kept, deprecated ones never
+    assert sorted(value for pid, _, value in claims["Q1"] if pid == "P1082") == ["7", "8"]
+
+
+def test_json_ingest_counts(tmp_path):
+    meta = ingest_dump(JSON_DUMP, output=str(tmp_path), languages=("en", "de"))
+    assert meta["subjects"] == 6
+    assert meta["entities_read"] == 10
+    assert meta["languages"] == ["en", "de"]
+
+
+def test_get_entity(json_store):
+    entity = json_store.get_entity("Q64")
+    assert entity["id"] == "Q64"
+    assert entity["label"] == "Berlin"
+    assert entity["description"] == "capital of Germany"
+    assert _values(entity, "P17") == ["Germany"]
+    assert _values(entity, "P1082") == ["100"]
+    country = next(prop for prop in entity["properties"] if prop["id"] == "P17")
+    assert country["label"] == "country"
+    assert country["raw_value"] == "http://www.wikidata.org/entity/Q183"
+    image = next(prop for prop in entity["properties"] if prop["id"] == "P18")
+    assert image["raw_value"] == "http://commons.wikimedia.org/wiki/Special:FilePath/Berlin%20Skyline.jpg"
+
+
+def test_get_entity_other_language(json_store):
+    entity = json_store.get_entity("Q64", language="de")
+    assert entity["description"] == "Hauptstadt Deutschlands"
+    assert _values(entity, "P17") == ["Deutschland"]
+    # No German label: falls back to a stored language
+    assert next(prop for prop in entity["properties"] if prop["id"] == "P17")["label"] == "country"
+
+
+def test_get_entity_missing(json_store):
+    assert json_store.get_entity("Q999") is None
+    assert json_store.get_entity("P31") is None
+    assert json_store.get_summary("Q999") is None
+
+
+def test_label_in_unrequested_language_only(json_store):
+    # Q1 only has a French label, which was not ingested
+    assert json_store.get_entity("Q1")["label"] == "Q1"
+
+
+def test_get_summary(json_store):
+    summary = json_store.get_summary("Q64")
+    assert summary == {
+        "id": "Q64",
+        "label": "Berlin",
+        "description": "capital of Germany",
+        "image": "http://commons.wikimedia.org/wiki/Special:FilePath/Berlin%20Skyline.jpg",
+        "types": [{"id": "Q515", "label": "city"}],
+    }
+
+
+def test_entity_subset_keeps_referenced_labels(tmp_path):
+    meta = ingest_dump(JSON_DUMP, output=str(tmp_path), languages=("en",), entities=["Q64"])
+    store = DumpStore(str(tmp_path))
+    assert meta["subjects"] == 1
+    assert "Q183" not in store
+    entity = store.get_entity("Q64")
+    assert _values(entity, "P17") == ["Germany"]
+    assert store.get_summary("Q64")["types"] == [{"id": "Q515", "label": "city"}]
+    # Labels of unreferenced items outside the subset are dropped
+    assert store._label("Q5", "en") is None
+    assert not os.path.exists(tmp_path / "other_labels.tmp")
+
+
+def test_property_filter(tmp_path):
+    ingest_dump(JSON_DUMP, output=str(tmp_path), languages=("en",), properties=["P17"])
+    entity = DumpStore(str(tmp_path)).get_entity("Q64")
+    assert [prop["id"] for prop in entity["properties"]] == ["P17"]
+
+
+def test_nt_ingest(tmp_path):
+    meta = ingest_dump(NT_DUMP, output=str(tmp_path), languages=("en", "de"))
+    store = DumpStore(str(tmp_path))
+    assert meta["subjects"] == 4
+    entity = store.get_entity("Q64")
+    assert entity["label"] == "Berlin"
+    assert entity["description"] == 'capital of "Germany"'
+    assert _values(entity, "P17") == ["Germany"]
+    assert [value.lstrip("+") for value in _values(entity, "P1082")] == ["100"]
+    assert store.get_entity("Q183", language="de")["label"] == "Deutschland"
+    assert store.get_summary("Q64")["image"] == "http://commons.wikimedia.org/wiki/Special:FilePath/Berlin%20Skyline.jpg"
+    assert store.get_summary("Q64")["types"] == [{"id": "Q515", "label": "city"}]
+
+
+def test_empty_subset_store(tmp_path):
+    ingest_dump(JSON_DUMP, output=str(tmp_path), languages=("en",), entities=["Q424242"])
+    store = DumpStore(str(tmp_path))
+    assert "Q64" not in store
+    assert store.get_entity("Q64") is None
+
+
+def test_interrupted_ingest_keeps_existing_store(tmp_path, monkeypatch):
+    ingest_dump(JSON_DUMP, output=str(tmp_path), languages=("en",))
+    before = sorted(os.listdir(tmp_path))
+
+    def failing_reader(path, languages, properties=None):
+        yield from iter_json_dump(path, languages, properties)
+        raise OSError("truncated dump")
+
+    monkeypatch.setattr(dump_service, "iter_json_dump", failing_reader)
+    with pytest.raises(OSError):
+        ingest_dump(JSON_DUMP, output=str(tmp_path), languages=("en", "de"))
+
+    store = DumpStore(str(tmp_path))
+    assert store.meta["languages"] == ["en"]
+    assert store.get_entity("Q64")["label"] == "Berlin"
+    assert [name for name in sorted(os.listdir(tmp_path)) if not name.endswith(".tmp")] == before
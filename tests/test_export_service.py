@@ -0,0 +1,100 @@
+import json
+import os
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from services import export_service
+from services.export_service import export_graphs, export_to_file, load_checkpoint, part_path
+
+
+def _graph(entity_id, **graph_args):
+    """Stand-in for generate_knowledge_graph: a seed and one neighbor shared by every seed"""
+    if entity_id == "Q666":
+        raise RuntimeError("upstream failed")
+    return {
+        "nodes": [{"id": entity_id, "label": f"Label {entity_id}", "type": "main"},
+                  {"id": "Q5", "label": "human", "type": "related"}],
+        "links": [{"source": entity_id, "target": "Q5", "label": "instance of", "relationship": "P31"}],
+    }
+
+
+@pytest.fixture(autouse=True)
+def stub_graphs(monkeypatch):
+    monkeypatch.setattr(export_service, "generate_knowledge_graph", _graph)
+
+
+def _export(ids, fmt="jsonl", **kwargs):
+    reports = []
+    data = b"".join(export_graphs(ids, fmt, workers=2, progress=reports.append, **kwargs))
+    return data, reports[-1]
+
+
+def test_jsonl_export():
+    data, stats = _export(["Q1", "Q2", "Q3"])
+    records = [json.loads(line) for line in data.decode("utf-8").splitlines()]
+    assert sorted(record["seed"] for record in records) == ["Q1", "Q2", "Q3"]
+    assert stats["done"] == 3 and stats["failed"] == 0 and stats["skipped"] == 0
+    assert stats["nodes"] == 6 and stats["links"] == 3
+
+
+def _export_file(ids, output, fmt="jsonl", **kwargs):
+    reports = []
+    paths = export_to_file(ids, str(output), fmt, workers=2, progress=reports.append, **kwargs)
+    return paths, reports[-1]
+
+
+def test_failed_seeds_are_not_checkpointed(tmp_path):
+    checkpoint = str(tmp_path / "done.txt")
+    _, stats = _export_file(["Q1", "Q666", "Q2"], tmp_path / "graphs.jsonl", checkpoint=checkpoint)
+    assert stats["done"] == 2 and stats["failed"] == 1
+    assert load_checkpoint(checkpoint) == {"Q1", "Q2"}
+
+
+def test_resume_skips_finished_seeds(tmp_path):
+    checkpoint = str(tmp_path / "done.txt")
+    output = tmp_path / "graphs.jsonl"
+    _export_file(["Q1", "Q2"], output, checkpoint=checkpoint)
+
+    # Duplicates are neither exported twice nor counted as skipped
+    _, stats = _export_file(["Q1", "Q2", "Q3", "Q3", "Q4"], output, checkpoint=checkpoint)
+    assert stats["skipped"] == 2
+    assert stats["total"] == 2 and stats["done"] == 2
+    seeds = [json.loads(line)["seed"] for line in output.read_text("utf-8").splitlines()]
+    assert sorted(seeds) == ["Q1", "Q2", "Q3", "Q4"]
+    assert load_checkpoint(checkpoint) == {"Q1", "Q2", "Q3", "Q4"}
+
+    # Nothing left to do
+    _, stats = _export_file(["Q1", "Q2", "Q3", "Q4"], output, checkpoint=checkpoint)
+    assert stats["skipped"] == 4 and stats["done"] == 0
+    assert len(output.read_text("utf-8").splitlines()) == 4
+
+
+def test_graphml_parts_are_checkpointed_once_written(tmp_path):
+    checkpoint = str(tmp_path / "done.txt")
+    output = str(tmp_path / "graphs.graphml")
+    paths, stats = _export_file(["Q1", "Q2", "Q3"], output, "graphml", checkpoint=checkpoint, part_size=2)
+    assert paths == [part_path(output, 1), part_path(output, 2)]
+    assert stats["done"] == 3 and load_checkpoint(checkpoint) == {"Q1", "Q2", "Q3"}
+    ns = {"g": "http://graphml.graphdrawing.org/xmlns"}
+    seeds = [node.get("id") for path in paths for node in ET.parse(path).iterfind(".//g:node", ns)]
+    assert sorted(seeds) == ["Q1", "Q2", "Q3", "Q5", "Q5"]
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+    # A resumed export continues in the next part
+    paths, _ = _export_file(["Q1", "Q4"], output, "graphml", checkpoint=checkpoint, part_size=2)
+    assert paths == [part_path(output, 3)]
+
+
+def test_graphml_writes_shared_nodes_once():
+    data, _ = _export(["Q1", "Q2"], fmt="graphml")
+    root = ET.fromstring(data)
+    ns = {"g": "http://graphml.graphdrawing.org/xmlns"}
+    nodes = [node.get("id") for node in root.iterfind(".//g:node", ns)]
+    assert sorted(nodes) == ["Q1", "Q2", "Q5"]
+    assert len(root.findall(".//g:edge", ns)) == 2
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        list(export_graphs(["Q1"], "csv"))
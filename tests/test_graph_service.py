@@ -0,0 +1,72 @@
+import pytest
+
+from services import graph_service
+from services.graph_service import compact_graph, find_path
+
+ENTITY_URI = "http://www.wikidata.org/entity/"
+
+# Q1 -> Q2 -> Q3 <- Q4, plus a Q1 -> Q9 dead end; P31 is never followed
+STATEMENTS = {
+    "Q1": [("P50", "Q2"), ("P50", "Q9"), ("P31", "Q4")],
+    "Q2": [("P161", "Q3")],
+    "Q3": [],
+    "Q4": [("P17", "Q3")],
+    "Q9": [],
+}
+
+
+def _entity(entity_id):
+    return {
+        "id": entity_id,
+        "label": f"Label {entity_id}",
+        "description": "",
+        "properties": [
+            {"id": pid, "label": pid, "value": f"Label {value}", "raw_value": ENTITY_URI + value}
+            for pid, value in STATEMENTS.get(entity_id, [])
+        ],
+    }
+
+
+@pytest.fixture(autouse=True)
+def stub_entities(monkeypatch):
+    monkeypatch.setattr(graph_service, "get_entity_details", _entity)
+    monkeypatch.setattr(graph_service, "get_entities_details_batch", lambda ids: {})
+
+
+def _links(graph):
+    return [(link["source"], link["target"], link["relationship"]) for link in graph["links"]]
+
+
+def test_path_keeps_wikidata_direction():
+    graph = find_path("Q1", "Q4")
+    assert graph["found"] and graph["hops"] == 3
+    assert [node["id"] for node in graph["nodes"]] == ["Q1", "Q2", "Q3", "Q4"]
+    assert _links(graph) == [("Q1", "Q2", "Property:P50"), ("Q2", "Q3", "Property:P161"),
+                             ("Q4", "Q3", "Property:P17")]
+
+
+def test_path_respects_max_hops():
+    assert not find_path("Q1", "Q4", max_hops=2)["found"]
+    assert find_path("Q1", "Q3", max_hops=2)["hops"] == 2
+
+
+def test_unconnected_entities():
+    graph = find_path("Q9", "Q3")
+    assert not graph["found"] and graph["nodes"] == [] and "truncated" not in graph
+
+
+def test_compact_graph():
+    graph = {
+        "nodes": [{"id": "Q1", "label": "one", "type": "main", "image": "http://img"},
+                  {"id": "Q2", "label": "two", "type": "related"}],
+        "links": [{"source": "Q1", "target": "Q2", "label": "P50", "relationship": "P50"},
+                  {"source": "Q2", "target": "Q1", "label": "P50", "relationship": "P50"}],
+        "truncated": True,
+    }
+    assert compact_graph(graph) == {
+        "n": [("Q1", "one", "main"), ("Q2", "two", "related")],
+        "l": [(0, 1, 0), (1, 0, 0)],
+        "ll": ["P50"],
+        "img": {0: "http://img"},
+        "truncated": True,
+    }
@@ -0,0 +1,92 @@
+import pytest
+
+from benchmarks import mock_wikidata
+from services import http_service, store_service
+from services.graph_service import graph_cache
+from services.refresh_service import CHANGES_NAMESPACE, Refresher
+from services.sparql_service import entity_cache, get_entity_details
+
+
+@pytest.fixture(scope="module")
+def mock_endpoint():
+    server, base_url = mock_wikidata.start_server()
+    yield base_url
+    server.shutdown()
+
+
+@pytest.fixture
+def store(tmp_path, mock_endpoint, monkeypatch):
+    """Point the services at the stand-in endpoint and a fresh store"""
+    monkeypatch.setattr(http_service, "SPARQL_ENDPOINT", f"{mock_endpoint}/sparql")
+    monkeypatch.setattr(http_service, "API_ENDPOINT", f"{mock_endpoint}/w/api.php")
+    monkeypatch.setattr("services.refresh_service.get_dump_store", lambda: None)
+    monkeypatch.setattr("services.sparql_service.get_dump_store", lambda: None)
+    store = store_service.SQLiteStore(str(tmp_path / "store.sqlite3"))
+    monkeypatch.setattr(store_service, "_store", store)
+    entity_cache.clear()
+    graph_cache.clear()
+    yield store
+    entity_cache.clear()
+    graph_cache.clear()
+
+
+def _refresher(tmp_path, **kwargs):
+    return Refresher(rate=1000, lock_path=str(tmp_path / "refresh.lock"), **kwargs)
+
+
+def test_unchanged_entities_get_a_fresh_ttl(store, tmp_path):
+    for entity_id in ("Q9001", "Q9002"):
+        assert get_entity_details(entity_id)["lastrevid"]
+    # Let both copies expire
+    entity_cache.set("Q9001", entity_cache.get("Q9001"), ttl=-1)
+    store.touch("entity", "Q9002", ttl=-1)
+
+    outcomes = _refresher(tmp_path).refresh_once()
+    assert outcomes["unchanged"] == 2
+    assert entity_cache.get("Q9001") is not None
+    assert store.get("entity", "Q9002") is not None
+
+
+def test_edited_entity_is_refetched_and_published(store, tmp_path):
+    before = get_entity_details("Q9011")
+    graph_cache.set(("Q9999", 10, 1, 5), {"nodes": [{"id": "Q9999"}, {"id": "Q9011"}], "links": []})
+    graph_cache.set(("Q9998", 10, 1, 5), {"nodes": [{"id": "Q9998"}], "links": []})
+    revision = mock_wikidata.edit("Q9011")
+
+    outcomes = _refresher(tmp_path).refresh_once()
+    assert outcomes["changed"] == 1
+    after = entity_cache.get("Q9011")
+    assert after["lastrevid"] == revision != before["lastrevid"]
+    assert "(edit 1)" in after["label"]
+    assert store.get("entity", "Q9011")["lastrevid"] == revision
+    # Graphs showing the entity as a neighbor are dropped, others kept
+    assert graph_cache.get(("Q9999", 10, 1, 5)) is None
+    assert graph_cache.get(("Q9998", 10, 1, 5)) is not None
+    assert [key for key, _, _ in store.changed_since(CHANGES_NAMESPACE, 0)] == ["Q9011"]
+
+
+def test_store_only_entities_are_checked(store, tmp_path):
+    get_entity_details("Q9021")
+    entity_cache.clear()  # as if another worker had fetched it
+    revision = mock_wikidata.edit("Q9021")
+
+    outcomes = _refresher(tmp_path).refresh_once()
+    assert outcomes["changed"] == 1
+    assert store.get("entity", "Q9021")["lastrevid"] == revision
+
+
+def test_other_workers_drop_published_changes(store, tmp_path, monkeypatch):
+    get_entity_details("Q9031")
+    follower = _refresher(tmp_path)
+    store.set(CHANGES_NAMESPACE, "Q9031", {"pid": -1})
+    assert follower.apply_changes() == 1
+    assert entity_cache.get("Q9031") is None
+    assert follower.apply_changes() == 0
+
+
+def test_one_refresher_per_host(tmp_path):
+    leader = _refresher(tmp_path)
+    follower = _refresher(tmp_path)
+    assert leader.try_lead()
+    assert not follower.try_lead()
+    assert leader.try_lead()
@@ -0,0 +1,37 @@
+from services.asset_service import COMPRESS_MIN_BYTES
+from services.request_service import is_not_modified, json_cache_headers, response_encoding
+
+
+def test_etag_is_stable_for_equal_payloads():
+    body, headers = json_cache_headers({"b": 1, "a": [1, 2]})
+    same_body, same_headers = json_cache_headers({"a": [1, 2], "b": 1})
+    assert body == same_body
+    assert headers["ETag"] == same_headers["ETag"]
+    assert headers["Last-Modified"] == same_headers["Last-Modified"]
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since():
+    _, headers = json_cache_headers({"id": "Q1"})
+    assert is_not_modified({"If-None-Match": f'"x", {headers["ETag"]}'}, headers)
+    assert is_not_modified({"If-None-Match": "*"}, headers)
+    assert not is_not_modified({"If-None-Match": '"x"', "If-Modified-Since": headers["Last-Modified"]}, headers)
+    assert is_not_modified({"If-Modified-Since": headers["Last-Modified"]}, headers)
+    assert not is_not_modified({"If-Modified-Since": "not a date"}, headers)
+    assert not is_not_modified({}, headers)
+
+
+def test_compressed_responses_get_their_own_etag():
+    body, headers = json_cache_headers({"text": "x" * COMPRESS_MIN_BYTES})
+    plain_etag = headers["ETag"]
+    assert response_encoding(body, headers, "gzip") == "gzip"
+    assert headers["ETag"] == f'{plain_etag[:-1]}-gzip"'
+    assert headers["Content-Encoding"] == "gzip"
+    assert headers["Vary"] == "Accept-Encoding"
+
+
+def test_small_bodies_are_not_compressed():
+    body, headers = json_cache_headers({"id": "Q1"})
+    plain_etag = headers["ETag"]
+    assert response_encoding(body, headers, "gzip") is None
+    assert headers["ETag"] == plain_etag
+    assert "Content-Encoding" not in headers
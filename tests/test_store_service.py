@@ -0,0 +1,64 @@
+import time
+
+from services.store_service import SQLiteStore
+
+
+def test_values_survive_reopening_the_database(tmp_path):
+    path = str(tmp_path / "store.sqlite3")
+    SQLiteStore(path).set("entity", "Q42", {"id": "Q42", "properties": [{"id": "P31"}]})
+    assert SQLiteStore(path).get("entity", "Q42") == {"id": "Q42", "properties": [{"id": "P31"}]}
+
+
+def test_namespaces_keep_keys_apart(tmp_path):
+    store = SQLiteStore(str(tmp_path / "store.sqlite3"))
+    store.set("entity", "Q1", "details")
+    store.set("basic", "Q1", "summary")
+    assert store.get("entity", "Q1") == "details"
+    assert store.get("basic", "Q1") == "summary"
+    assert store.get("search", "Q1") is None
+
+
+def test_expired_entries_are_missing_until_touched(tmp_path):
+    store = SQLiteStore(str(tmp_path / "store.sqlite3"))
+    store.set("entity", "Q1", "old", ttl=-1)
+    assert store.get("entity", "Q1") is None
+    assert store.touch("entity", "Q1", ttl=60)
+    assert store.get("entity", "Q1") == "old"
+    assert not store.touch("entity", "Q2")
+
+
+def test_delete_prefix_only_removes_matching_keys(tmp_path):
+    store = SQLiteStore(str(tmp_path / "store.sqlite3"))
+    store.set("properties", "Q1|1", "page 1")
+    store.set("properties", "Q1|2", "page 2")
+    store.set("properties", "Q10|1", "other entity")
+    store.delete_prefix("properties", "Q1|")
+    assert store.get("properties", "Q1|1") is None
+    assert store.get("properties", "Q1|2") is None
+    assert store.get("properties", "Q10|1") == "other entity"
+
+
+def test_compact_drops_expired_then_oldest_entries(tmp_path):
+    store = SQLiteStore(str(tmp_path / "store.sqlite3"), max_bytes=300)
+    store.set("entity", "expired", "x", ttl=-1)
+    for n in range(5):
+        store.set("entity", f"Q{n}", "v" * 100)
+        time.sleep(0.01)
+    removed = store.compact()
+    assert removed >= 3
+    assert store.get("entity", "expired") is None
+    assert store.get("entity", "Q4") == "v" * 100
+    assert store.get("entity", "Q0") is None
+    assert store.stats()["bytes"] <= 300
+
+
+def test_changed_since_lists_newer_entries_oldest_first(tmp_path):
+    store = SQLiteStore(str(tmp_path / "store.sqlite3"))
+    store.set("entity", "Q1", 1)
+    time.sleep(0.01)
+    since = time.time()
+    time.sleep(0.01)
+    store.set("entity", "Q2", 2)
+    time.sleep(0.01)
+    store.set("entity", "Q3", 3)
+    assert [(key, value) for key, value, _ in store.changed_since("entity", since)] == [("Q2", 2), ("Q3", 3)]
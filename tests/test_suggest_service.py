@@ -0,0 +1,87 @@
+import os
+
+import pytest
+
+from services import suggest_service
+from services.suggest_service import PrefixIndex
+
+
+@pytest.fixture
+def index_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(suggest_service, "RELOAD_INTERVAL", 0)
+    return str(tmp_path / "suggest_index.bin")
+
+
+def _segments(path):
+    directory, name = os.path.split(path)
+    return sorted(entry for entry in os.listdir(directory) if entry.startswith(name) and entry.endswith(".seg"))
+
+
+def _ids(index, query, limit=10):
+    return [(entry["id"], entry["score"]) for entry in index.suggest(query, limit)]
+
+
+def test_word_prefixes_and_accents(index_path):
+    index = PrefixIndex(index_path)
+    index.rebuild({"Q937": {"label": "Albert Einstein", "description": "physicist", "score": 3},
+                   "Q72": {"label": "Zürich", "description": "", "score": 1}})
+    assert _ids(index, "einst") == [("Q937", 3)]
+    assert _ids(index, "zur") == [("Q72", 1)]
+    assert index.suggest("") == []
+
+
+def test_flush_appends_segments_read_with_the_base(index_path):
+    index = PrefixIndex(index_path)
+    index.rebuild({f"Q{i}": {"label": f"alpha {i}", "description": "", "score": 1} for i in range(1, 500)})
+    base_id = os.stat(index_path).st_ino
+
+    index.add("Q7", "alpha 7", weight=50)
+    index.add("Q9999", "alpha new", weight=20)
+    index.flush()
+    assert _segments(index_path) == ["suggest_index.bin.00000001.seg"]
+    assert os.stat(index_path).st_ino == base_id  # the base was not rewritten
+
+    # Another worker sees the segment, with scores added to the base's
+    other = PrefixIndex(index_path)
+    assert _ids(other, "alpha", 2) == [("Q7", 51), ("Q9999", 20)]
+    assert other.stats()["segments"] == 1
+
+
+def test_segments_are_merged_into_the_base(index_path, monkeypatch):
+    monkeypatch.setattr(suggest_service, "MAX_SEGMENTS", 3)
+    index = PrefixIndex(index_path)
+    index.rebuild({f"Q{i}": {"label": f"alpha {i}", "description": "", "score": 1} for i in range(1, 500)})
+    reader = PrefixIndex(index_path)
+
+    for qid in ("Q1", "Q2"):
+        index.add(qid, f"alpha {qid[1:]}", weight=10)
+        index.flush()
+    assert len(_segments(index_path)) == 2
+    index.add("Q1", "alpha 1", weight=10)
+    index.flush()
+
+    assert _segments(index_path) == []
+    assert _ids(reader, "alpha", 2) == [("Q1", 21), ("Q2", 11)]
+    assert reader.stats()["segments"] == 0
+
+    # Numbering continues after the merged segments
+    index.add("Q3", "alpha 3", weight=10)
+    index.flush()
+    assert _segments(index_path) == ["suggest_index.bin.00000004.seg"]
+
+
+def test_pending_entries_are_served_before_a_flush(index_path):
+    index = PrefixIndex(index_path)
+    index.add("Q64", "Berlin", "capital", weight=5)
+    assert index.suggest("ber") == [{"id": "Q64", "label": "Berlin", "description": "capital", "score": 5}]
+    assert not os.path.exists(index_path)
+
+
+def test_rebuild_replace_drops_segments(index_path):
+    index = PrefixIndex(index_path)
+    index.rebuild({"Q1": {"label": "alpha", "description": "", "score": 1}})
+    index.add("Q2", "alpha two", weight=1)
+    index.flush()
+    index.rebuild({"Q3": {"label": "alpha three", "description": "", "score": 1}}, replace=True)
+    assert _segments(index_path) == []
+    assert _ids(index, "alpha") == [("Q3", 1)]